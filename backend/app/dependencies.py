@@ -1,11 +1,14 @@
-from typing import Annotated, Dict, Any, Generator, Optional
+from typing import Annotated, Dict, Any, AsyncGenerator, Callable, Generator, Optional
+import asyncio
+import inspect
 import os
+import threading
 
 from pydantic import BaseModel
 from fastapi import Depends, Security
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from contextlib import asynccontextmanager
-from fastapi import Header, FastAPI
+from fastapi import Header, FastAPI, Request
 from database import *
 import json
 
@@ -42,33 +45,145 @@ def load_config() -> Dict[str, Any]:
     return {
         "postgres": get_database_config(),
         "db_log": os.getenv("DB_LOG", "true").lower() == "true",
+        "replicas": [url for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url],
+        "statement_timeout": int(os.getenv("DB_STATEMENT_TIMEOUT")) if os.getenv("DB_STATEMENT_TIMEOUT") else None,
+        "driver": os.getenv("DB_DRIVER", "psycopg2"),
+        "prepare_threshold": int(os.getenv("DB_PREPARE_THRESHOLD", "5")) or None,
+        "prepared_max": int(os.getenv("DB_PREPARED_MAX", "100")),
+        "slow_query_ms": float(os.getenv("DB_SLOW_QUERY_MS")) if os.getenv("DB_SLOW_QUERY_MS") else None,
+        "slow_query_sample": float(os.getenv("DB_SLOW_QUERY_SAMPLE", "0.1")),
+        "admin_token": os.getenv("ADMIN_TOKEN"),
+        "pool": {
+            "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "1")),
+            "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+            "timeout": float(os.getenv("DB_POOL_TIMEOUT", "30"))
+        },
         "jwt_secret": os.getenv("JWT_SECRET", "your-secure-secret-key"),
         "jwt_expire_minutes": int(os.getenv("JWT_EXPIRE_MINUTES", "30"))
     }
     
 config: Dict[str, Any] = {}
 engine: DBEngine = None
+async_engine: AsyncDBEngine = None
+# DBEngine arguments, the engine itself is only built when a SessionDep route first needs it
+_engine_options: Dict[str, Any] = {}
+_engine_lock = threading.Lock()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     global engine
+    global async_engine
     global config
+    global _engine_options
     
     # Load main configuration
     config = load_config()
     
     # Initialize database engine with appropriate configuration
+    # Reads built with Select go to replicas, writes and reads of a client's fresh writes to the primary
+    replicas = config.get("replicas") or None
+    # Default statement timeout in milliseconds, routes can tighten it with statement_timeout()
+    timeout = config.get("statement_timeout")
+    # "psycopg2" (default) or "psycopg" for psycopg 3 with binary results, for the sync engine only;
+    # the async engine the routers use always runs on psycopg 3
+    driver = config.get("driver", "psycopg2")
+    # Query templates run this often on a connection are prepared on the server, 0 or null turns it off
+    prepared = {"prepare_threshold": config.get("prepare_threshold", 5) or None,
+                "prepared_max": config.get("prepared_max", 100)}
+    # Statements slower than this many milliseconds are kept for /admin/slow-queries, null turns it off
+    slow = {"slow_query_ms": config.get("slow_query_ms"), "slow_query_sample": config.get("slow_query_sample", 0.1)}
     if "url" in config["postgres"]:
-        engine = DBEngine(url=config["postgres"]["url"], log=config.get("db_log", False))
+        source = {"url": config["postgres"]["url"]}
     else:
-        engine = DBEngine(config["postgres"], log=config.get("db_log", False))
+        source = {"config": config["postgres"]}
+    _engine_options = dict(source, log=config.get("db_log", False), pool=config.get("pool"),
+                           replicas=replicas, statement_timeout=timeout, driver=driver,
+                           **prepared, **slow)
+
+    # The routers run on the async engine
+    async_engine = AsyncDBEngine(**source, log=config.get("db_log", False), pool=config.get("pool"),
+                                 replicas=replicas, statement_timeout=timeout, **prepared, **slow)
+    await async_engine.open()
     
     yield
-    engine.close()
+    await async_engine.close()
+    with _engine_lock:
+        if engine is not None:
+            engine.close()
+            engine = None
+
+def get_engine() -> DBEngine:
+    global engine
+    with _engine_lock:
+        if engine is None:
+            engine = DBEngine(**_engine_options)
+        return engine
+
+# Carries the WAL position of the client's last write, so replicas only serve its reads once they have it
+READ_AFTER_COOKIE = "read_after"
+
+def _read_after(request: Request) -> Optional[int]:
+    try:
+        return parse_lsn(request.cookies.get(READ_AFTER_COOKIE))
+    except ValueError:
+        return None
+
+def get_session(request: Request) -> Generator[DBSession, None, None]:
+    # Request scoped unit of work: commit on success, roll back on any error
+    with get_engine().transaction(read_after=_read_after(request)) as s:
+        yield s
+    if s.write_lsn is not None:
+        # Sent back as READ_AFTER_COOKIE by the app's middleware
+        request.state.write_lsn = s.write_lsn
 
-def get_session() -> Generator[DBSession, None, None]:
-    with engine.session() as s:
+async def get_async_session(request: Request) -> AsyncGenerator[AsyncDBSession, None]:
+    async with async_engine.transaction(read_after=_read_after(request)) as s:
         yield s
+    if s.write_lsn is not None:
+        request.state.write_lsn = s.write_lsn
+
+async def _cancel_on_disconnect(request: Request, cancel: Callable[[], Any], poll_interval: float) -> None:
+    while not await request.is_disconnected():
+        await asyncio.sleep(poll_interval)
+    try:
+        result = cancel()
+        if inspect.isawaitable(result):
+            await result
+    except Exception:
+        pass
+
+def statement_timeout(milliseconds: Optional[int], cancel_on_disconnect: bool = True, poll_interval: float = 0.1):
+    """Route dependency that limits the request session's statements to ``milliseconds``
+    and cancels the running statement if the client goes away.
+
+    Add it to a route or router with ``dependencies=[Depends(statement_timeout(500), scope="function")]``;
+    it shares the request's ``SessionDep``, which ends with the route function. Routes using it
+    should be plain ``def`` so their queries run off the event loop while it watches the connection.
+    """
+    async def dependency(request: Request, session: SessionDep) -> AsyncGenerator[None, None]:
+        session.statement_timeout = milliseconds
+        watcher = asyncio.create_task(_cancel_on_disconnect(request, session.cancel, poll_interval)) \
+            if cancel_on_disconnect else None
+        try:
+            yield
+        finally:
+            if watcher:
+                watcher.cancel()
+    return dependency
+
+def async_statement_timeout(milliseconds: Optional[int], cancel_on_disconnect: bool = True, poll_interval: float = 0.1):
+    """``statement_timeout`` for routes using ``AsyncSessionDep``, added the same way with
+    ``scope="function"``."""
+    async def dependency(request: Request, session: AsyncSessionDep) -> AsyncGenerator[None, None]:
+        session.statement_timeout = milliseconds
+        watcher = asyncio.create_task(_cancel_on_disconnect(request, session.cancel, poll_interval)) \
+            if cancel_on_disconnect else None
+        try:
+            yield
+        finally:
+            if watcher:
+                watcher.cancel()
+    return dependency
 
 security = HTTPBearer()
 
@@ -89,5 +204,18 @@ async def get_token_from_header(
     return credentials
 
 # Dependency
-SessionDep = Annotated[DBSession, Depends(get_session)]
+# Both commit when the route function returns, before the response goes out, so a failed commit
+# fails the request and the client gets its write position
+SessionDep = Annotated[DBSession, Depends(get_session, scope="function")]
+AsyncSessionDep = Annotated[AsyncDBSession, Depends(get_async_session, scope="function")]
 TokenDep = Annotated[Optional[str], Depends(get_token_from_header)]
+
+def get_loaders(session: SessionDep) -> Loaders:
+    # One set of loaders per request, batching and memoizing lookups on its session
+    return Loaders(session)
+
+async def get_async_loaders(session: AsyncSessionDep) -> Loaders:
+    return Loaders(session)
+
+LoaderDep = Annotated[Loaders, Depends(get_loaders)]
+AsyncLoaderDep = Annotated[Loaders, Depends(get_async_loaders)]
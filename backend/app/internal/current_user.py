@@ -3,12 +3,18 @@ from pydantic import BaseModel
 from fastapi import HTTPException, Depends
 from ..utils.jwt import verify_jwt_token
 from typing import Optional
-from ..dependencies import SessionDep, TokenDep, Select, Condition, QueryHelper, Security, security
+from ..dependencies import AsyncSessionDep, TokenDep, Select, Condition, AsyncQueryHelper, Param, Security, security
 from ..models import Users, UserData
 
+
 from typing import Annotated
 
-async def get_current_user(session: SessionDep, token: TokenDep) -> UserData:
+# Runs on every authenticated request, so it is built once and only bound per request
+USER_BY_USERNAME = Select(Users).where(
+    Condition().eq(Users.col("username"), Param("username"))
+).get_query()
+
+async def get_current_user(session: AsyncSessionDep, token: TokenDep) -> UserData:
     if not token:
         raise HTTPException(
             status_code=401,
@@ -22,11 +28,7 @@ async def get_current_user(session: SessionDep, token: TokenDep) -> UserData:
             detail="Invalid or expired token"
         )
     
-    select_query = Select(Users).where(
-        Condition().eq(Users.col("username"), payload["sub"])
-    ).get_query()
-
-    user: UserData = QueryHelper.fetch_one(select_query, session, Users)
+    user: UserData = await AsyncQueryHelper.fetch_one(USER_BY_USERNAME.bind(username=payload["sub"]), session, Users)
 
     if not user:
         raise HTTPException(
@@ -1,6 +1,9 @@
-from fastapi import Depends, FastAPI
+from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from .dependencies import get_session, DBSession, lifespan, get_token_from_header
+from fastapi.responses import JSONResponse
+import psycopg2.errors
+import psycopg.errors
+from .dependencies import get_session, DBSession, lifespan, get_token_from_header, READ_AFTER_COOKIE, format_lsn
 
 from typing import Union, Annotated, Optional
 
@@ -17,6 +20,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def read_after_cookie(request: Request, call_next):
+    # Remember where the client's last write is, so its next reads don't hit a replica that lags behind it
+    response = await call_next(request)
+    write_lsn = getattr(request.state, "write_lsn", None)
+    if write_lsn is not None:
+        response.set_cookie(READ_AFTER_COOKIE, format_lsn(write_lsn), httponly=True, samesite="lax")
+    return response
+
+@app.exception_handler(psycopg2.errors.QueryCanceled)
+@app.exception_handler(psycopg.errors.QueryCanceled)
+async def query_canceled_handler(request: Request, exc: Exception):
+    # Raised when a statement hits its timeout or was cancelled after the client disconnected
+    return JSONResponse(status_code=504, content={"detail": "Database query timed out"})
+
 from . import routers
 
 app.include_router(routers.router)
@@ -78,10 +78,10 @@ class Users(BaseSchema):
     username = Text(required=True, unique=True)
     email = Text(required=True, unique=True)
     phone_no = Text(required=True, unique=True)
-    password_hash = Text(required=True)
+    password_hash = Text(required=True, deferred=True)
     first_name = Varchar(50, required=False, allow_none=True)
     last_name = Varchar(50, required=False)
-    profile_pic_url = Text(required=False)
+    profile_pic_url = Text(required=False, deferred=True)  # Can be a multi-KB data URI
     is_active = Boolean(default=True, required=True)
     birthday = Date(required=False)
     updated_at = Timestamp(auto_now=True)
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from . import root, auth, skills, professionals, hires, reviews
+from . import root, auth, skills, professionals, hires, reviews, admin
 
 router = APIRouter()
 router.include_router(root.router)
@@ -8,3 +8,4 @@ router.include_router(skills.router)
 router.include_router(professionals.router)
 router.include_router(hires.router)
 router.include_router(reviews.router)
+router.include_router(admin.router)
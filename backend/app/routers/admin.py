@@ -0,0 +1,78 @@
+from fastapi import APIRouter, Depends, Header, HTTPException
+from pydantic import BaseModel
+from .. import dependencies
+from ..dependencies import SlowQueryLog
+
+from datetime import datetime, timezone
+import secrets
+from typing import Any, Dict, List, Optional
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)) -> None:
+    # The admin API only exists when an admin_token is configured
+    expected = dependencies.config.get("admin_token")
+    if not expected:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, expected):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+    dependencies=[Depends(require_admin)]
+)
+
+class SlowQueryResponse(BaseModel):
+    id: str
+    fingerprint: str
+    query: str
+    duration_ms: float
+    at: datetime
+    plan: Optional[Dict[str, Any]] = None
+
+class SlowQueryStatsResponse(BaseModel):
+    id: str
+    fingerprint: str
+    count: int
+    total_ms: float
+    mean_ms: float
+    max_ms: float
+    last_at: datetime
+    plan: Optional[Dict[str, Any]] = None
+
+class SlowQueriesResponse(BaseModel):
+    threshold_ms: Optional[float] = None
+    statements: List[SlowQueryStatsResponse]
+    recent: List[SlowQueryResponse]
+
+def _logs() -> List[SlowQueryLog]:
+    engines = (dependencies.engine, dependencies.async_engine)
+    return [engine.slow_queries for engine in engines if engine is not None and engine.slow_queries is not None]
+
+def _time(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+
+@router.get("/slow-queries", response_model=SlowQueriesResponse)
+async def get_slow_queries(limit: int = 50, plans: bool = True):
+    logs = _logs()
+    stats = sorted((s for log in logs for s in log.stats()), key=lambda s: s.total_ms, reverse=True)[:limit]
+    recent = sorted((e for log in logs for e in log.entries()), key=lambda e: e.at, reverse=True)[:limit]
+
+    return SlowQueriesResponse(
+        threshold_ms=logs[0].threshold_ms if logs else None,
+        statements=[
+            SlowQueryStatsResponse(id=s.id, fingerprint=s.fingerprint, count=s.count, total_ms=s.total_ms,
+                                   mean_ms=s.mean_ms, max_ms=s.max_ms, last_at=_time(s.last_at),
+                                   plan=s.plan if plans else None)
+            for s in stats
+        ],
+        recent=[
+            SlowQueryResponse(id=e.id, fingerprint=e.fingerprint, query=e.query, duration_ms=e.duration_ms,
+                              at=_time(e.at), plan=e.plan if plans else None)
+            for e in recent
+        ]
+    )
+
+@router.delete("/slow-queries", status_code=204)
+async def clear_slow_queries():
+    for log in _logs():
+        log.clear()
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, HTTPException, Depends, Security
 from pydantic import BaseModel
 from typing import Optional
-from ..dependencies import SessionDep, TokenDep, Select, Condition, QueryHelper, Statement
+from ..dependencies import AsyncSessionDep, TokenDep, Select, Condition, AsyncQueryHelper, Statement, Param
 from ..models import Users, UserData
 from ..utils.create_password_hash import create_password_hash, check_password
 from ..utils.jwt import create_jwt_token
@@ -28,25 +28,17 @@ class UserLogin(BaseModel):
     username: str
     password: str
 
+LOGIN_QUERY = Select(Users).undefer("password_hash").where(
+    Condition().eq(Users.col("username"), Param("username"))
+).limit(1).get_query()
+
 class TokenResponse(BaseModel):
     access_token: str
     token_type: str = "bearer"
 
 @router.post("/register", response_model=TokenResponse)
-async def register(user: UserCreate, session: SessionDep):
-    check_unique_query = Select(Users, Users.col("id")).where(
-        Condition().eq(Users.col("username"), user.username).or_()
-        .eq(Users.col("email"), user.email)
-    ).limit(1).get_query()
-    res = QueryHelper.fetch_multiple_raw(check_unique_query, session)
-
-    if len(res) > 0:
-        raise HTTPException(
-            status_code=400,
-            detail="Username or email already registered"
-        )
-    
-    # Create a new user
+async def register(user: UserCreate, session: AsyncSessionDep):
+    # Create a new user, a taken username, email or phone number skips the insert
     password_hash = create_password_hash(user.password)
     user_data = UserData(
         username=user.username,
@@ -60,27 +52,31 @@ async def register(user: UserCreate, session: SessionDep):
     )
 
     try:
-        new_user = QueryHelper.insert([user_data], Users, session)[0]
+        result = await AsyncQueryHelper.upsert(user_data, Users, session)
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail="Failed to create user"
         )
+
+    if result.conflicted:
+        raise HTTPException(
+            status_code=400,
+            detail="Username or email already registered"
+        )
+    new_user = result.inserted[0]
     
     # Create access token
     token_data = {"sub": user.username, "id": new_user.id}
     token = create_jwt_token(token_data)
 
-    session.commit()
+    await session.commit()
     return TokenResponse(access_token=token)
 
 @router.post("/login", response_model=TokenResponse)
-async def login(user_login: UserLogin, session: SessionDep):
+async def login(user_login: UserLogin, session: AsyncSessionDep):
     # Verify credentials
-    q = Select(Users).where(
-        Condition().eq(Users.col("username"), user_login.username)
-    ).limit(1).get_query()
-    res: List[UserData] = QueryHelper.fetch_multiple(q, session, Users)
+    res: List[UserData] = await AsyncQueryHelper.fetch_multiple(LOGIN_QUERY.bind(username=user_login.username), session, Users)
 
     if len(res) == 0 or not check_password(user_login.password, res[0].password_hash):
         raise HTTPException(
@@ -106,5 +102,6 @@ class UserResponse(BaseModel):
 
 # Protected route example
 @router.get("/me", response_model=UserData)
-async def get_current_user_info(current_user: UserDep):
+async def get_current_user_info(current_user: UserDep, session: AsyncSessionDep):
+    await AsyncQueryHelper.load_deferred(Users, session, current_user, "profile_pic_url")
     return current_user
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, HTTPException, Depends
-from ..dependencies import SessionDep, TokenDep, Select, Condition, QueryHelper, Statement
+from ..dependencies import AsyncSessionDep, TokenDep, Select, Condition, AsyncQueryHelper, Statement, Insert, Cte
 from ..internal.current_user import UserData, UserDep
 from ..models import Hires, HireData, Professionals, ProfessionalData, Users, UserData, Skills, SkillData
 from pydantic import BaseModel
@@ -29,45 +29,66 @@ class HireResponse(BaseModel):
 async def create_hire(
     hire_req: HireRequest,
     user: UserDep,
-    session: SessionDep
+    session: AsyncSessionDep
 ):
-    # Check if the professional exists
-    prof_query = Select(
-        Users,
-        Professionals.col("id"),
-        Professionals.col("title"),
-        Users.col("username"),
-        Users.col("location"),
-        Skills.col("name")
-    ).join(Professionals).join(Skills).where(
-        Condition().eq(Professionals.col("id"), hire_req.professional_id)
-    ).limit(1).get_query()
+    # Look up the professional and insert the hire in one statement, no row means
+    # the professional does not exist and nothing was inserted
+    professional, inserted = Cte("professional"), Cte("inserted", Hires)
+    query = Select(
+        professional,
+        professional.col("username"),
+        professional.col("title"),
+        professional.col("location"),
+        professional.col("name"),
+        *[inserted.col(name) for name in Hires._fields()]
+    ).with_(
+        "professional", Select(
+            Professionals,
+            Professionals.col("id"),
+            Professionals.col("title"),
+            Professionals.col("location"),
+            Users.col("username"),
+            Skills.col("name")
+        ).join(Users).join(
+            Skills, Condition().eq(Skills.col("id"), Professionals.col("skill_id"))
+        ).where(
+            Condition().eq(Professionals.col("id"), hire_req.professional_id)
+        ).limit(1)
+    ).with_(
+        "inserted", Insert(
+            Hires, "client_id", "professional_id", "status", "start_date", "end_date", "total_hours", "total_amount"
+        ).from_select(
+            Select(
+                professional,
+                user.id,
+                professional.col("id"),
+                "pending",
+                hire_req.start_date,
+                hire_req.end_date,
+                hire_req.total_hours,
+                hire_req.total_amount
+            )
+        ).returning()
+    ).join(
+        inserted, Condition().eq(inserted.col("professional_id"), professional.col("id")), "LEFT"
+    ).get_query()
 
-    prof_data = QueryHelper.fetch_one_raw(prof_query, session)
-    if not prof_data:
-        raise HTTPException(
-            status_code=404,
-            detail="Professional not found"
-        )
-    
-    hire = HireData(
-        client_id=user.id,
-        professional_id=hire_req.professional_id,
-        start_date=hire_req.start_date,
-        end_date=hire_req.end_date,
-        total_hours=hire_req.total_hours,
-        status="pending"
-    )
     try:
-        hire = QueryHelper.insert([hire], Hires, session)[0]
+        prof_data = await AsyncQueryHelper.fetch_one_raw(query, session)
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail="Failed to create hire"
         )
 
+    if not prof_data:
+        raise HTTPException(
+            status_code=404,
+            detail="Professional not found"
+        )
+
     return HireResponse(
-        hire=hire,
+        hire=HireData(**{name: prof_data[name] for name in Hires._fields()}),
         professional_username=prof_data['username'],
         professional_title=prof_data['title'],
         professional_location=prof_data['location'],
@@ -75,13 +96,13 @@ async def create_hire(
     )
 
 @router.get("/", response_model=List[HireResponse])
-async def my_hires(user: UserDep, session: SessionDep):
+async def my_hires(user: UserDep, session: AsyncSessionDep):
     query = Select(
         Hires,
-        Hires.all_cols(),
+        *Hires.all_cols(),
         Users.col("username"),
         Professionals.col("title"),
-        Users.col("location"),
+        Professionals.col("location"),
         Skills.col("name")
     ).join(Professionals).join(Skills).join(
         Users, Condition().eq(Users.col("id"), Professionals.col("user_id"))
@@ -89,7 +110,7 @@ async def my_hires(user: UserDep, session: SessionDep):
         Condition().eq(Hires.col("client_id"), user.id)
     ).get_query()
 
-    res = QueryHelper.fetch_multiple_raw(query, session)
+    res = await AsyncQueryHelper.fetch_multiple_raw(query, session)
 
     return [
         HireResponse(
@@ -104,12 +125,12 @@ async def my_hires(user: UserDep, session: SessionDep):
     ]
 
 @router.post("/cancel")
-async def cancel_hire(hire_id: int, user: UserDep, session: SessionDep):
+async def cancel_hire(hire_id: int, user: UserDep, session: AsyncSessionDep):
     # Check if the hire exists
     hire_query = Select(Hires).where(
         Condition().eq(Hires.col("id"), hire_id)
     ).limit(1).get_query()
-    hire: HireData = QueryHelper.fetch_one(hire_query, session, Hires)
+    hire: HireData = await AsyncQueryHelper.fetch_one(hire_query, session, Hires)
 
     if not hire:
         raise HTTPException(
@@ -131,27 +152,38 @@ async def cancel_hire(hire_id: int, user: UserDep, session: SessionDep):
             detail="Hire cannot be cancelled"
         )
     
+    # The status filter keeps a concurrent transition from being overwritten
     hire.status = "cancelled"
-    # TODO: Update the hire
-    session.commit()
+    result = await AsyncQueryHelper.bulk_update(Hires, [hire], session, fields=["status"], filters={"status": "pending"})
+    if not result.rows:
+        raise HTTPException(
+            status_code=400,
+            detail="Hire cannot be cancelled"
+        )
+
     return {"message": "Hire cancelled"}
 
 @router.post("/accept")
-async def accept_hire(hire_id: int, user: UserDep, session: SessionDep):
-    # Check if the hire exists
-    hire_query = Select(Hires).where(
+async def accept_hire(hire_id: int, user: UserDep, session: AsyncSessionDep):
+    # Check if the hire exists, with the user behind its professional profile
+    hire_query = Select(
+        Hires,
+        *Hires.all_cols(),
+        Professionals.col("user_id")
+    ).join(Professionals).where(
         Condition().eq(Hires.col("id"), hire_id)
     ).limit(1).get_query()
-    hire: HireData = QueryHelper.fetch_one(hire_query, session, Hires)
+    row = await AsyncQueryHelper.fetch_one_raw(hire_query, session)
 
-    if not hire:
+    if not row:
         raise HTTPException(
             status_code=404,
             detail="Hire not found"
         )
+    hire = HireData(**{name: row[name] for name in Hires._fields()})
     
     # Check if the hire belongs to the user
-    if hire.professional_id != user.id:
+    if row["user_id"] != user.id:
         raise HTTPException(
             status_code=403,
             detail="You are not authorized to accept this hire"
@@ -164,18 +196,24 @@ async def accept_hire(hire_id: int, user: UserDep, session: SessionDep):
             detail="Hire cannot be accepted"
         )
     
-    hire.status = "accepted"
-    # TODO: Update the hire
+    # "active" is the accepted state the status check constraint allows
+    hire.status = "active"
+    result = await AsyncQueryHelper.bulk_update(Hires, [hire], session, fields=["status"], filters={"status": "pending"})
+    if not result.rows:
+        raise HTTPException(
+            status_code=400,
+            detail="Hire cannot be accepted"
+        )
 
     return {"message": "Hire accepted"}
 
 @router.post("/complete")
-async def complete_hire(hire_id: int, user: UserDep, session: SessionDep):
+async def complete_hire(hire_id: int, user: UserDep, session: AsyncSessionDep):
     # Check if the hire exists
     hire_query = Select(Hires).where(
         Condition().eq(Hires.col("id"), hire_id)
     ).limit(1).get_query()
-    hire: HireData = QueryHelper.fetch_one(hire_query, session, Hires)
+    hire: HireData = await AsyncQueryHelper.fetch_one(hire_query, session, Hires)
 
     if not hire:
         raise HTTPException(
@@ -191,13 +229,18 @@ async def complete_hire(hire_id: int, user: UserDep, session: SessionDep):
         )
     
     # Check if the hire is accepted
-    if hire.status != "accepted":
+    if hire.status != "active":
         raise HTTPException(
             status_code=400,
             detail="Hire cannot be completed"
         )
     
     hire.status = "completed"
-    # TODO: Update the hire
+    result = await AsyncQueryHelper.bulk_update(Hires, [hire], session, fields=["status"], filters={"status": "active"})
+    if not result.rows:
+        raise HTTPException(
+            status_code=400,
+            detail="Hire cannot be completed"
+        )
 
     return {"message": "Hire completed"}
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, HTTPException, Depends
-from ..dependencies import SessionDep, TokenDep, Select, Condition, QueryHelper, Statement
+from ..dependencies import AsyncSessionDep, TokenDep, Select, Condition, AsyncQueryHelper, Statement
 from ..internal.current_user import UserData, UserDep
 from ..models import Professionals, ProfessionalData, Users, UserData, Skills, SkillData, Reviews
 from pydantic import BaseModel
@@ -32,16 +32,17 @@ class ProfessionalCreate(BaseModel):
     location: str
     cover_letter: Optional[str] = None
 
-def get_professional_query() -> Select:
+def get_professional_query(*undefer: str) -> Select:
+    # The password hash never leaves the database; list pages also skip the profile picture
     return Select(
         Users,
         *Professionals.all_cols("p_"),
         *Skills.all_cols("s_"),
-        *Users.all_cols("u_"),
+        *Users.all_cols("u_", undefer=undefer),
     ).join(Professionals).join(Skills)
 
 def deserialize_professionals_data(data: List[Dict[str, Any]]) -> List[ProfessionalResponse]:
-    user_schema = Users(exclude=["password_hash"])
+    user_schema = Users()
     prof_schema = Professionals()
     skill_schema = Skills()
 
@@ -49,7 +50,7 @@ def deserialize_professionals_data(data: List[Dict[str, Any]]) -> List[Professio
 
     for item in data:
         user_data = user_schema.load(
-            {key.replace("u_", ""): value for key, value in item.items() if key.startswith("u_") and key != "u_password_hash"}
+            {key.replace("u_", ""): value for key, value in item.items() if key.startswith("u_")}
         )
         prof_data = prof_schema.load(
             {key.replace("p_", ""): value for key, value in item.items() if key.startswith("p_")}
@@ -65,21 +66,26 @@ def deserialize_professionals_data(data: List[Dict[str, Any]]) -> List[Professio
     return res
 
 @router.get("/", response_model=List[ProfessionalResponse])
-async def get_professionals(session: SessionDep):
+async def get_professionals(session: AsyncSessionDep):
     query = get_professional_query().get_query().set_end()
 
-    res = QueryHelper.fetch_multiple_raw(query, session)
+    res = await AsyncQueryHelper.fetch_multiple_raw(query, session)
 
     return deserialize_professionals_data(res)
 
 @router.post("/", response_model=ProfessionalResponse)
-async def create_professional(professional: ProfessionalCreate, user: UserDep, session: SessionDep):
-    # Check if skill exists
+async def create_professional(professional: ProfessionalCreate, user: UserDep, session: AsyncSessionDep):
     skill_query = Select(Skills).where(
         Condition().eq(Skills.col("id"), professional.skill_id)
     ).limit(1).get_query()
-    skill: SkillData = QueryHelper.fetch_one(skill_query, session, Skills)
+    prof_query = Select(Professionals).where(
+        Condition().eq(Professionals.col("user_id"), user.id)
+    ).limit(1).get_query()
+    # Both checks in one round trip
+    skills, profs = await AsyncQueryHelper.fetch_batch([skill_query, prof_query], session, [Skills, Professionals])
 
+    # Check if skill exists
+    skill: Optional[SkillData] = skills[0] if skills else None
     if not skill:
         raise HTTPException(
             status_code=400,
@@ -87,11 +93,7 @@ async def create_professional(professional: ProfessionalCreate, user: UserDep, s
         )
     
     # Check if professional already exists
-    prof_query = Select(Professionals).where(
-        Condition().eq(Professionals.col("user_id"), user.id)
-    ).limit(1).get_query()
-    prof = QueryHelper.fetch_one(prof_query, session, Professionals)
-    if prof:
+    if profs:
         raise HTTPException(
             status_code=400,
             detail="Professional already exists"
@@ -108,16 +110,17 @@ async def create_professional(professional: ProfessionalCreate, user: UserDep, s
     )
 
     try:
-        new_prof = QueryHelper.insert([prof_data], Professionals, session)[0]
+        new_prof = (await AsyncQueryHelper.insert([prof_data], Professionals, session))[0]
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail="Failed to create professional"
         )
     
-    session.commit()
+    await session.commit()
 
     user.password_hash = None
+    await AsyncQueryHelper.load_deferred(Users, session, user, "profile_pic_url")
     return ProfessionalResponse(
         professional=new_prof,
         user=user,
@@ -125,12 +128,12 @@ async def create_professional(professional: ProfessionalCreate, user: UserDep, s
     )
 
 @router.get("/id/{professional_id}", response_model=ProfessionalResponse)
-async def get_professional(professional_id: int, session: SessionDep):
-    query = get_professional_query().where(
+async def get_professional(professional_id: int, session: AsyncSessionDep):
+    query = get_professional_query("profile_pic_url").where(
         Condition().eq(Professionals.col("id"), professional_id)
     ).limit(1).get_query()
 
-    res = QueryHelper.fetch_one_raw(query, session)
+    res = await AsyncQueryHelper.fetch_one_raw(query, session)
 
     if not res:
         raise HTTPException(
@@ -141,12 +144,12 @@ async def get_professional(professional_id: int, session: SessionDep):
     return deserialize_professionals_data([res])[0]
 
 @router.get("/{professional_name}", response_model=ProfessionalResponse)
-async def get_professional_by_name(professional_name: str, session: SessionDep):
-    query = get_professional_query().where(
+async def get_professional_by_name(professional_name: str, session: AsyncSessionDep):
+    query = get_professional_query("profile_pic_url").where(
         Condition().ilike(Users.col("username"), professional_name)
     ).limit(1).get_query()
 
-    res = QueryHelper.fetch_one_raw(query, session)
+    res = await AsyncQueryHelper.fetch_one_raw(query, session)
 
     if not res:
         raise HTTPException(
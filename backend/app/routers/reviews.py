@@ -1,5 +1,5 @@
 from fastapi import APIRouter, HTTPException, Depends
-from ..dependencies import SessionDep, TokenDep, Select, Condition, QueryHelper, Statement
+from ..dependencies import AsyncSessionDep, TokenDep, AsyncLoaderDep, Loaders, Query, Select, Condition, AsyncQueryHelper, Statement, Insert, Cte, AsIs
 from ..internal.current_user import UserData, UserDep
 from ..models import Reviews, ReviewData, Hires, HireData, Professionals, Users
 from pydantic import BaseModel
@@ -28,54 +28,74 @@ class ReviewResponse(BaseModel):
 async def create_review(
     review_req: ReviewCreate,
     user: UserDep,
-    session: SessionDep
+    session: AsyncSessionDep
 ):
+    # Checks and insert in one statement: the insert only happens when the hire is
+    # completed and has no review, and the row tells which check failed
+    hire, existing, inserted = Cte("hire", Hires), Cte("existing", Reviews), Cte("inserted", Reviews)
+    query = Select(
+        hire,
+        hire.col("status"),
+        existing.col("id", "existing_id"),
+        *[inserted.col(name) for name in Reviews._fields()]
+    ).with_(
+        "hire", Select(Hires).where(Condition().eq(Hires.col("id"), review_req.hire_id))
+    ).with_(
+        "existing", Select(Reviews, Reviews.col("id"), Reviews.col("hire_id")).where(
+            Condition().eq(Reviews.col("hire_id"), review_req.hire_id)
+        ).limit(1)
+    ).with_(
+        "inserted", Insert(Reviews).from_select(
+            Select(
+                hire,
+                hire.col("id"),
+                hire.col("professional_id"),
+                hire.col("client_id"),
+                review_req.rating,
+                review_req.review
+            ).where(
+                Condition().eq(hire.col("status"), "completed").and_().not_exists(Select(existing, AsIs("1")))
+            )
+        ).returning()
+    ).join(
+        existing, Condition().eq(existing.col("hire_id"), hire.col("id")), "LEFT"
+    ).join(
+        inserted, Condition().eq(inserted.col("hire_id"), hire.col("id")), "LEFT"
+    ).get_query()
+
+    try:
+        row = await AsyncQueryHelper.fetch_one_raw(query, session)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to create review"
+        )
+
     # Check if the hire exists
-    hire_query = Select(
-        Hires
-    ).where(
-        Condition().eq(Hires.col("id"), review_req.hire_id)
-    ).limit(1).get_query()
-    hire = QueryHelper.fetch_one(hire_query, session, Hires)
-    if not hire:
+    if not row:
         raise HTTPException(
             status_code=404,
             detail="Hire not found"
         )
     
     # Check if the hire is completed
-    if hire.status != "completed":
+    if row["status"] != "completed":
         raise HTTPException(
             status_code=400,
             detail="Hire is not completed"
         )
     
     # Check if the review already exists
-    review_query = Select(Reviews).where(
-        Condition().eq(Reviews.col("hire_id"), review_req.hire_id)
-    ).limit(1).get_query()
-    review = QueryHelper.fetch_one(review_query, session, Reviews)
-    if review:
+    if row["existing_id"] is not None:
         raise HTTPException(
             status_code=400,
             detail="Review already exists"
         )
     
-    review_data = ReviewData(
-        hire_id=review_req.hire_id,
-        rating=review_req.rating,
-        review=review_req.review
-    )
-
-    try:
-        new_review = QueryHelper.insert([review_data], Reviews, session)[0]
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail="Failed to create review"
-        )
-    session.commit()
+    new_review = ReviewData(**{name: row[name] for name in Reviews._fields()})
+    await session.commit()
 
+    await AsyncQueryHelper.load_deferred(Users, session, user, "profile_pic_url")
     return ReviewResponse(
         id=new_review.id,
         hire_id=new_review.hire_id,
@@ -85,56 +105,39 @@ async def create_review(
         reviewer_profile_pic=user.profile_pic_url
     )
 
-@router.get("/professional_reviews", response_model=List[ReviewResponse])
-async def get_professional_reviews(
-    user: UserDep,
-    session: SessionDep
-):
-    query = Select(
-        Reviews,
-        Reviews.all_cols(),
-        Users.col("username"),
-        Users.col("profile_pic_url")
-    ).join(Hires).join(Professionals).join(Users).where(
-        Condition().eq(Professionals.col("user_id"), user.id)
-    ).get_query()
-
-    res = QueryHelper.fetch_multiple_raw(query, session)
+def _review_query(condition: Condition) -> Query:
+    return Select(Reviews, *Reviews.all_cols()).join(Professionals).where(condition).get_query()
 
+async def _review_responses(reviews: List[ReviewData], loaders: Loaders) -> List[ReviewResponse]:
+    # Reviewers of all reviews in one query
+    reviewers = await loaders(Users, undefer=["profile_pic_url"]).load_many([r.client for r in reviews])
     return [
         ReviewResponse(
-            id=r['id'],
-            hire_id=r['hire_id'],
-            rating=r['rating'],
-            reviewer_name=r['username'],
-            reviewer_profile_pic=r['profile_pic_url'],
-            review=r['review']
-        ) for r in res
+            id=r.id,
+            hire_id=r.hire_id,
+            rating=r.rating,
+            reviewer_name=reviewer.username,
+            reviewer_profile_pic=reviewer.profile_pic_url,
+            review=r.review
+        ) for r, reviewer in zip(reviews, reviewers)
     ]
 
+@router.get("/professional_reviews", response_model=List[ReviewResponse])
+async def get_professional_reviews(
+    user: UserDep,
+    session: AsyncSessionDep,
+    loaders: AsyncLoaderDep
+):
+    query = _review_query(Condition().eq(Professionals.col("user_id"), user.id))
+    reviews = await AsyncQueryHelper.fetch_multiple(query, session, Reviews)
+    return await _review_responses(reviews, loaders)
+
 @router.get("/professionals/{professional_id}", response_model=List[ReviewResponse])
 async def get_professional_reviews_by_id(
     professional_id: int,
-    session: SessionDep
+    session: AsyncSessionDep,
+    loaders: AsyncLoaderDep
 ):
-    query = Select(
-        Reviews,
-        *Reviews.all_cols(),
-        Users.col("username"),
-        Users.col("profile_pic_url")
-    ).join(Hires).join(Professionals).join(Users).where(
-        Condition().eq(Professionals.col("id"), professional_id)
-    ).get_query()
-
-    res = QueryHelper.fetch_multiple_raw(query, session)
-
-    return [
-        ReviewResponse(
-            id=r['id'],
-            hire_id=r['hire_id'],
-            rating=r['rating'],
-            reviewer_name=r['username'],
-            reviewer_profile_pic=r['profile_pic_url'],
-            review=r['review']
-        ) for r in res
-    ]
+    query = _review_query(Condition().eq(Professionals.col("id"), professional_id))
+    reviews = await AsyncQueryHelper.fetch_multiple(query, session, Reviews)
+    return await _review_responses(reviews, loaders)
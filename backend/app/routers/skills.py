@@ -1,5 +1,5 @@
-from fastapi import APIRouter, HTTPException
-from ..dependencies import SessionDep, QueryHelper, Select, Condition
+from fastapi import APIRouter, Depends, HTTPException
+from ..dependencies import AsyncSessionDep, AsyncQueryHelper, Select, Condition, async_statement_timeout
 from ..models import Skills, SkillData
 from pydantic import BaseModel
 
@@ -16,18 +16,18 @@ class SkillResponse(BaseModel):
     description: Optional[str] = None
 
 @router.get("/", response_model=List[SkillResponse])
-async def get_skills(session: SessionDep):
+async def get_skills(session: AsyncSessionDep):
     query = Select(Skills).get_query().set_end()
-    skills: List[SkillData] = QueryHelper.fetch_multiple(query, session, Skills)
+    skills: List[SkillData] = await AsyncQueryHelper.fetch_multiple(query, session, Skills)
 
     return [SkillResponse(id=skill.id, name=skill.name, description=skill.description) for skill in skills]
 
 @router.get("/{skill_id}", response_model=SkillResponse)
-async def get_skill(skill_id: int, session: SessionDep):
+async def get_skill(skill_id: int, session: AsyncSessionDep):
     query = Select(Skills).where(
         Condition().eq(Skills.col("id"), skill_id)
     ).limit(1).get_query()
-    skill: SkillData = QueryHelper.fetch_one(query, session, Skills)
+    skill: SkillData = await AsyncQueryHelper.fetch_one(query, session, Skills)
 
     if not skill:
         raise HTTPException(
@@ -38,11 +38,11 @@ async def get_skill(skill_id: int, session: SessionDep):
     return SkillResponse(id=skill.id, name=skill.name, description=skill.description)
 
 @router.get("/name/{skill_name}", response_model=SkillResponse)
-async def get_skill_by_name(skill_name: str, session: SessionDep):
+async def get_skill_by_name(skill_name: str, session: AsyncSessionDep):
     query = Select(Skills).where(
         Condition().ilike(Skills.col("name"), skill_name)
     ).limit(1).get_query()
-    skill: SkillData = QueryHelper.fetch_one(query, session, Skills)
+    skill: SkillData = await AsyncQueryHelper.fetch_one(query, session, Skills)
 
     if not skill:
         raise HTTPException(
@@ -52,11 +52,13 @@ async def get_skill_by_name(skill_name: str, session: SessionDep):
     
     return SkillResponse(id=skill.id, name=skill.name, description=skill.description)
 
-@router.get("/search/{search_query}", response_model=List[SkillResponse])
-async def search_skill(search_query: str, session: SessionDep):
+# ILIKE scans the table, so searches get a tight budget and stop when the client leaves
+@router.get("/search/{search_query}", response_model=List[SkillResponse],
+            dependencies=[Depends(async_statement_timeout(2000), scope="function")])
+async def search_skill(search_query: str, session: AsyncSessionDep):
     query = Select(Skills).where(
         Condition().ilike(Skills.col("name"), search_query)
     ).get_query()
-    skills: List[SkillData] = QueryHelper.fetch_multiple(query, session, Skills)
+    skills: List[SkillData] = await AsyncQueryHelper.fetch_multiple(query, session, Skills)
 
     return [SkillResponse(id=skill.id, name=skill.name, description=skill.description) for skill in skills]
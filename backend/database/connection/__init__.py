@@ -1,2 +1,4 @@
 from .database_connection import DatabaseConnection as DBConnection
-from .postgres_connection import PostgresDatabaseConnection as PostgresConnection
\ No newline at end of file
+from .postgres_connection import PostgresDatabaseConnection as PostgresConnection
+from .psycopg_connection import PsycopgDatabaseConnection as PsycopgConnection
+from .prepared import PreparedStats, StatementCache
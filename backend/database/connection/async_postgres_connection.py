@@ -0,0 +1,50 @@
+from .postgres_connection import PostgresConfig, PostgresConfigSchema
+import psycopg
+from psycopg.adapt import Dumper
+from psycopg.conninfo import make_conninfo
+from psycopg2.extensions import AsIs
+
+from marshmallow import ValidationError
+
+import sys
+from typing import Any, Dict
+
+# Connection prepare_threshold for statements that are only prepared when executed with
+# prepare=True; None would turn that off as well
+MANUAL_PREPARE = sys.maxsize
+
+class AsIsDumper(Dumper):
+    """Let psycopg 3 splice psycopg2 ``AsIs`` values (identifiers, SQL fragments) verbatim."""
+
+    def dump(self, obj: AsIs) -> bytes:
+        return obj.getquoted()
+
+    def quote(self, obj: AsIs) -> bytes:
+        return obj.getquoted()
+
+def make_async_conninfo(config: Dict[str, str] | None = None, url: str | None = None) -> str:
+    """Build a libpq connection string from a postgres config dict or url."""
+    if config:
+        try:
+            conf: PostgresConfig = PostgresConfigSchema().load(config)
+        except ValidationError as e:
+            raise ValueError(f"PostgresConfiguration: {e}")
+        return make_conninfo(
+            dbname=conf.database,
+            user=conf.user,
+            password=conf.password,
+            host=conf.host,
+            port=conf.port
+        )
+    elif url:
+        return url
+    raise ValueError("Either config or url must be provided")
+
+def async_connection_kwargs(autocommit: bool) -> Dict[str, Any]:
+    """Connection options: tuple rows, and the default cursors that bind parameters on the server."""
+    return {
+        'autocommit': autocommit
+    }
+
+async def configure_async_connection(connection: psycopg.AsyncConnection) -> None:
+    connection.adapters.register_dumper(AsIs, AsIsDumper)
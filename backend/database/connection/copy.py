@@ -0,0 +1,68 @@
+from datetime import date, datetime, time
+import io
+import json
+from typing import Any, Iterable, Iterator, Sequence
+
+# Characters with a meaning in COPY's text format
+_COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+def _array_item(value: Any) -> str:
+    if value is None:
+        return 'NULL'
+    if isinstance(value, (list, tuple)):
+        return _array(value)
+    text = _plain(value)
+    return '"' + text.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+def _array(values: Sequence[Any]) -> str:
+    return '{' + ','.join(_array_item(value) for value in values) + '}'
+
+def _plain(value: Any) -> str:
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (list, tuple)):
+        return _array(value)
+    if isinstance(value, dict):
+        return json.dumps(value)
+    return str(value)
+
+def copy_text(value: Any) -> str:
+    """``value`` as a field of COPY's text format."""
+    if value is None:
+        return '\\N'
+    kind = type(value)
+    if kind is str:
+        return value.translate(_COPY_ESCAPES)
+    if kind is int:
+        return str(value)
+    return _plain(value).translate(_COPY_ESCAPES)
+
+class CopyStream(io.RawIOBase):
+    """File-like reader that encodes rows for ``COPY ... FROM STDIN`` as they are read, so
+    the whole input never has to be in memory at once."""
+
+    def __init__(self, rows: Iterable[Sequence[Any]]):
+        self._rows: Iterator[Sequence[Any]] = iter(rows)
+        self._buffer = b''
+        self.count = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        lines = [self._buffer]
+        length = len(self._buffer)
+        for row in self._rows:
+            line = ('\t'.join([copy_text(value) for value in row]) + '\n').encode('utf-8')
+            self.count += 1
+            lines.append(line)
+            length += len(line)
+            if 0 <= size <= length:
+                break
+        data = b''.join(lines)
+        if size < 0:
+            size = len(data)
+        chunk, self._buffer = data[:size], data[size:]
+        return chunk
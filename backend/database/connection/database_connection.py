@@ -1,17 +1,69 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Tuple, Union
+from typing import Dict, Any, Iterable, Optional, Sequence, Tuple, Type, Union
 
 import psycopg2
 from psycopg2.extensions import cursor as psycopg2_cursor
+import time
+
+from .prepared import PreparedStats, StatementCache
 
 class DatabaseConnection(ABC):
-    def __init__(self, config: Dict[str, str] | None = None, url: str | None = None, autocommit: bool = True):
-        if config:
-            self.initialize_connection(config, autocommit=autocommit)
-        elif url:
-            self.initialize_connection_url(url, autocommit=autocommit)
-        else:
+    # Driver exception types, so engine code can handle errors without knowing the driver
+    Error: Type[Exception] = psycopg2.Error
+    OperationalError: Type[Exception] = psycopg2.OperationalError
+    InterfaceError: Type[Exception] = psycopg2.InterfaceError
+
+    # Whether one execute() may carry several ';' separated statements
+    multi_statement = True
+    # Whether the connection has a pipeline() context manager that sends independent statements in one round trip
+    supports_pipeline = False
+    # Whether cursors prepare statements themselves when executed with prepare=True
+    native_prepare = False
+    # Most parameters one statement may bind on the server, None when the driver binds on the client
+    max_params: Optional[int] = None
+
+    def __init__(self, config: Dict[str, str] | None = None, url: str | None = None, autocommit: bool = True,
+                 retries: int = 0, backoff: float = 0.1, prepare_threshold: Optional[int] = None,
+                 prepared_max: int = 100, prepared_stats: Optional[PreparedStats] = None):
+        if not config and not url:
             raise ValueError("Either config or url must be provided")
+        self._init_config = config
+        self._init_url = url
+        self._autocommit = autocommit
+        self._retries = retries
+        self._backoff = backoff
+        # statement_timeout set for the whole connection session, used by autocommit connections
+        self.session_timeout: Optional[int] = None
+        # Server-side prepared statements for templates executed at least prepare_threshold times
+        self.statements: Optional[StatementCache] = None
+        if prepare_threshold:
+            self.statements = StatementCache(prepare_threshold, prepared_max, prepared_stats)
+        self._connect()
+
+    def _connect(self) -> None:
+        """Open the connection, retrying with exponential backoff on connection errors."""
+        for attempt in range(self._retries + 1):
+            try:
+                if self._init_config:
+                    self.initialize_connection(self._init_config, autocommit=self._autocommit)
+                else:
+                    self.initialize_connection_url(self._init_url, autocommit=self._autocommit)
+                return
+            except self.OperationalError:
+                if attempt == self._retries:
+                    raise
+                time.sleep(self._backoff * (2 ** attempt))
+
+    def reconnect(self) -> None:
+        """Drop the current connection and open a new one."""
+        try:
+            self.close_connection()
+        except Exception:
+            pass
+        self.session_timeout = None
+        if self.statements is not None:
+            self.statements.clear()
+        self._connect()
 
     @abstractmethod
     def initialize_connection(self, config: Dict[str, str], autocommit: bool) -> None:
@@ -25,12 +77,60 @@ class DatabaseConnection(ABC):
     def cursor(self) -> psycopg2_cursor:
         pass
 
+    @abstractmethod
+    def named_cursor(self, name: str, withhold: bool = False) -> psycopg2_cursor:
+        """Server-side cursor that fetches its rows in batches."""
+        pass
+
+    @abstractmethod
+    def mogrify(self, query: str, params: Any) -> str:
+        """Bind ``params`` into ``query`` on the client."""
+        pass
+
+    @property
+    @abstractmethod
+    def autocommit(self) -> bool:
+        pass
+
+    @abstractmethod
+    def in_transaction(self) -> bool:
+        """Whether a transaction is open, including a failed one waiting for rollback."""
+        pass
+
+    @abstractmethod
+    def commit(self) -> None:
+        pass
+
+    @abstractmethod
+    def rollback(self) -> None:
+        pass
+
+    @abstractmethod
+    def copy_from(self, cursor: psycopg2_cursor, query: str, rows: Iterable[Sequence[Any]]) -> int:
+        """Run ``COPY ... FROM STDIN`` on ``cursor``, streaming ``rows`` to the server; returns the row count."""
+        pass
+
     @abstractmethod
     def close_connection(self) -> None:
         pass
 
+    @abstractmethod
+    def is_usable(self) -> bool:
+        """Cheap local check that the connection is open and not in an unknown state."""
+        pass
+
+    @abstractmethod
+    def ping(self) -> bool:
+        """Round trip to the server to check the connection is alive."""
+        pass
+
+    @abstractmethod
+    def cancel(self) -> None:
+        """Ask the server to cancel the statement currently running on this connection."""
+        pass
+
     def _debug_execute(self, query: str) -> psycopg2_cursor:
         cursor = self.cursor()
         cursor.execute(query)
         return cursor
-    
\ No newline at end of file
+    
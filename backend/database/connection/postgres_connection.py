@@ -1,12 +1,14 @@
 from .database_connection import DatabaseConnection
+from .copy import CopyStream
 import psycopg2
 from psycopg2.extensions import cursor as psycopg2_cursor
 import psycopg2.extras
+import psycopg2.extensions
 
 from dataclasses import dataclass, field
 from marshmallow import Schema, fields, post_load, ValidationError
 
-from typing import Dict
+from typing import Any, Dict, Iterable, Sequence
 
 @dataclass
 class PostgresConfig:
@@ -44,21 +46,70 @@ class PostgresDatabaseConnection(DatabaseConnection):
             user=self.config.user,
             password=self.config.password,
             host=self.config.host,
-            port=self.config.port,
-            cursor_factory=psycopg2.extras.RealDictCursor
+            port=self.config.port
         )
         self.connection.autocommit = autocommit
+        self._mogrify_cursor = None
 
     def initialize_connection_url(self, url: str, autocommit: bool):
-        self.connection = psycopg2.connect(url, cursor_factory=psycopg2.extras.RealDictCursor)
+        self.connection = psycopg2.connect(url)
         self.connection.autocommit = autocommit
+        self._mogrify_cursor = None
 
     def cursor(self) -> psycopg2_cursor:
         return self.connection.cursor()
+
+    def named_cursor(self, name: str, withhold: bool = False) -> psycopg2_cursor:
+        return self.connection.cursor(name=name, withhold=withhold)
+
+    def mogrify(self, query: str, params: Any) -> str:
+        if self._mogrify_cursor is None:
+            self._mogrify_cursor = self.connection.cursor()
+        return self._mogrify_cursor.mogrify(query, params).decode("utf-8")
+
+    def copy_from(self, cursor: psycopg2_cursor, query: str, rows: Iterable[Sequence[Any]]) -> int:
+        # psycopg2 reads the COPY data from a file, the stream formats rows as it is read
+        stream = CopyStream(rows)
+        cursor.copy_expert(query, stream, size=1 << 16)
+        return stream.count
+
+    @property
+    def autocommit(self) -> bool:
+        return self.connection.autocommit
+
+    def in_transaction(self) -> bool:
+        return self.connection.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def commit(self) -> None:
+        self.connection.commit()
+
+    def rollback(self) -> None:
+        self.connection.rollback()
     
     def close_connection(self):
         self.connection.close()
 
+    def is_usable(self) -> bool:
+        return self.connection.closed == 0 and \
+            self.connection.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN
+
+    def ping(self) -> bool:
+        if not self.is_usable():
+            return False
+        try:
+            idle = not self.in_transaction()
+            with self.connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            if idle and not self.connection.autocommit:
+                self.connection.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def cancel(self) -> None:
+        if self.connection.closed == 0:
+            self.connection.cancel()
+
     def __enter__(self) -> 'PostgresDatabaseConnection':
         return self
     
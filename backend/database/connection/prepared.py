@@ -0,0 +1,125 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import itertools
+import re
+import threading
+from typing import Optional, Tuple
+
+_PLACEHOLDER = re.compile(r"%%|%s")
+
+def to_positional(sql: str, templated: bool = True) -> Tuple[str, int]:
+    """Turn a ``%s`` template into ``$n`` form for PREPARE; returns it and the number of parameters."""
+    if not templated:
+        return sql, 0
+    count = 0
+
+    def replace(match: re.Match) -> str:
+        nonlocal count
+        if match.group(0) == '%%':
+            return '%'
+        count += 1
+        return f"${count}"
+
+    return _PLACEHOLDER.sub(replace, sql), count
+
+@dataclass
+class PreparedStats:
+    """Counters shared by the statement caches of an engine's connections."""
+    hits: int = 0
+    misses: int = 0
+    prepared: int = 0
+    evictions: int = 0
+    failures: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def add(self, **counts: int) -> None:
+        with self._lock:
+            for name, count in counts.items():
+                setattr(self, name, getattr(self, name) + count)
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of eligible executions that ran a prepared statement."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def snapshot(self) -> 'PreparedStats':
+        with self._lock:
+            return PreparedStats(self.hits, self.misses, self.prepared, self.evictions, self.failures)
+
+class PreparedStatement:
+    __slots__ = ('name', 'sql', 'execute_sql')
+
+    def __init__(self, name: str, sql: str, param_count: int):
+        self.name = name
+        self.sql = sql  # Positional form sent with PREPARE
+        # Takes the same parameter sequence as the template
+        args = ", ".join(["%s"] * param_count)
+        self.execute_sql = f"EXECUTE {name} ({args})" if param_count else f"EXECUTE {name}"
+
+class StatementCache:
+    """Per-connection LRU of server-side prepared statements.
+
+    A template is prepared once it was executed ``threshold`` times on the connection;
+    when more than ``max_size`` are prepared the least recently used one is deallocated.
+    Prepared statements outlive transactions but not the connection, so the cache is
+    cleared on reconnect.
+    """
+
+    def __init__(self, threshold: int = 5, max_size: int = 100, stats: Optional[PreparedStats] = None):
+        self.threshold = threshold
+        self.max_size = max_size
+        self.stats = stats or PreparedStats()
+        self._names = itertools.count(1)
+        self._prepared: 'OrderedDict[str, PreparedStatement]' = OrderedDict()
+        # Executions of templates that are not prepared yet, None for ones the server refused
+        self._seen: 'OrderedDict[str, Optional[int]]' = OrderedDict()
+
+    def get(self, sql: str) -> Optional[PreparedStatement]:
+        statement = self._prepared.get(sql)
+        if statement is not None:
+            self._prepared.move_to_end(sql)
+            self.stats.add(hits=1)
+        return statement
+
+    def seen(self, sql: str) -> bool:
+        """Count an execution of an unprepared template, True when it should be prepared now."""
+        self.stats.add(misses=1)
+        count = self._seen.pop(sql, 0)
+        if count is None:
+            self._seen[sql] = None
+            return False
+        count += 1
+        if count >= self.threshold:
+            return True
+        self._seen[sql] = count
+        # Only remember a bounded number of candidates
+        if len(self._seen) > self.max_size * 4:
+            self._seen.popitem(last=False)
+        return False
+
+    def add(self, sql: str, templated: bool = True) -> Tuple[PreparedStatement, Optional[str]]:
+        """Register ``sql`` as prepared; returns it and the name of an evicted statement to deallocate."""
+        positional, param_count = to_positional(sql, templated)
+        statement = PreparedStatement(f"qh_{next(self._names)}", positional, param_count)
+        self._prepared[sql] = statement
+        evicted = None
+        if len(self._prepared) > self.max_size:
+            _, old = self._prepared.popitem(last=False)
+            evicted = old.name
+            self.stats.add(evictions=1)
+        self.stats.add(prepared=1)
+        return statement, evicted
+
+    def discard(self, sql: str) -> None:
+        """The server rejected the template; don't try to prepare it again."""
+        self._prepared.pop(sql, None)
+        self._seen[sql] = None
+        self.stats.add(failures=1)
+
+    def clear(self) -> None:
+        self._prepared.clear()
+        self._seen.clear()
+
+    def __len__(self) -> int:
+        return len(self._prepared)
@@ -0,0 +1,110 @@
+from .database_connection import DatabaseConnection
+from .async_postgres_connection import make_async_conninfo, AsIsDumper, MANUAL_PREPARE
+import psycopg
+from psycopg import ClientCursor, Cursor, ServerCursor
+from psycopg.pq import TransactionStatus
+from psycopg2.extensions import AsIs
+
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, Sequence
+
+class PsycopgDatabaseConnection(DatabaseConnection):
+    """Connection on psycopg 3.
+
+    Results are transferred in binary format and parsed by psycopg's C loaders, and
+    parameters passed to ``execute`` are bound on the server. ``mogrify`` binds on the
+    client with the same placeholders and ``AsIs`` fragments as psycopg2.
+    """
+
+    Error = psycopg.Error
+    OperationalError = psycopg.OperationalError
+    InterfaceError = psycopg.InterfaceError
+
+    # Statements sent with the extended protocol can't be ';' separated
+    multi_statement = False
+    supports_pipeline = True
+    native_prepare = True
+    # Bind messages count parameters in 16 bits
+    max_params = 65535
+
+    def initialize_connection(self, config: Dict[str, str], autocommit: bool):
+        self._open(make_async_conninfo(config=config), autocommit)
+
+    def initialize_connection_url(self, url: str, autocommit: bool):
+        self._open(url, autocommit)
+
+    def _open(self, conninfo: str, autocommit: bool) -> None:
+        self.connection = psycopg.connect(conninfo, autocommit=autocommit)
+        self.connection.adapters.register_dumper(AsIs, AsIsDumper)
+        # Statements are prepared when the session's statement cache says so, not automatically
+        self.connection.prepare_threshold = MANUAL_PREPARE if self.statements is not None else None
+        if self.statements is not None:
+            self.connection.prepared_max = self.statements.max_size
+        self._client_cursor = ClientCursor(self.connection)
+
+    def cursor(self) -> Cursor:
+        return self.connection.cursor(binary=True)
+
+    def named_cursor(self, name: str, withhold: bool = False) -> ServerCursor:
+        return self.connection.cursor(name=name, withhold=withhold, binary=True)
+
+    def mogrify(self, query: str, params: Any) -> str:
+        return self._client_cursor.mogrify(query, params)
+
+    def copy_from(self, cursor: Cursor, query: str, rows: Iterable[Sequence[Any]]) -> int:
+        count = 0
+        with cursor.copy(query) as copy:
+            for row in rows:
+                copy.write_row(row)
+                count += 1
+        return count
+
+    @property
+    def autocommit(self) -> bool:
+        return self.connection.autocommit
+
+    def in_transaction(self) -> bool:
+        return self.connection.info.transaction_status != TransactionStatus.IDLE
+
+    def commit(self) -> None:
+        self.connection.commit()
+
+    def rollback(self) -> None:
+        self.connection.rollback()
+
+    @contextmanager
+    def pipeline(self) -> Iterator[None]:
+        with self.connection.pipeline():
+            yield
+
+    def close_connection(self):
+        self.connection.close()
+
+    def is_usable(self) -> bool:
+        return not self.connection.closed and \
+            self.connection.info.transaction_status != TransactionStatus.UNKNOWN
+
+    def ping(self) -> bool:
+        if not self.is_usable():
+            return False
+        try:
+            idle = not self.in_transaction()
+            self.connection.execute("SELECT 1")
+            if idle and not self.connection.autocommit:
+                self.connection.rollback()
+            return True
+        except psycopg.Error:
+            return False
+
+    def cancel(self) -> None:
+        if not self.connection.closed:
+            self.connection.cancel_safe()
+
+    def __enter__(self) -> 'PsycopgDatabaseConnection':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close_connection()
+
+    def __str__(self):
+        return f"PsycopgDatabaseConnection(autocommit={self.autocommit})"
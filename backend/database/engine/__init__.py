@@ -1,2 +1,9 @@
 from .engine import DatabaseEngine as DBEngine
 from .session import Session as DBSession
+from .pool import ConnectionPool, PoolConfig, PoolStats, PoolTimeout
+from .async_engine import AsyncDatabaseEngine as AsyncDBEngine
+from .async_session import AsyncSession as AsyncDBSession
+from .replicas import ReplicaSet, AsyncReplicaSet, format_lsn, parse_lsn
+from .rows import RowDescriptor
+from .shards import ShardedEngine, ShardedSession, ShardKeyError, HashRing
+from .slow_queries import SlowQueryLog, SlowQuery, SlowQueryStats
@@ -0,0 +1,129 @@
+from ..connection.async_postgres_connection import make_async_conninfo, async_connection_kwargs, configure_async_connection, \
+    MANUAL_PREPARE
+from ..connection.prepared import PreparedStats, StatementCache
+from .async_session import AsyncSession
+from .replicas import AsyncReplicaSet
+from .slow_queries import SlowQueryLog
+from .pool import PoolConfig, PoolConfigSchema
+from psycopg_pool import AsyncConnectionPool
+import psycopg
+
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+import weakref
+
+class AsyncDatabaseEngine:
+    """Engine for ``async def`` code paths, backed by a psycopg 3 async connection pool.
+
+    Queries are built with the same ``Query``/``Select`` builders as the sync engine;
+    only execution is awaited, so a single worker can keep many requests in flight.
+    """
+
+    def __init__(self, config: Dict[str, str] | None = None, url: str | None = None, autocommit: bool = False, log: bool = False,
+                 pool: Union[PoolConfig, Dict[str, Any], None] = None,
+                 replicas: Optional[List[Union[Dict[str, str], str]]] = None, statement_timeout: Optional[int] = None,
+                 prepare_threshold: Optional[int] = None, prepared_max: int = 100,
+                 slow_query_ms: Optional[float] = None, slow_query_sample: float = 0.1):
+        if pool is None:
+            pool = PoolConfig()
+        elif isinstance(pool, dict):
+            pool = PoolConfigSchema().load(pool)
+
+        self.log = log
+        self.statement_timeout = statement_timeout  # Default for new sessions, in milliseconds
+        # Templates run this many times on a connection become prepared statements, None disables it
+        self.prepare_threshold = prepare_threshold
+        self.prepared_max = prepared_max
+        self._prepared_stats = PreparedStats()
+        # Statement cache of each pooled connection, dropped along with the connection
+        self._statements: 'weakref.WeakKeyDictionary[psycopg.AsyncConnection, StatementCache]' = \
+            weakref.WeakKeyDictionary()
+        # Statements taking slow_query_ms or longer are recorded along with a sampled plan
+        self.slow_queries: Optional[SlowQueryLog] = \
+            SlowQueryLog(slow_query_ms, explain_sample=slow_query_sample) if slow_query_ms is not None else None
+        self.pool = self._make_pool(config, url, autocommit, pool)
+        self.replicas: Optional[AsyncReplicaSet] = None
+        if replicas:
+            # Replicas only serve single statement reads, so they don't need transactions
+            self.replicas = AsyncReplicaSet([
+                self._make_pool(None, replica, True, pool) if isinstance(replica, str)
+                else self._make_pool(replica, None, True, pool)
+                for replica in replicas
+            ])
+        self._active = False
+
+    def _make_pool(self, config: Dict[str, str] | None, url: str | None, autocommit: bool,
+                   pool: PoolConfig) -> AsyncConnectionPool:
+        return AsyncConnectionPool(
+            make_async_conninfo(config=config, url=url),
+            min_size=pool.min_size,
+            max_size=pool.max_size,
+            timeout=pool.timeout,
+            max_idle=pool.max_idle,
+            max_lifetime=pool.max_lifetime,
+            kwargs=async_connection_kwargs(autocommit),
+            configure=self._configure,
+            check=AsyncConnectionPool.check_connection if pool.pre_ping else None,
+            open=False
+        )
+
+    async def _configure(self, connection: psycopg.AsyncConnection) -> None:
+        await configure_async_connection(connection)
+        # Statements are prepared when the session's statement cache says so, not automatically
+        connection.prepare_threshold = MANUAL_PREPARE if self.prepare_threshold else None
+        connection.prepared_max = self.prepared_max
+
+    def _statement_cache(self, connection: psycopg.AsyncConnection) -> Optional[StatementCache]:
+        if not self.prepare_threshold:
+            return None
+        statements = self._statements.get(connection)
+        if statements is None:
+            statements = self._statements[connection] = \
+                StatementCache(self.prepare_threshold, self.prepared_max, self._prepared_stats)
+        return statements
+
+    async def open(self) -> 'AsyncDatabaseEngine':
+        if not self._active:
+            await self.pool.open()
+            if self.replicas:
+                await self.replicas.open()
+            self._active = True
+        return self
+
+    async def __aenter__(self) -> 'AsyncDatabaseEngine':
+        return await self.open()
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def session(self, read_after: Optional[int] = None) -> AsyncSession:
+        """New session; with replicas, ``read_after`` is the WAL position its replica reads
+        have to see, e.g. from an earlier session's ``write_lsn``."""
+        return AsyncSession(self.pool, log=self.log, statement_timeout=self.statement_timeout,
+                            slow_queries=self.slow_queries, statements=self._statement_cache,
+                            replicas=self.replicas, read_after=read_after)
+
+    @asynccontextmanager
+    async def transaction(self, read_after: Optional[int] = None) -> AsyncIterator[AsyncSession]:
+        """Session that commits when the block succeeds and rolls back when it raises."""
+        async with self.session(read_after) as session:
+            try:
+                yield session
+            except BaseException:
+                try:
+                    await session.rollback()
+                except psycopg.Error:
+                    pass
+                raise
+            await session.commit()
+
+    def prepared_stats(self) -> Optional[PreparedStats]:
+        """Prepared statement hits and misses over all connections, None when preparing is off."""
+        return self._prepared_stats.snapshot() if self.prepare_threshold else None
+
+    async def close(self):
+        if self._active:
+            self._active = False
+            await self.pool.close()
+            if self.replicas:
+                await self.replicas.close()
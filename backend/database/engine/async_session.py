@@ -0,0 +1,353 @@
+from psycopg import AsyncConnection, AsyncClientCursor, AsyncCursor
+from psycopg.pq import TransactionStatus
+from psycopg_pool import AsyncConnectionPool
+import psycopg
+
+import itertools
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, TYPE_CHECKING
+
+from ..connection.prepared import StatementCache
+from .rows import RowDescriptor
+from .session import set_timeout_sql, _loggable, T
+from .slow_queries import explain_sql, explainable, fingerprint, parse_plan
+
+if TYPE_CHECKING:
+    from .replicas import AsyncReplicaSet
+    from .slow_queries import SlowQueryLog
+
+_stream_ids = itertools.count(1)
+_UNSET = object()
+
+# Bind messages count parameters in 16 bits
+MAX_PARAMS = 65535
+
+class AsyncSession:
+    def __init__(self, pool: AsyncConnectionPool, log: bool = False, statement_timeout: Optional[int] = None,
+                 slow_queries: Optional['SlowQueryLog'] = None,
+                 statements: Optional[Callable[[AsyncConnection], Optional[StatementCache]]] = None,
+                 replicas: Optional['AsyncReplicaSet'] = None, read_after: Optional[int] = None):
+        self._pool = pool
+        self.connection: Optional[AsyncConnection] = None
+        self._cursor: Optional[AsyncCursor] = None
+        self._last_cursor: Optional[AsyncCursor] = None
+        self.log = log
+        self._active = False
+        self._replicas = replicas
+        self._replica: Optional[Tuple[int, AsyncConnection]] = None
+        self._replica_cursor: Optional[AsyncCursor] = None
+        self._wrote = False
+        self._unrecorded_write = False
+        # Replica reads have to see the primary up to this WAL position, e.g. the client's last write
+        self.read_after = read_after
+        # Primary WAL position after this session's last committed write, see ``ReplicaSet``
+        self.write_lsn: Optional[int] = None
+        # Milliseconds a statement may run before the server cancels it, None for the server default
+        self.statement_timeout = statement_timeout
+        self._applied_timeout: Optional[int] = None
+        # Settings made for whole autocommit connections, by id(); a pooled connection may carry
+        # another session's, so each session makes its own once
+        self._session_timeouts: Dict[int, Optional[int]] = {}
+        self._slow_queries = slow_queries
+        self._statement_caches = statements
+
+    @property
+    def cursor(self) -> AsyncCursor:
+        """Cursor of the connection that ran the last statement."""
+        return self._last_cursor
+
+    @property
+    def has_written(self) -> bool:
+        return self._wrote
+
+    async def open(self) -> 'AsyncSession':
+        if not self._active:
+            self.connection = await self._pool.getconn()
+            self._cursor = self._last_cursor = self.connection.cursor()
+            self._active = True
+        return self
+
+    async def __aenter__(self) -> 'AsyncSession':
+        return await self.open()
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        if not self._active:
+            return
+        self._active = False
+        try:
+            await self._cursor.close()
+            await self._release_replica()
+            if self._unrecorded_write and self.connection.autocommit:
+                await self._record_write()
+            if self.connection.info.transaction_status != TransactionStatus.IDLE:
+                await self.connection.rollback()
+        finally:
+            await self._pool.putconn(self.connection)
+
+    async def commit(self) -> None:
+        await self.connection.commit()
+        if self._unrecorded_write:
+            await self._record_write()
+
+    async def rollback(self) -> None:
+        await self.connection.rollback()
+
+    def mogrify(self, query_str: str, params: Any) -> str:
+        # Statements bind on the server, this one only renders the text
+        return AsyncClientCursor(self.connection).mogrify(query_str, params)
+
+    async def cancel(self) -> None:
+        """Cancel the statement running on this session's connections."""
+        if not self._active:
+            return
+        replica = self._replica
+        for connection in (self.connection, replica[1] if replica is not None else None):
+            if connection is not None and not connection.closed:
+                await connection.cancel_safe()
+
+    def _timeout_setting(self, connection: AsyncConnection, timeout: Optional[int]) -> Optional[str]:
+        """Statement to send ahead of the next one so it runs under ``timeout`` ms, if any."""
+        if timeout is None:
+            timeout = self.statement_timeout
+        if connection.autocommit:
+            # Separate statements don't share a transaction; set it for the connection instead
+            if self._session_timeouts.get(id(connection), _UNSET) == timeout:
+                return None
+            self._session_timeouts[id(connection)] = timeout
+            return set_timeout_sql(timeout, local=False)
+        if connection.info.transaction_status == TransactionStatus.IDLE:
+            self._applied_timeout = None
+        if timeout == self._applied_timeout:
+            return None
+        self._applied_timeout = timeout
+        return set_timeout_sql(timeout)
+
+    async def _send(self, connection: AsyncConnection,
+                    statements: Sequence[Tuple[AsyncCursor, str, Optional[Sequence[Any]]]],
+                    timeout: Optional[int], prepare: bool = False) -> None:
+        """Execute ``(cursor, query, params)`` statements under the statement timeout in one round trip.
+
+        Server side binding takes one statement per message, so the setting goes ahead of them
+        in the same pipeline. ``prepare`` runs them as prepared statements.
+        """
+        setting = self._timeout_setting(connection, timeout)
+        if setting is None and len(statements) == 1:
+            statement_cursor, query_str, params = statements[0]
+            await statement_cursor.execute(query_str, params, prepare=prepare or None)
+            return
+
+        async with AsyncCursor(connection) as setting_cursor:
+            async with connection.pipeline():
+                if setting:
+                    await setting_cursor.execute(setting)
+                for statement_cursor, query_str, params in statements:
+                    await statement_cursor.execute(query_str, params, prepare=prepare or None)
+
+    def _hot(self, connection: AsyncConnection, query_str: str, params: Optional[Sequence[Any]]) -> bool:
+        """Whether a template should run as a prepared statement on ``connection``, see
+        ``Session._statement``. psycopg prepares it on execute and keeps its own LRU of the same size."""
+        statements = self._statement_caches(connection) if self._statement_caches is not None else None
+        # Tuples expand to value lists, so their length is part of the SQL and can't be a parameter
+        if statements is None or (params is not None and any(isinstance(value, tuple) for value in params)):
+            return False
+        if statements.get(query_str) is not None:
+            return True
+        if not statements.seen(query_str):
+            return False
+        statements.add(query_str, params is not None)
+        return True
+
+    async def _record_write(self) -> None:
+        """Note in ``write_lsn`` how far a replica has to replay the primary's WAL to see this session's writes."""
+        self._unrecorded_write = False
+        if not self._replicas or self.connection.closed:
+            return
+        from .replicas import parse_lsn
+        try:
+            idle = self.connection.info.transaction_status == TransactionStatus.IDLE
+            async with AsyncCursor(self.connection) as lsn_cursor:
+                await lsn_cursor.execute("SELECT pg_current_wal_lsn()::text")
+                self.write_lsn = parse_lsn((await lsn_cursor.fetchone())[0])
+            if idle and not self.connection.autocommit:
+                await self.connection.rollback()
+        except psycopg.Error:
+            pass
+
+    async def _read_cursor(self) -> Optional[AsyncCursor]:
+        """Cursor on a caught-up replica, or None when reads have to go to the primary."""
+        if not self._replicas or self._wrote:
+            return None
+        if self._replica is None:
+            self._replica = await self._replicas.lease(self.read_after or 0)
+            if self._replica is None:
+                return None
+            self._replica_cursor = self._replica[1].cursor()
+        return self._replica_cursor
+
+    async def _release_replica(self) -> None:
+        if self._replica is None:
+            return
+        index, connection = self._replica
+        self._replica = None
+        self._session_timeouts.pop(id(connection), None)
+        try:
+            await self._replica_cursor.close()
+        except psycopg.Error:
+            pass
+        self._replica_cursor = None
+        await self._replicas.release(index, connection)
+
+    async def _mark_write(self) -> None:
+        # Writes and raw statements go to the primary and pin the session to it
+        self._wrote = True
+        self._unrecorded_write = True
+        await self._release_replica()
+
+    async def execute(self, query_str: str, force_log=False, read_only: bool = False, timeout: Optional[int] = None,
+                      params: Optional[Sequence[Any]] = None, prepare: bool = False):
+        """Run a statement. ``params`` are bound on the server.
+
+        ``read_only`` statements may be served by a replica, see ``Session.execute``. With
+        ``prepare``, sessions with a statement cache run the statement as a prepared statement
+        once it is hot.
+        """
+        if force_log or self.log:
+            print(f"Execuring query: {_loggable(query_str, params)}")
+        statement_str, statement_params = query_str, params
+        if params is not None and len(params) > MAX_PARAMS:
+            # Too many for one Bind message, e.g. a large multi-row insert; bind them on the client instead
+            statement_str, statement_params = self.mogrify(query_str, params), None
+            prepare = False
+
+        async def send(connection: AsyncConnection, statement_cursor: AsyncCursor) -> None:
+            start = time.perf_counter()
+            await self._send(connection, [(statement_cursor, statement_str, statement_params)], timeout,
+                             prepare=prepare and self._hot(connection, query_str, params))
+            if self._slow_queries is not None:
+                await self._capture_slow(connection, query_str, params, (time.perf_counter() - start) * 1000)
+
+        if read_only:
+            replica_cursor = await self._read_cursor()
+            if replica_cursor is not None:
+                try:
+                    await send(self._replica[1], replica_cursor)
+                    self._last_cursor = replica_cursor
+                    return
+                except (psycopg.OperationalError, psycopg.InterfaceError):
+                    # Lost the replica, serve this read from the primary
+                    await self._release_replica()
+        else:
+            await self._mark_write()
+
+        try:
+            await send(self.connection, self._cursor)
+        finally:
+            self._last_cursor = self._cursor
+
+    async def _capture_slow(self, connection: AsyncConnection, query_str: str, params: Optional[Sequence[Any]],
+                            duration_ms: float) -> None:
+        log = self._slow_queries
+        if not log.is_slow(duration_ms):
+            return
+        query_fingerprint = fingerprint(query_str)
+        plan = None
+        too_many_params = params is not None and len(params) > MAX_PARAMS
+        if explainable(query_str) and not too_many_params and log.wants_plan(query_fingerprint):
+            plan = await self._explain(connection, query_str, params)
+        log.record(_loggable(query_str), duration_ms, plan, query_fingerprint)
+
+    async def _guarded(self, connection: AsyncConnection, name: str,
+                       run: Callable[[AsyncCursor], Awaitable[T]]) -> Optional[T]:
+        """Return ``await run(cursor)`` without disturbing the caller's transaction, see ``Session._guarded``."""
+        status = connection.info.transaction_status
+        savepoint = status == TransactionStatus.INTRANS
+        opened = status == TransactionStatus.IDLE and not connection.autocommit
+        try:
+            async with AsyncCursor(connection) as guarded_cursor:
+                try:
+                    if savepoint:
+                        await guarded_cursor.execute(f"SAVEPOINT {name}")
+                    result = await run(guarded_cursor)
+                    if savepoint:
+                        await guarded_cursor.execute(f"RELEASE SAVEPOINT {name}")
+                    return result
+                except (psycopg.OperationalError, psycopg.InterfaceError):
+                    opened = False
+                    raise
+                except psycopg.Error:
+                    if savepoint:
+                        await guarded_cursor.execute(f"ROLLBACK TO SAVEPOINT {name}")
+                    return None
+        finally:
+            if opened:
+                await connection.rollback()
+
+    async def _explain(self, connection: AsyncConnection, query_str: str,
+                       params: Optional[Sequence[Any]]) -> Optional[Dict[str, Any]]:
+        """Plan of a statement that just ran, see ``Session._explain``."""
+        async def run(explain_cursor: AsyncCursor) -> Dict[str, Any]:
+            await explain_cursor.execute(explain_sql(query_str), params)
+            return parse_plan((await explain_cursor.fetchone())[0])
+
+        return await self._guarded(connection, "qh_explain", run)
+
+    async def batch(self, query_strs: Sequence[str], force_log=False, read_only: bool = False,
+                    timeout: Optional[int] = None, params: Optional[Sequence[Optional[Sequence[Any]]]] = None
+                    ) -> List[Tuple[Optional[RowDescriptor], List[tuple]]]:
+        """Run several queries in one round trip with pipeline mode and get their result sets in order.
+        ``params`` holds the parameters of each query, None for queries without placeholders."""
+        params = list(params) if params is not None else [None] * len(query_strs)
+        if force_log or self.log:
+            for query_str, query_params in zip(query_strs, params):
+                print(f"Execuring query: {_loggable(query_str, query_params)}")
+
+        connection = self.connection
+        if read_only and await self._read_cursor() is not None:
+            connection = self._replica[1]
+        elif not read_only:
+            await self._mark_write()
+
+        cursors = [AsyncCursor(connection) for _ in query_strs]
+        try:
+            await self._send(connection, list(zip(cursors, query_strs, params)), timeout)
+            return [
+                (RowDescriptor.from_cursor(cursor), await cursor.fetchall() if cursor.description else [])
+                for cursor in cursors
+            ]
+        finally:
+            for cursor in cursors:
+                await cursor.close()
+
+    async def stream(self, query_str: str, itersize: int = 2000, force_log=False, read_only: bool = False,
+                     timeout: Optional[int] = None, params: Optional[Sequence[Any]] = None
+                     ) -> AsyncIterator[Tuple[RowDescriptor, List[tuple]]]:
+        """Run a query on a named server-side cursor and yield batches of at most ``itersize`` rows.
+
+        Statement timeouts only apply on transactional connections; holdable cursors are not limited.
+        """
+        if force_log or self.log:
+            print(f"Streaming query: {_loggable(query_str, params)}")
+
+        connection = self.connection
+        if read_only and await self._read_cursor() is not None:
+            connection = self._replica[1]
+
+        # Named cursors live in a transaction; autocommit connections need a holdable one
+        if not connection.autocommit:
+            setting = self._timeout_setting(connection, timeout)
+            if setting:
+                async with AsyncCursor(connection) as setting_cursor:
+                    await setting_cursor.execute(setting)
+        cursor = connection.cursor(name=f"stream_{next(_stream_ids)}", withhold=connection.autocommit)
+        try:
+            await cursor.execute(query_str, params)
+            while True:
+                rows = await cursor.fetchmany(itersize)
+                if not rows:
+                    break
+                yield RowDescriptor.from_cursor(cursor), rows
+        finally:
+            await cursor.close()
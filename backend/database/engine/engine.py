@@ -1,23 +1,82 @@
-from ..connection import PostgresConnection
+from ..connection import DBConnection, PostgresConnection, PsycopgConnection, PreparedStats
 from .session import Session
+from .pool import ConnectionPool, PoolConfig, PoolConfigSchema, PoolStats
+from .replicas import ReplicaSet
+from .slow_queries import SlowQueryLog
 from psycopg2.extensions import cursor as psycopg2_cursor
-import psycopg2
 
+from contextlib import contextmanager
 from enum import Enum
+import threading
 
-from typing import Dict
+from typing import Any, Dict, Iterator, List, Optional, Type, Union
+
+# Connection backends selectable with the ``driver`` option
+DRIVERS: Dict[str, Type[DBConnection]] = {
+    'psycopg2': PostgresConnection,
+    'psycopg': PsycopgConnection,
+}
 
 class DatabaseEngine:
-    def __init__(self, config: Dict[str, str] | None = None, url: str | None = None, autocommit: bool = False, log: bool = False):
-        self.connection: PostgresConnection = PostgresConnection(config=config, url=url, autocommit=autocommit)
+    def __init__(self, config: Dict[str, str] | None = None, url: str | None = None, autocommit: bool = False, log: bool = False,
+                 pool: Union[PoolConfig, Dict[str, Any], None] = None,
+                 replicas: Optional[List[Union[Dict[str, str], str]]] = None,
+                 statement_timeout: Optional[int] = None, driver: str = 'psycopg2',
+                 prepare_threshold: Optional[int] = None, prepared_max: int = 100,
+                 slow_query_ms: Optional[float] = None, slow_query_sample: float = 0.1):
+        if driver not in DRIVERS:
+            raise ValueError(f"Unknown database driver '{driver}', expected one of {', '.join(DRIVERS)}")
         self.log = log
+        self.driver = driver
+        self.statement_timeout = statement_timeout  # Default for new sessions, in milliseconds
+        # Templates run this many times on a connection become prepared statements, None disables it
+        self.prepare_threshold = prepare_threshold
+        self.prepared_max = prepared_max
+        self._prepared_stats = PreparedStats()
+        # Statements taking slow_query_ms or longer are recorded along with a sampled plan
+        self.slow_queries: Optional[SlowQueryLog] = \
+            SlowQueryLog(slow_query_ms, explain_sample=slow_query_sample) if slow_query_ms is not None else None
         self._active = True
+        self.connection: Optional[DBConnection] = None
+        self.pool: Optional[ConnectionPool] = None
+        self.replicas: Optional[ReplicaSet] = None
+        self._lock = threading.Lock()
+
+        if isinstance(pool, dict):
+            pool = PoolConfigSchema().load(pool)
+        self.pool_config: PoolConfig = pool or PoolConfig()
+
+        if pool is None:
+            self.connection = self._connect(config, url, autocommit)
+        else:
+            self.pool = ConnectionPool(lambda: self._connect(config, url, autocommit), pool)
+
+        if replicas:
+            # Replicas only serve single statement reads, so they don't need transactions
+            sources = []
+            for replica in replicas:
+                replica_config, replica_url = (None, replica) if isinstance(replica, str) else (replica, None)
+                if pool is None:
+                    sources.append(self._connect(replica_config, replica_url, True))
+                else:
+                    sources.append(ConnectionPool(
+                        lambda c=replica_config, u=replica_url: self._connect(c, u, True), pool
+                    ))
+            self.replicas = ReplicaSet(sources)
 
-    def get_connection(self) -> PostgresConnection:
+    def _connect(self, config: Dict[str, str] | None, url: str | None, autocommit: bool) -> DBConnection:
+        return DRIVERS[self.driver](config=config, url=url, autocommit=autocommit,
+                                    retries=self.pool_config.connect_retries, backoff=self.pool_config.connect_backoff,
+                                    prepare_threshold=self.prepare_threshold, prepared_max=self.prepared_max,
+                                    prepared_stats=self._prepared_stats)
+
+    def get_connection(self) -> DBConnection:
+        if self.pool:
+            raise RuntimeError("Pooled engines have no shared connection, use session() instead")
         return self.connection
     
     def cursor(self) -> psycopg2_cursor:
-        return self.connection.cursor()
+        return self.get_connection().cursor()
 
     def __enter__(self) -> 'DatabaseEngine':
         return self
@@ -25,13 +84,50 @@ class DatabaseEngine:
     def __exit__(self, exc_type, exc_value, traceback):
         self.close()
 
-    def session(self):
-        return Session(self.connection, log=self.log)
+    def session(self, read_after: Optional[int] = None):
+        """New session. ``read_after`` is a WAL position, e.g. ``write_lsn`` of a client's last
+        session, that replica reads have to see; see ``ReplicaSet``."""
+        if self.pool:
+            return Session(self.pool.acquire(), log=self.log, pool=self.pool, replicas=self.replicas,
+                           statement_timeout=self.statement_timeout, slow_queries=self.slow_queries,
+                           read_after=read_after)
+        with self._lock:
+            if not self.connection.is_usable():
+                self.connection.reconnect()
+        return Session(self.connection, log=self.log, replicas=self.replicas, statement_timeout=self.statement_timeout,
+                       slow_queries=self.slow_queries, read_after=read_after)
+
+    @contextmanager
+    def transaction(self, read_after: Optional[int] = None) -> Iterator[Session]:
+        """Session that commits when the block succeeds and rolls back when it raises."""
+        with self.session(read_after) as session:
+            try:
+                yield session
+            except BaseException:
+                try:
+                    session.rollback()
+                except session.connection.Error:
+                    # The connection is gone; it is replaced on the next checkout
+                    pass
+                raise
+            session.commit()
+
+    def pool_stats(self) -> Optional[PoolStats]:
+        return self.pool.stats() if self.pool else None
+
+    def prepared_stats(self) -> Optional[PreparedStats]:
+        """Prepared statement hits and misses over all connections, None when preparing is off."""
+        return self._prepared_stats.snapshot() if self.prepare_threshold else None
 
     def close(self):
         if self._active:
             self._active = False
-            self.connection.close_connection()
+            if self.pool:
+                self.pool.close()
+            else:
+                self.connection.close_connection()
+            if self.replicas:
+                self.replicas.close()
 
     def __destroy__(self):
         self.close()
@@ -0,0 +1,259 @@
+from ..connection import DBConnection
+
+from dataclasses import dataclass
+from marshmallow import Schema, fields, post_load
+
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out before the timeout expired."""
+    pass
+
+@dataclass
+class PoolConfig:
+    min_size: int = 1
+    max_size: int = 10
+    timeout: float = 30.0
+    max_idle: float = 600.0
+    max_lifetime: float = 3600.0
+    pre_ping: bool = False
+    connect_retries: int = 3
+    connect_backoff: float = 0.1
+
+    def __post_init__(self):
+        if self.min_size < 0 or self.max_size < 1 or self.min_size > self.max_size:
+            raise ValueError(f"Invalid pool size: min_size={self.min_size}, max_size={self.max_size}")
+
+class PoolConfigSchema(Schema):
+    min_size = fields.Int(load_default=1)
+    max_size = fields.Int(load_default=10)
+    timeout = fields.Float(load_default=30.0)
+    max_idle = fields.Float(load_default=600.0)
+    max_lifetime = fields.Float(load_default=3600.0)
+    pre_ping = fields.Bool(load_default=False)
+    connect_retries = fields.Int(load_default=3)
+    connect_backoff = fields.Float(load_default=0.1)
+
+    @post_load
+    def make_pool_config(self, data, **kwargs):
+        return PoolConfig(**data)
+
+@dataclass
+class PoolStats:
+    size: int = 0
+    idle: int = 0
+    in_use: int = 0
+    requests: int = 0
+    waited: int = 0
+    timeouts: int = 0
+    wait_time: float = 0.0
+    max_wait_time: float = 0.0
+    connections_created: int = 0
+    connections_closed: int = 0
+
+    @property
+    def avg_wait_time(self) -> float:
+        return self.wait_time / self.requests if self.requests else 0.0
+
+class _PoolEntry:
+    __slots__ = ('connection', 'created_at', 'last_used')
+
+    def __init__(self, connection: DBConnection):
+        self.connection = connection
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+class ConnectionPool:
+    """Thread-safe pool of database connections.
+
+    Connections are created on demand up to ``max_size`` and handed out to one
+    session at a time. Idle connections above ``min_size`` are closed after
+    ``max_idle`` seconds and every connection is replaced once it is older than
+    ``max_lifetime`` seconds. Broken connections are dropped on checkout, with a
+    server round trip first when ``pre_ping`` is enabled.
+    """
+
+    def __init__(self, factory: Callable[[], DBConnection], config: Optional[PoolConfig] = None):
+        self._factory = factory
+        self.config = config or PoolConfig()
+        self._lock = threading.Condition()
+        self._idle: List[_PoolEntry] = []
+        self._in_use: Dict[int, _PoolEntry] = {}
+        self._size = 0
+        self._closed = False
+        self._stats = PoolStats()
+
+        for _ in range(self.config.min_size):
+            entry = self._connect()
+            with self._lock:
+                self._size += 1
+                self._idle.append(entry)
+
+    def _connect(self) -> _PoolEntry:
+        entry = _PoolEntry(self._factory())
+        with self._lock:
+            self._stats.connections_created += 1
+        return entry
+
+    def _discard(self, entry: _PoolEntry) -> None:
+        try:
+            entry.connection.close_connection()
+        except Exception:
+            pass
+        with self._lock:
+            self._stats.connections_closed += 1
+
+    def _is_expired(self, entry: _PoolEntry, now: float) -> bool:
+        return now - entry.created_at > self.config.max_lifetime
+
+    def _prune_idle(self, now: float) -> List[_PoolEntry]:
+        """Remove idle connections past their idle or lifetime limits. Must hold the lock."""
+        expired = []
+        keep = []
+        for entry in self._idle:
+            idle_too_long = now - entry.last_used > self.config.max_idle
+            if self._is_expired(entry, now) or (idle_too_long and self._size - len(expired) > self.config.min_size):
+                expired.append(entry)
+            else:
+                keep.append(entry)
+        self._idle = keep
+        self._size -= len(expired)
+        return expired
+
+    def acquire(self, timeout: Optional[float] = None) -> DBConnection:
+        """Check out a healthy connection, waiting up to ``timeout`` seconds for one to free up."""
+        timeout = self.config.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        waited = False
+
+        while True:
+            entry: Optional[_PoolEntry] = None
+            create = False
+
+            with self._lock:
+                while True:
+                    if self._closed:
+                        raise PoolTimeout("Connection pool is closed")
+
+                    expired = self._prune_idle(time.monotonic())
+                    if expired:
+                        self._lock.release()
+                        try:
+                            for e in expired:
+                                self._discard(e)
+                        finally:
+                            self._lock.acquire()
+
+                    if self._idle:
+                        entry = self._idle.pop()
+                        break
+                    if self._size < self.config.max_size:
+                        self._size += 1
+                        create = True
+                        break
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats.requests += 1
+                        self._stats.timeouts += 1
+                        raise PoolTimeout(f"Timed out after {timeout}s waiting for a database connection")
+                    waited = True
+                    self._lock.wait(remaining)
+
+            if create:
+                try:
+                    entry = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._size -= 1
+                        self._lock.notify()
+                    raise
+            elif not self._is_healthy(entry):
+                self._discard(entry)
+                with self._lock:
+                    self._size -= 1
+                continue
+
+            break
+
+        wait_time = time.monotonic() - start
+        with self._lock:
+            self._in_use[id(entry.connection)] = entry
+            self._stats.requests += 1
+            self._stats.wait_time += wait_time
+            self._stats.max_wait_time = max(self._stats.max_wait_time, wait_time)
+            if waited:
+                self._stats.waited += 1
+
+        return entry.connection
+
+    def _is_healthy(self, entry: _PoolEntry) -> bool:
+        if not entry.connection.is_usable():
+            return False
+        return entry.connection.ping() if self.config.pre_ping else True
+
+    def release(self, connection: DBConnection) -> None:
+        """Return a connection to the pool, rolling back any transaction left open."""
+        with self._lock:
+            entry = self._in_use.pop(id(connection), None)
+        if entry is None:
+            raise ValueError("Connection does not belong to this pool")
+
+        reusable = not self._closed and connection.is_usable() \
+            and not self._is_expired(entry, time.monotonic())
+
+        if reusable:
+            try:
+                if connection.in_transaction():
+                    connection.rollback()
+            except connection.Error:
+                reusable = False
+
+        if not reusable:
+            self._discard(entry)
+            with self._lock:
+                self._size -= 1
+                self._lock.notify()
+            return
+
+        entry.last_used = time.monotonic()
+        with self._lock:
+            self._idle.append(entry)
+            self._lock.notify()
+
+    def stats(self) -> PoolStats:
+        """Get a snapshot of the pool size and checkout wait-time statistics."""
+        with self._lock:
+            return PoolStats(
+                size=self._size,
+                idle=len(self._idle),
+                in_use=len(self._in_use),
+                requests=self._stats.requests,
+                waited=self._stats.waited,
+                timeouts=self._stats.timeouts,
+                wait_time=self._stats.wait_time,
+                max_wait_time=self._stats.max_wait_time,
+                connections_created=self._stats.connections_created,
+                connections_closed=self._stats.connections_closed
+            )
+
+    def close(self) -> None:
+        """Close idle connections; checked out connections are closed when released."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._lock.notify_all()
+        for entry in idle:
+            self._discard(entry)
+
+    def __enter__(self) -> 'ConnectionPool':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,148 @@
+from ..connection import DBConnection
+from .pool import ConnectionPool
+from psycopg import AsyncConnection
+from psycopg_pool import AsyncConnectionPool
+import psycopg
+
+import itertools
+import threading
+from typing import List, Optional, Tuple, Union
+
+def parse_lsn(lsn: Optional[str]) -> Optional[int]:
+    """Convert a textual WAL location such as ``16/B374D848`` to an integer."""
+    if lsn is None:
+        return None
+    high, low = lsn.split('/')
+    return (int(high, 16) << 32) + int(low, 16)
+
+def format_lsn(lsn: int) -> str:
+    """Convert an integer WAL location back to its textual form, the inverse of ``parse_lsn``."""
+    return f"{lsn >> 32:X}/{lsn & 0xFFFFFFFF:X}"
+
+def fetch_lsn(connection: DBConnection, sql: str) -> Optional[int]:
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+        return parse_lsn(cursor.fetchone()[0])
+
+REPLAY_LSN_SQL = "SELECT pg_last_wal_replay_lsn()::text"
+
+class _Replica:
+    __slots__ = ('source', 'replay_lsn')
+
+    def __init__(self, source: Union[ConnectionPool, DBConnection, AsyncConnectionPool]):
+        self.source = source
+        self.replay_lsn = 0
+
+def _note_replay(replica: _Replica, replay_lsn: Optional[int], min_lsn: int) -> bool:
+    # A server that is not in recovery has nothing to replay
+    replica.replay_lsn = replay_lsn if replay_lsn is not None else float('inf')
+    return replica.replay_lsn >= min_lsn
+
+class ReplicaSet:
+    """Read replicas of the primary database with read-your-writes tracking.
+
+    Sessions learn the primary's WAL position after each committed write and hand it back
+    to the client (see ``Session.write_lsn``); a later session that reads after it passes it
+    to ``lease``. Only a replica that has replayed that far serves the read, checked with
+    one query per replica and never waited for, so a lagging set sends the read to the
+    primary right away. Reads without a position go to any replica.
+    """
+
+    def __init__(self, sources: List[Union[ConnectionPool, DBConnection]]):
+        if not sources:
+            raise ValueError("At least one replica is required")
+        self._replicas = [_Replica(source) for source in sources]
+        self._next = itertools.cycle(range(len(self._replicas)))
+        self._lock = threading.Lock()
+
+    def _acquire(self, replica: _Replica) -> DBConnection:
+        if isinstance(replica.source, ConnectionPool):
+            return replica.source.acquire()
+        if not replica.source.is_usable():
+            replica.source.reconnect()
+        return replica.source
+
+    def _caught_up(self, replica: _Replica, connection: DBConnection, min_lsn: int) -> bool:
+        if replica.replay_lsn >= min_lsn:
+            return True
+        return _note_replay(replica, fetch_lsn(connection, REPLAY_LSN_SQL), min_lsn)
+
+    def lease(self, min_lsn: int = 0) -> Optional[Tuple[int, DBConnection]]:
+        """Get a connection to a replica that has replayed the primary's WAL up to ``min_lsn``,
+        or None when none has and the read has to go to the primary."""
+        with self._lock:
+            start = next(self._next)
+
+        for offset in range(len(self._replicas)):
+            index = (start + offset) % len(self._replicas)
+            replica = self._replicas[index]
+            try:
+                connection = self._acquire(replica)
+            except Exception:
+                continue
+            try:
+                if self._caught_up(replica, connection, min_lsn):
+                    return index, connection
+            except connection.Error:
+                pass
+            self.release(index, connection)
+        return None
+
+    def release(self, index: int, connection: DBConnection) -> None:
+        source = self._replicas[index].source
+        if isinstance(source, ConnectionPool):
+            source.release(connection)
+
+    def close(self) -> None:
+        for replica in self._replicas:
+            if isinstance(replica.source, ConnectionPool):
+                replica.source.close()
+            else:
+                replica.source.close_connection()
+
+class AsyncReplicaSet:
+    """``ReplicaSet`` for the async engine, with one psycopg 3 async pool per replica."""
+
+    def __init__(self, pools: List[AsyncConnectionPool]):
+        if not pools:
+            raise ValueError("At least one replica is required")
+        self._replicas = [_Replica(pool) for pool in pools]
+        self._next = itertools.cycle(range(len(self._replicas)))
+
+    async def open(self) -> None:
+        for replica in self._replicas:
+            await replica.source.open()
+
+    async def _caught_up(self, replica: _Replica, connection: AsyncConnection, min_lsn: int) -> bool:
+        if replica.replay_lsn >= min_lsn:
+            return True
+        async with connection.cursor() as cursor:
+            await cursor.execute(REPLAY_LSN_SQL)
+            replay_lsn = parse_lsn((await cursor.fetchone())[0])
+        return _note_replay(replica, replay_lsn, min_lsn)
+
+    async def lease(self, min_lsn: int = 0) -> Optional[Tuple[int, AsyncConnection]]:
+        """Get a connection to a replica that has replayed the primary's WAL up to ``min_lsn``,
+        or None when none has and the read has to go to the primary."""
+        # The event loop runs one lease at a time up to here, so the cycle needs no lock
+        start = next(self._next)
+        for offset in range(len(self._replicas)):
+            index = (start + offset) % len(self._replicas)
+            try:
+                connection = await self._replicas[index].source.getconn()
+            except Exception:
+                continue
+            try:
+                if await self._caught_up(self._replicas[index], connection, min_lsn):
+                    return index, connection
+            except psycopg.Error:
+                pass
+            await self.release(index, connection)
+        return None
+
+    async def release(self, index: int, connection: AsyncConnection) -> None:
+        await self._replicas[index].source.putconn(connection)
+
+    async def close(self) -> None:
+        for replica in self._replicas:
+            await replica.source.close()
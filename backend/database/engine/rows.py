@@ -0,0 +1,40 @@
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+class RowDescriptor:
+    """Column layout of a result set, built once and shared by all of its tuple rows."""
+
+    __slots__ = ('names', 'index')
+
+    def __init__(self, names: Tuple[str, ...]):
+        self.names = names
+        # Like a dict row, a repeated column name resolves to its last occurrence
+        self.index: Dict[str, int] = {name: i for i, name in enumerate(names)}
+
+    @classmethod
+    def from_cursor(cls, cursor: Any) -> Optional['RowDescriptor']:
+        """Get the descriptor for the cursor's current result, or None if it returned no rows."""
+        if cursor.description is None:
+            return None
+        return _descriptor(tuple(column.name for column in cursor.description))
+
+    @classmethod
+    def from_names(cls, names: Tuple[str, ...]) -> 'RowDescriptor':
+        return _descriptor(names)
+
+    def get(self, row: Sequence[Any], name: str) -> Any:
+        return row[self.index[name]]
+
+    def to_dict(self, row: Sequence[Any]) -> Dict[str, Any]:
+        return dict(zip(self.names, row))
+
+    def to_dicts(self, rows: Iterable[Sequence[Any]]) -> List[Dict[str, Any]]:
+        names = self.names
+        return [dict(zip(names, row)) for row in rows]
+
+    def __repr__(self) -> str:
+        return f"RowDescriptor({', '.join(self.names)})"
+
+@lru_cache(maxsize=1024)
+def _descriptor(names: Tuple[str, ...]) -> RowDescriptor:
+    return RowDescriptor(names)
@@ -1,14 +1,115 @@
-from ..connection import PostgresConnection
+from ..connection import DBConnection
+from ..connection.prepared import PreparedStatement
 from psycopg2.extensions import cursor
 
-from typing import Any
+from contextlib import nullcontext
+from decimal import Decimal
+import itertools
+import json
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar, TYPE_CHECKING
+
+from .rows import RowDescriptor
+from .slow_queries import explain_sql, explainable, fingerprint, parse_plan
+
+if TYPE_CHECKING:
+    from .pool import ConnectionPool
+    from .replicas import ReplicaSet
+    from .slow_queries import SlowQueryLog
+
+T = TypeVar('T')
+
+_stream_ids = itertools.count(1)
+
+def set_timeout_sql(milliseconds: Optional[int], local: bool = True) -> str:
+    """Statement that limits how long later statements of the current transaction, or with
+    ``local=False`` the whole connection session, may run."""
+    scope = "SET LOCAL" if local else "SET"
+    if milliseconds is None:
+        return f"{scope} statement_timeout TO DEFAULT"
+    return f"{scope} statement_timeout = {int(milliseconds)}"
+
+def batch_sql(query_strs: Sequence[str]) -> str:
+    """Combine queries into one statement that returns each result set as a JSON array column.
+
+    Every query becomes a CTE, so all of them see the same snapshot and data-modifying
+    statements have to use RETURNING to produce rows.
+    """
+    ctes = []
+    columns = []
+    for i, query_str in enumerate(query_strs):
+        ctes.append(f"batch_{i} AS ({query_str.strip().rstrip(';')})")
+        columns.append(f"(SELECT coalesce(json_agg(batch_{i}), '[]') FROM batch_{i})::text")
+    return f"WITH {', '.join(ctes)} SELECT {', '.join(columns)}"
+
+def _batch_result(text: str) -> Tuple[Optional[RowDescriptor], List[tuple]]:
+    # Keep column order and numeric precision the way a regular cursor would return them
+    pairs = json.loads(text, parse_float=Decimal, object_pairs_hook=lambda items: items)
+    if not pairs:
+        return None, []
+    descriptor = RowDescriptor.from_names(tuple(name for name, _ in pairs[0]))
+    return descriptor, [tuple(value for _, value in row) for row in pairs]
+
+def _loggable(query_str: str, params: Any = None) -> str:
+    """Query and parameters for the query log, with long values such as encoded images and
+    long parameter lists cut short."""
+    def short(text: str, limit: int = 80) -> str:
+        return text if len(text) <= limit else f"{text[:limit - 20]}... ({len(text)} chars)"
+
+    text = short(query_str, 2000)
+    if params is None:
+        return text
+    if isinstance(params, dict):
+        items = [f"{name}={short(repr(value))}" for name, value in itertools.islice(params.items(), 20)]
+    else:
+        items = [short(repr(value)) for value in itertools.islice(params, 20)]
+    if len(params) > 20:
+        items.append(f"... {len(params)} parameters")
+    return f"{text} -- {', '.join(items)}"
 
 class Session:
-    def __init__(self, connection: PostgresConnection, log: bool = False):
+    def __init__(self, connection: DBConnection, log: bool = False, pool: Optional['ConnectionPool'] = None,
+                 replicas: Optional['ReplicaSet'] = None, statement_timeout: Optional[int] = None,
+                 slow_queries: Optional['SlowQueryLog'] = None, read_after: Optional[int] = None):
         self.connection = connection
-        self.cursor: cursor = connection.cursor()
+        try:
+            self._cursor: cursor = connection.cursor()
+        except BaseException:
+            # The session never came to be, so nothing else would hand the leased connection back
+            if pool:
+                pool.release(connection)
+            raise
+        self._last_cursor: cursor = self._cursor
         self.log = log
+        self._pool = pool
+        self._replicas = replicas
+        self._replica: Optional[Tuple[int, DBConnection]] = None
+        self._replica_cursor: Optional[cursor] = None
+        self._wrote = False
+        self._unrecorded_write = False
+        # Replica reads have to see the primary up to this WAL position, e.g. the client's last write
+        self.read_after = read_after
+        # Primary WAL position after this session's last committed write, see ``ReplicaSet``
+        self.write_lsn: Optional[int] = None
         self._active = True
+        # Milliseconds a statement may run before the server cancels it, None for the server default
+        self.statement_timeout = statement_timeout
+        self._applied_timeout: Optional[int] = None
+        self._slow_queries = slow_queries
+
+    @property
+    def cursor(self) -> cursor:
+        """Cursor of the connection that ran the last statement."""
+        return self._last_cursor
+
+    @property
+    def has_written(self) -> bool:
+        return self._wrote
+
+    @property
+    def typed_batches(self) -> bool:
+        """Whether ``batch`` returns values with their column types, see ``batch``."""
+        return self.connection.supports_pipeline
 
     def __enter__(self) -> 'Session':
         return self
@@ -20,19 +121,368 @@ class Session:
         if not self._active:
             return
         self._active = False
-        self.cursor.close()
+        try:
+            self._cursor.close()
+            self._release_replica()
+            if self._unrecorded_write and self.connection.autocommit:
+                self._record_write()
+        finally:
+            # Pooled sessions lease their connection and hand it back on close
+            if self._pool:
+                self._pool.release(self.connection)
 
     def commit(self) -> None:
-        self.connection.connection.commit()
+        self.connection.commit()
+        if self._unrecorded_write:
+            self._record_write()
 
     def __destroy__(self) -> None:
         self.close()
 
     def rollback(self) -> None:
-        self.connection.connection.rollback()
+        # A broken connection has no transaction left to roll back
+        if self.connection.is_usable():
+            self.connection.rollback()
+
+    def mogrify(self, query_str: str, params: Any) -> str:
+        return self.connection.mogrify(query_str, params)
+
+    def cancel(self) -> None:
+        """Cancel the statement running on this session's connections. Safe to call from another thread."""
+        self.connection.cancel()
+        replica = self._replica
+        if replica is not None:
+            replica[1].cancel()
+
+    def _timeout_setting(self, connection: DBConnection, timeout: Optional[int]) -> Optional[str]:
+        """Statement to send ahead of the next one so it runs under ``timeout`` ms, if any."""
+        if timeout is None:
+            timeout = self.statement_timeout
+        if connection.autocommit:
+            if connection.multi_statement:
+                # Every statement is its own transaction, so the setting has to ride along each time
+                return set_timeout_sql(timeout) if timeout is not None else None
+            # Separate statements don't share a transaction; set it for the connection instead
+            if timeout == connection.session_timeout:
+                return None
+            connection.session_timeout = timeout
+            return set_timeout_sql(timeout, local=False)
+        if not connection.in_transaction():
+            self._applied_timeout = None
+        if timeout == self._applied_timeout:
+            return None
+        self._applied_timeout = timeout
+        return set_timeout_sql(timeout)
+
+    def _send(self, connection: DBConnection, statements: Sequence[Tuple[cursor, str, Any]],
+              timeout: Optional[int], prepare: bool = False) -> None:
+        """Execute ``(cursor, query, params)`` statements under the statement timeout in one round trip.
+
+        ``prepare`` asks drivers with ``native_prepare`` to run them as prepared statements.
+        """
+        setting = self._timeout_setting(connection, timeout)
+        if setting and connection.multi_statement and len(statements) == 1:
+            statement_cursor, query_str, params = statements[0]
+            statement_cursor.execute(f"{setting}; {query_str}", params)
+            return
+
+        setting_cursor = connection.cursor() if setting else None
+        pipelined = connection.supports_pipeline and len(statements) + bool(setting) > 1
+        try:
+            with connection.pipeline() if pipelined else nullcontext():
+                if setting_cursor:
+                    setting_cursor.execute(setting)
+                for statement_cursor, query_str, params in statements:
+                    if prepare:
+                        statement_cursor.execute(query_str, params, prepare=True)
+                    else:
+                        statement_cursor.execute(query_str, params)
+        finally:
+            if setting_cursor:
+                setting_cursor.close()
+
+    def _record_write(self) -> None:
+        """Note in ``write_lsn`` how far a replica has to replay the primary's WAL to see this session's writes."""
+        self._unrecorded_write = False
+        if not self._replicas or not self.connection.is_usable():
+            return
+        from .replicas import fetch_lsn
+        try:
+            idle = not self.connection.in_transaction()
+            self.write_lsn = fetch_lsn(self.connection, "SELECT pg_current_wal_lsn()::text")
+            if idle and not self.connection.autocommit:
+                self.connection.rollback()
+        except self.connection.Error:
+            pass
+
+    def _read_cursor(self) -> Optional[cursor]:
+        """Cursor on a caught-up replica, or None when reads have to go to the primary."""
+        if not self._replicas or self._wrote:
+            return None
+        if self._replica is None:
+            self._replica = self._replicas.lease(self.read_after or 0)
+            if self._replica is None:
+                return None
+            self._replica_cursor = self._replica[1].cursor()
+        return self._replica_cursor
+
+    def _release_replica(self) -> None:
+        if self._replica is None:
+            return
+        index, connection = self._replica
+        self._replica = None
+        try:
+            self._replica_cursor.close()
+        except connection.Error:
+            pass
+        self._replica_cursor = None
+        self._replicas.release(index, connection)
+
+    def _mark_write(self) -> None:
+        # Writes and raw statements go to the primary and pin the session to it
+        self._wrote = True
+        self._unrecorded_write = True
+        self._release_replica()
+
+    def _guarded(self, connection: DBConnection, name: str, run: Callable[[cursor], T]) -> Optional[T]:
+        """Return ``run(cursor)`` on a cursor of its own without disturbing the caller's transaction:
+        inside one it runs in savepoint ``name``, so a statement the server refuses doesn't abort
+        it, and when it opens one itself that is rolled back again. Returns None if the server
+        refuses it; a lost connection still raises."""
+        savepoint = connection.in_transaction()
+        # Outside autocommit the statement implicitly begins a transaction nobody asked for
+        opened = not savepoint and not connection.autocommit
+        try:
+            with connection.cursor() as guarded_cursor:
+                try:
+                    if savepoint:
+                        guarded_cursor.execute(f"SAVEPOINT {name}")
+                    result = run(guarded_cursor)
+                    if savepoint:
+                        guarded_cursor.execute(f"RELEASE SAVEPOINT {name}")
+                    return result
+                except (connection.OperationalError, connection.InterfaceError):
+                    opened = False
+                    raise
+                except connection.Error:
+                    if savepoint:
+                        guarded_cursor.execute(f"ROLLBACK TO SAVEPOINT {name}")
+                    return None
+        finally:
+            if opened:
+                connection.rollback()
+
+    def _prepare(self, connection: DBConnection, query_str: str, templated: bool) -> Optional[PreparedStatement]:
+        """PREPARE ``query_str`` on ``connection``. Returns None if the server refuses it, e.g.
+        because a parameter's type can't be inferred; the template then keeps running unprepared."""
+        statement, evicted = connection.statements.add(query_str, templated)
+        commands = [f"PREPARE {statement.name} AS {statement.sql}"]
+        if evicted:
+            commands.append(f"DEALLOCATE {evicted}")
 
-    def execute(self, query_str: str, force_log=False):
+        def run(prepare_cursor: cursor) -> PreparedStatement:
+            if connection.multi_statement:
+                prepare_cursor.execute("; ".join(commands))
+            else:
+                for command in commands:
+                    prepare_cursor.execute(command)
+            return statement
+
+        prepared = self._guarded(connection, "qh_prepare", run)
+        if prepared is None:
+            connection.statements.discard(query_str)
+        return prepared
+
+    def _statement(self, connection: DBConnection, query_str: str,
+                   params: Optional[Sequence[Any]]) -> Tuple[str, Optional[Sequence[Any]], bool]:
+        """What to execute on ``connection`` for a template and its parameters, and whether the
+        driver should prepare it. Once the template is hot it runs as a prepared statement."""
+        if params is not None and connection.max_params is not None and len(params) > connection.max_params:
+            # Too many for one Bind message, e.g. a large multi-row insert; bind them on the client instead
+            return connection.mogrify(query_str, params), None, False
+
+        statements = connection.statements
+        # Tuples expand to value lists, so their length is part of the SQL and can't be a parameter
+        if statements is None or (params is not None and any(isinstance(value, tuple) for value in params)):
+            return query_str, params, False
+
+        prepared = statements.get(query_str)
+        if prepared is None:
+            if not statements.seen(query_str):
+                return query_str, params, False
+            if connection.native_prepare:
+                # The driver prepares on execute and keeps its own LRU of the same size
+                statements.add(query_str, params is not None)
+                return query_str, params, True
+            prepared = self._prepare(connection, query_str, params is not None)
+            if prepared is None:
+                return query_str, params, False
+        if connection.native_prepare:
+            return query_str, params, True
+        return prepared.execute_sql, params, False
+
+    def _capture_slow(self, connection: DBConnection, query_str: str, params: Optional[Sequence[Any]],
+                      duration_ms: float) -> None:
+        log = self._slow_queries
+        if not log.is_slow(duration_ms):
+            return
+        query_fingerprint = fingerprint(query_str)
+        plan = None
+        too_many_params = params is not None and connection.max_params is not None and len(params) > connection.max_params
+        if explainable(query_str) and not too_many_params and log.wants_plan(query_fingerprint):
+            plan = self._explain(connection, query_str, params)
+        log.record(_loggable(query_str), duration_ms, plan, query_fingerprint)
+
+    def _explain(self, connection: DBConnection, query_str: str, params: Optional[Sequence[Any]]) -> Optional[Dict[str, Any]]:
+        """Plan of a statement that just ran, from a plain EXPLAIN on a cursor of its own so the
+        statement's result stays readable. Returns None if the server refuses it."""
+        def run(explain_cursor: cursor) -> Dict[str, Any]:
+            explain_cursor.execute(explain_sql(query_str), params)
+            return parse_plan(explain_cursor.fetchone()[0])
+
+        return self._guarded(connection, "qh_explain", run)
+
+    def execute(self, query_str: str, force_log=False, read_only: bool = False, timeout: Optional[int] = None,
+                params: Optional[Sequence[Any]] = None, prepare: bool = False):
+        """Run a statement. ``params`` are bound by the driver, on the server where it supports that.
+
+        With ``prepare``, connections with a statement cache run the statement as a prepared
+        statement once it is hot.
+        """
+        if force_log or self.log:
+            print(f"Execuring query: {_loggable(query_str, params)}")
+
+        def send(connection: DBConnection, statement_cursor: cursor) -> None:
+            start = time.perf_counter()
+            if prepare:
+                statement_str, statement_params, native = self._statement(connection, query_str, params)
+                self._send(connection, [(statement_cursor, statement_str, statement_params)], timeout, prepare=native)
+            else:
+                self._send(connection, [(statement_cursor, query_str, params)], timeout)
+            if self._slow_queries is not None:
+                self._capture_slow(connection, query_str, params, (time.perf_counter() - start) * 1000)
+
+        if read_only:
+            replica_cursor = self._read_cursor()
+            if replica_cursor is not None:
+                replica = self._replica[1]
+                try:
+                    send(replica, replica_cursor)
+                    self._last_cursor = replica_cursor
+                    return
+                except (replica.OperationalError, replica.InterfaceError):
+                    # Lost the replica, serve this read from the primary
+                    self._release_replica()
+        else:
+            self._mark_write()
+
+        connection = self.connection
+        fresh = not connection.autocommit and connection.is_usable() and not connection.in_transaction()
+        try:
+            send(connection, self._cursor)
+        except (connection.OperationalError, connection.InterfaceError):
+            if not fresh or connection.is_usable():
+                raise
+            # The connection dropped before this transaction did any work, so it is safe to retry once
+            connection.reconnect()
+            self._cursor = connection.cursor()
+            send(connection, self._cursor)
+        finally:
+            self._last_cursor = self._cursor
+
+    def batch(self, query_strs: Sequence[str], force_log=False, read_only: bool = False,
+              timeout: Optional[int] = None, params: Optional[Sequence[Optional[Sequence[Any]]]] = None
+              ) -> List[Tuple[Optional[RowDescriptor], List[tuple]]]:
+        """Run several row returning queries in one round trip and get their result sets in order.
+
+        ``params`` holds the parameters of each query, None for queries without placeholders.
+        Drivers with pipeline mode send the statements back to back. psycopg2 only exposes the
+        last result of a multi-statement send, so there the queries are combined into a single
+        statement (see ``batch_sql``) and values come back the way JSON carries them: dates,
+        timestamps and UUIDs as strings, numbers as int or Decimal. ``typed_batches`` tells the
+        two apart; schema fields load either.
+        """
+        if not query_strs:
+            return []
+        params = list(params) if params is not None else [None] * len(query_strs)
+        if not self.connection.supports_pipeline:
+            combined = None
+            if any(query_params is not None for query_params in params):
+                # One parameter list for the combined statement; texts without placeholders get their % escaped
+                query_strs = [query_str if query_params is not None else query_str.replace('%', '%%')
+                              for query_str, query_params in zip(query_strs, params)]
+                combined = [value for query_params in params if query_params for value in query_params]
+            self.execute(batch_sql(query_strs), force_log=force_log, read_only=read_only, timeout=timeout,
+                         params=combined)
+            return [_batch_result(text) for text in self.cursor.fetchone()]
+
+        if force_log or self.log:
+            for query_str, query_params in zip(query_strs, params):
+                print(f"Execuring query: {_loggable(query_str, query_params)}")
+
+        connection = self.connection
+        if read_only and self._read_cursor() is not None:
+            connection = self._replica[1]
+        elif not read_only:
+            self._mark_write()
+
+        cursors = [connection.cursor() for _ in query_strs]
+        try:
+            self._send(connection, list(zip(cursors, query_strs, params)), timeout)
+            return [(RowDescriptor.from_cursor(c), c.fetchall() if c.description else []) for c in cursors]
+        finally:
+            for c in cursors:
+                c.close()
+
+    def stream(self, query_str: str, itersize: int = 2000, force_log=False, read_only: bool = False,
+               timeout: Optional[int] = None, params: Optional[Sequence[Any]] = None
+               ) -> Iterator[Tuple[RowDescriptor, List[tuple]]]:
+        """Run a query on a named server-side cursor and yield batches of at most ``itersize`` rows.
+
+        Statement timeouts only apply on transactional connections; holdable cursors are not limited.
+        """
         if force_log or self.log:
-            print(f"Execuring query: {query_str}")
-        self.cursor.execute(query_str)
-    
\ No newline at end of file
+            print(f"Streaming query: {_loggable(query_str, params)}")
+
+        connection = self.connection
+        if read_only and self._read_cursor() is not None:
+            connection = self._replica[1]
+
+        # Named cursors live in a transaction; autocommit connections need a holdable one
+        if not connection.autocommit:
+            setting = self._timeout_setting(connection, timeout)
+            if setting:
+                with connection.cursor() as setting_cursor:
+                    setting_cursor.execute(setting)
+        cursor = connection.named_cursor(f"stream_{next(_stream_ids)}", withhold=connection.autocommit)
+        try:
+            cursor.execute(query_str, params)
+            while True:
+                rows = cursor.fetchmany(itersize)
+                if not rows:
+                    break
+                yield RowDescriptor.from_cursor(cursor), rows
+        finally:
+            cursor.close()
+
+    def copy(self, query_str: str, rows: Iterable[Sequence[Any]], force_log=False,
+             timeout: Optional[int] = None) -> int:
+        """Run a ``COPY ... FROM STDIN`` statement, streaming ``rows`` as its data; returns the number of rows.
+
+        ``rows`` is consumed lazily, so a generator can feed large imports without holding them in memory.
+        Statement timeouts only apply on transactional connections.
+        """
+        if force_log or self.log:
+            print(f"Copying rows: {_loggable(query_str)}")
+
+        self._mark_write()
+        connection = self.connection
+        if not connection.autocommit:
+            setting = self._timeout_setting(connection, timeout)
+            if setting:
+                with connection.cursor() as setting_cursor:
+                    setting_cursor.execute(setting)
+        try:
+            return connection.copy_from(self._cursor, query_str, rows)
+        finally:
+            self._last_cursor = self._cursor
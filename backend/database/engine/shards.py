@@ -0,0 +1,233 @@
+from .engine import DatabaseEngine
+from .session import Session
+from .pool import PoolStats
+from ..connection import PreparedStats
+
+from bisect import bisect
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import hashlib
+
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, TypeVar, Union
+
+T = TypeVar('T')
+
+class ShardKeyError(Exception):
+    """Raised when a sharded session is used before it knows which shard to talk to."""
+    pass
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+class HashRing:
+    """Consistent hash ring mapping keys to shard names.
+
+    Every shard owns ``vnodes`` points on the ring, so adding or removing a shard only
+    moves the keys between it and its neighbours.
+    """
+
+    def __init__(self, nodes: Iterable[str], vnodes: int = 128):
+        self.vnodes = vnodes
+        self._ring: List[int] = []
+        self._owners: List[str] = []
+        points = sorted((_hash(f"{node}#{i}"), node) for node in nodes for i in range(vnodes))
+        if not points:
+            raise ValueError("At least one shard is required")
+        for point, node in points:
+            self._ring.append(point)
+            self._owners.append(node)
+
+    def node_for(self, key: Hashable) -> str:
+        index = bisect(self._ring, _hash(str(key))) % len(self._ring)
+        return self._owners[index]
+
+class ShardedSession:
+    """Session that sends each statement to the shard owning its ``shard_key``.
+
+    Sessions on the individual shards are opened on first use and kept until the
+    sharded session closes. ``commit`` and ``rollback`` apply to every opened shard
+    one after another; a transaction spanning shards is not atomic.
+    """
+
+    def __init__(self, engine: 'ShardedEngine', shard_key: Optional[Hashable] = None):
+        self._engine = engine
+        self._sessions: Dict[str, Session] = {}
+        self._statement_timeout: Optional[int] = None
+        self._timeout_set = False
+        self._shard: Optional[str] = None
+        self.shard_key = shard_key
+
+    @property
+    def shard_key(self) -> Optional[Hashable]:
+        return self._shard_key
+
+    @shard_key.setter
+    def shard_key(self, key: Optional[Hashable]) -> None:
+        self._shard_key = key
+        self._shard = None if key is None else self._engine.shard_for(key)
+
+    @property
+    def shard(self) -> Optional[str]:
+        """Name of the shard the current key routes to."""
+        return self._shard
+
+    def for_key(self, key: Hashable) -> 'ShardedSession':
+        """Route the following statements by ``key``."""
+        self.shard_key = key
+        return self
+
+    def _current(self) -> Session:
+        if self._shard is None:
+            raise ShardKeyError("Set shard_key on the session before running queries")
+        session = self._sessions.get(self._shard)
+        if session is None:
+            session = self._engine.shards[self._shard].session()
+            if self._timeout_set:
+                session.statement_timeout = self._statement_timeout
+            self._sessions[self._shard] = session
+        return session
+
+    @property
+    def statement_timeout(self) -> Optional[int]:
+        return self._statement_timeout
+
+    @statement_timeout.setter
+    def statement_timeout(self, milliseconds: Optional[int]) -> None:
+        self._statement_timeout = milliseconds
+        self._timeout_set = True
+        for session in self._sessions.values():
+            session.statement_timeout = milliseconds
+
+    @property
+    def cursor(self):
+        return self._current().cursor
+
+    @property
+    def has_written(self) -> bool:
+        return any(session.has_written for session in self._sessions.values())
+
+    @property
+    def typed_batches(self) -> bool:
+        return self._current().typed_batches
+
+    def mogrify(self, query_str: str, params: Any) -> str:
+        return self._current().mogrify(query_str, params)
+
+    def execute(self, query_str: str, *args, **kwargs):
+        return self._current().execute(query_str, *args, **kwargs)
+
+    def batch(self, query_strs, *args, **kwargs):
+        return self._current().batch(query_strs, *args, **kwargs)
+
+    def stream(self, query_str: str, *args, **kwargs):
+        return self._current().stream(query_str, *args, **kwargs)
+
+    def copy(self, query_str: str, *args, **kwargs):
+        return self._current().copy(query_str, *args, **kwargs)
+
+    def cancel(self) -> None:
+        for session in list(self._sessions.values()):
+            session.cancel()
+
+    def commit(self) -> None:
+        for session in self._sessions.values():
+            session.commit()
+
+    def rollback(self) -> None:
+        for session in self._sessions.values():
+            session.rollback()
+
+    def close(self) -> None:
+        sessions, self._sessions = self._sessions, {}
+        for session in sessions.values():
+            session.close()
+
+    def __enter__(self) -> 'ShardedSession':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+class ShardedEngine:
+    """Spreads data over several databases by shard key, e.g. the owning user's id.
+
+    ``shards`` maps shard names to engines, or to the postgres config or ``{"url": ...}``
+    to build one with ``engine_kwargs``. Keys are placed with consistent hashing over the
+    shard names, so names have to stay stable once data is written.
+    """
+
+    def __init__(self, shards: Dict[str, Union[DatabaseEngine, Dict[str, Any]]], vnodes: int = 128,
+                 max_workers: Optional[int] = None, **engine_kwargs):
+        self.shards: Dict[str, DatabaseEngine] = {}
+        for name, shard in shards.items():
+            if isinstance(shard, DatabaseEngine):
+                self.shards[name] = shard
+            elif "url" in shard:
+                self.shards[name] = DatabaseEngine(url=shard["url"], **engine_kwargs)
+            else:
+                self.shards[name] = DatabaseEngine(shard, **engine_kwargs)
+        self.ring = HashRing(self.shards, vnodes=vnodes)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or len(self.shards),
+                                            thread_name_prefix="shard")
+
+    def shard_for(self, key: Hashable) -> str:
+        return self.ring.node_for(key)
+
+    def engine_for(self, key: Hashable) -> DatabaseEngine:
+        return self.shards[self.shard_for(key)]
+
+    def session(self, shard_key: Optional[Hashable] = None) -> ShardedSession:
+        return ShardedSession(self, shard_key)
+
+    @contextmanager
+    def transaction(self, shard_key: Optional[Hashable] = None) -> Iterator[ShardedSession]:
+        """Sharded session that commits every shard it used when the block succeeds."""
+        with self.session(shard_key) as session:
+            try:
+                yield session
+            except BaseException:
+                for shard_session in session._sessions.values():
+                    try:
+                        shard_session.rollback()
+                    except shard_session.connection.Error:
+                        pass
+                raise
+            session.commit()
+
+    def scatter(self, fn: Callable[[Session], T]) -> Dict[str, T]:
+        """Run ``fn`` on every shard in parallel, each in its own transaction, and collect the results by shard."""
+        def run(engine: DatabaseEngine) -> T:
+            with engine.transaction() as session:
+                return fn(session)
+
+        futures = {name: self._executor.submit(run, engine) for name, engine in self.shards.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+    def gather(self, fn: Callable[[Session], List[T]], key: Optional[Callable[[T], Any]] = None,
+               reverse: bool = False, limit: Optional[int] = None) -> List[T]:
+        """Scatter ``fn`` and merge the row lists of all shards.
+
+        With ``key`` the merged rows are sorted, and ``limit`` keeps the first rows after
+        that; for an ``ORDER BY ... LIMIT n`` query each shard only has to return its top n.
+        """
+        rows = [row for shard_rows in self.scatter(fn).values() for row in shard_rows]
+        if key is not None:
+            rows.sort(key=key, reverse=reverse)
+        return rows[:limit] if limit is not None else rows
+
+    def pool_stats(self) -> Dict[str, Optional[PoolStats]]:
+        return {name: engine.pool_stats() for name, engine in self.shards.items()}
+
+    def prepared_stats(self) -> Dict[str, Optional[PreparedStats]]:
+        return {name: engine.prepared_stats() for name, engine in self.shards.items()}
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        for engine in self.shards.values():
+            engine.close()
+
+    def __enter__(self) -> 'ShardedEngine':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
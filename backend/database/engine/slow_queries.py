@@ -0,0 +1,139 @@
+"""Slow statement capture, see ``DatabaseEngine(slow_query_ms=...)``."""
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from typing import Any, Deque, Dict, List, Optional
+
+# Literals and placeholders a fingerprint abstracts away
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.$])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|%\(\w+\)s|\$\d+")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+# Statements EXPLAIN accepts
+_EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'VALUES', 'TABLE', 'MERGE')
+
+def fingerprint(query_str: str) -> str:
+    """``query_str`` with its values replaced by ``?``, so runs of the same statement with
+    different values, bound or spliced into the text, share one fingerprint."""
+    text = _STRING.sub('?', query_str)
+    text = _PLACEHOLDER.sub('?', text)
+    text = _NUMBER.sub('?', text)
+    text = _LIST.sub('(...)', text)
+    return _SPACE.sub(' ', text).strip().rstrip(';')
+
+def fingerprint_id(fingerprint: str) -> str:
+    return hashlib.md5(fingerprint.encode('utf-8')).hexdigest()[:16]
+
+def explainable(query_str: str) -> bool:
+    words = query_str.lstrip(' \t\n(').split(None, 1)
+    return bool(words) and words[0].upper() in _EXPLAINABLE
+
+def explain_sql(query_str: str, analyze: bool = False, buffers: bool = False) -> str:
+    """EXPLAIN statement returning the plan of ``query_str`` as JSON."""
+    options = ['FORMAT JSON']
+    if analyze:
+        options.append('ANALYZE')
+    if buffers:
+        options.append('BUFFERS')
+    return f"EXPLAIN ({', '.join(options)}) {query_str.strip().rstrip(';')}"
+
+def parse_plan(value: Any) -> Dict[str, Any]:
+    """Plan of an ``explain_sql`` result: the driver returns JSON parsed or as text."""
+    if isinstance(value, (str, bytes)):
+        value = json.loads(value)
+    return value[0]
+
+@dataclass
+class SlowQuery:
+    fingerprint: str
+    query: str
+    duration_ms: float
+    at: float
+    plan: Optional[Dict[str, Any]] = None
+
+    @property
+    def id(self) -> str:
+        return fingerprint_id(self.fingerprint)
+
+@dataclass
+class SlowQueryStats:
+    fingerprint: str
+    count: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    last_at: float = 0.0
+    plan: Optional[Dict[str, Any]] = field(default=None, repr=False)
+
+    @property
+    def id(self) -> str:
+        return fingerprint_id(self.fingerprint)
+
+    @property
+    def mean_ms(self) -> float:
+        return self.total_ms / self.count if self.count else 0.0
+
+class SlowQueryLog:
+    """Bounded in-process record of statements that took ``threshold_ms`` or longer.
+
+    Keeps the last ``capacity`` slow statements and running totals for up to
+    ``max_fingerprints`` distinct fingerprints, dropping the least recently seen. A plan
+    is captured the first time a fingerprint turns up slow and then for an
+    ``explain_sample`` fraction of its slow runs. Shared by all sessions of an engine.
+    """
+
+    def __init__(self, threshold_ms: float, capacity: int = 200, explain_sample: float = 0.1,
+                 max_fingerprints: int = 500):
+        self.threshold_ms = threshold_ms
+        self.explain_sample = explain_sample
+        self.max_fingerprints = max_fingerprints
+        self._entries: Deque[SlowQuery] = deque(maxlen=capacity)
+        self._stats: 'OrderedDict[str, SlowQueryStats]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def is_slow(self, duration_ms: float) -> bool:
+        return duration_ms >= self.threshold_ms
+
+    def wants_plan(self, query_fingerprint: str) -> bool:
+        with self._lock:
+            known = query_fingerprint in self._stats
+        return not known or random.random() < self.explain_sample
+
+    def record(self, query_str: str, duration_ms: float, plan: Optional[Dict[str, Any]] = None,
+               query_fingerprint: Optional[str] = None) -> SlowQuery:
+        query_fingerprint = query_fingerprint or fingerprint(query_str)
+        entry = SlowQuery(query_fingerprint, query_str, duration_ms, time.time(), plan)
+        with self._lock:
+            self._entries.append(entry)
+            stats = self._stats.pop(query_fingerprint, None) or SlowQueryStats(query_fingerprint)
+            self._stats[query_fingerprint] = stats
+            stats.count += 1
+            stats.total_ms += duration_ms
+            stats.max_ms = max(stats.max_ms, duration_ms)
+            stats.last_at = entry.at
+            if plan is not None:
+                stats.plan = plan
+            while len(self._stats) > self.max_fingerprints:
+                self._stats.popitem(last=False)
+        return entry
+
+    def entries(self) -> List[SlowQuery]:
+        """Recorded slow statements, newest first."""
+        with self._lock:
+            return list(reversed(self._entries))
+
+    def stats(self) -> List[SlowQueryStats]:
+        """Totals per fingerprint, the most time spent first."""
+        with self._lock:
+            return sorted(self._stats.values(), key=lambda stats: stats.total_ms, reverse=True)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._stats.clear()
@@ -39,7 +39,8 @@ from .constraints import (
     Index
 )
 
-from .base_schema import BaseSchema, BaseDataClass, QueryHelper
+from .base_schema import BaseSchema, BaseDataClass, QueryHelper, AsyncQueryHelper, BulkInsertResult, BulkUpdateResult, UpsertResult
+from .loader import Loader, Loaders
 
 __all__ = [
     # Fields
@@ -68,5 +69,13 @@ __all__ = [
     'BaseDataClass',
 
     # Query Runner
-    'QueryHelper'
+    'QueryHelper',
+    'AsyncQueryHelper',
+    'BulkInsertResult',
+    'BulkUpdateResult',
+    'UpsertResult',
+
+    # Batched lookups
+    'Loader',
+    'Loaders'
 ]
\ No newline at end of file
@@ -1,14 +1,19 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Iterable, Tuple, List, Optional, TypeVar, Type, Set, Union, Generic, TYPE_CHECKING
+from typing import Dict, Any, Callable, Iterable, Iterator, AsyncIterator, Tuple, List, Optional, Sequence, TypeVar, Type, Set, Union, Generic, TYPE_CHECKING
 from marshmallow import Schema, fields, ValidationError, post_load
 from psycopg2.extensions import cursor as Cursor, AsIs
 from dataclasses import dataclass, field
 from datetime import datetime
+import itertools
+import json
+from operator import attrgetter
 import re
+import time
 
-from .fields import DatabaseFieldBase, PrimaryKey
+from .fields import DatabaseFieldBase, DBType, PrimaryKey, JSON, Array
 from .constraints import TableConstraint, Index
-from ..engine import DBSession
+from ..engine import DBSession, AsyncDBSession, RowDescriptor
+from ..engine.slow_queries import explain_sql, parse_plan
 from ..query import Query, QueryParamList, QUERIES
 from ..query.base import QueryBuilderBase
 
@@ -47,6 +52,8 @@ class ModelSchemaMeta(type(Schema)):
             for field_name, field in cls._declared_fields.items():
                 if hasattr(field, '_post_init'):
                     field._post_init(cls, field_name)
+            cls.__deferred__ = tuple(name for name, field in cls._declared_fields.items()
+                                     if getattr(field, 'db_deferred', False))
             
         # Bind foreign keys
         cls._bind_foreign_keys()
@@ -64,6 +71,13 @@ class BaseSchema(Schema, ABC, Generic[T], metaclass=ModelSchemaMeta):
     __table_args__ = None  # Additional table arguments (constraints, indexes, etc.)
     __initializing__ = False  # Flag to prevent validation during initialization
     __data_class__ = BaseDataClass  # Data class associated with this schema
+    __deferred__: Tuple[str, ...] = ()  # Fields declared deferred=True, left out of Select(schema)
+
+    def __init__(self, *args, **kwargs):
+        # Rows loaded without their deferred columns are complete, even if those are NOT NULL
+        if self.__deferred__:
+            kwargs.setdefault('partial', self.__deferred__)
+        super().__init__(*args, **kwargs)
 
     # Core database operations
     @classmethod
@@ -83,28 +97,52 @@ class BaseSchema(Schema, ABC, Generic[T], metaclass=ModelSchemaMeta):
     def get_all(cls, session: DBSession,
                 order_by: Optional[List[str]] = None,
                 limit: Optional[int] = None,
-                offset: Optional[int] = None) -> List[T]:
-        """Get all records with optional ordering and pagination."""
+                offset: Optional[int] = None,
+                after: Optional[str] = None,
+                with_total: bool = False) -> Union[List[T], Tuple[List[T], Optional[int]]]:
+        """Get all records with optional ordering and pagination.
+
+        ``after`` takes a cursor from ``cursor_for`` and pages by key instead of OFFSET, so
+        every page costs the same; see ``_paginate``. With ``with_total`` the result is
+        ``(records, total)``, see ``_fetch``.
+        """
         from ..query.query_builder import Select
         
-        query = Select(cls)
-        
-        if order_by:
-            query.order_by(*[cls.col(field) for field in order_by])
-        if limit is not None:
-            query.limit(limit)
+        query = cls._paginate(Select(cls), order_by, limit, after)
         if offset is not None:
             query.offset(offset)
             
-        return QueryHelper.fetch_multiple(query.get_query(), session, cls)
+        return cls._fetch(query, session, with_total)
 
     @classmethod
     def filter_by(cls, session: DBSession,
                   filters: Dict[str, Any],
-                  order_by: Optional[List[str]] = None) -> List[T]:
-        """Get records matching the given filters."""
-        from ..query.query_builder import Select, Condition
-        
+                  order_by: Optional[List[str]] = None,
+                  limit: Optional[int] = None,
+                  after: Optional[str] = None,
+                  with_total: bool = False) -> Union[List[T], Tuple[List[T], Optional[int]]]:
+        """Get records matching the given filters, optionally a page at a time like ``get_all``."""
+        from ..query.query_builder import Select
+
+        query = cls._paginate(cls._filter(Select(cls), filters), order_by, limit, after)
+            
+        return cls._fetch(query, session, with_total)
+
+    @classmethod
+    def count(cls, session: DBSession, filters: Optional[Dict[str, Any]] = None) -> int:
+        """Count records matching the given filters with ``COUNT(*)``, no rows are fetched."""
+        from ..query.query_builder import Select
+
+        return QueryHelper.fetch_value(cls._filter(Select(cls), filters).count(), session)
+
+    @classmethod
+    def _filter(cls, query: 'Select', filters: Optional[Dict[str, Any]]) -> 'Select':
+        """Restrict ``query`` to rows whose fields equal ``filters``."""
+        from ..query.query_builder import Condition
+
+        if not filters:
+            return query
+
         condition = Condition()
         first = True
         
@@ -114,22 +152,87 @@ class BaseSchema(Schema, ABC, Generic[T], metaclass=ModelSchemaMeta):
                 first = False
             else:
                 condition.and_().eq(cls.col(field), value)
-                
-        query = Select(cls).where(condition)
-        
-        if order_by:
-            query.order_by(*[cls.col(field) for field in order_by])
-            
+
+        return query.where(condition)
+
+    @classmethod
+    def _fetch(cls, query: 'Select', session: DBSession, with_total: bool) -> Union[List[T], Tuple[List[T], Optional[int]]]:
+        # COUNT(*) OVER() is computed before LIMIT, so the page carries the number of matching
+        # rows; after a cursor that is the number of rows from the cursor on. An empty page
+        # carries no total, see ``QueryHelper.fetch_multiple_with_total``
+        if with_total:
+            return QueryHelper.fetch_multiple_with_total(query.with_total().get_query(), session, cls)
         return QueryHelper.fetch_multiple(query.get_query(), session, cls)
 
+    @classmethod
+    def _keyset(cls, order_by: Optional[List[str]]) -> List[str]:
+        """Fields that order pages: ``order_by`` with the primary key as tie breaker."""
+        pk_name, _ = cls._get_pk()
+        fields = list(order_by or [])
+        if pk_name not in fields:
+            fields.append(pk_name)
+        return fields
+
+    @classmethod
+    def _paginate(cls, query: 'Select', order_by: Optional[List[str]], limit: Optional[int],
+                  after: Optional[str]) -> 'Select':
+        # Pages (a limit or a cursor) are ordered by key, so the next one can start after the last row
+        if limit is None and after is None:
+            if order_by:
+                query.order_by(*[cls.col(field) for field in order_by])
+            return query
+        return query.seek([cls.col(field) for field in cls._keyset(order_by)], after=after, limit=limit)
+
+    @classmethod
+    def cursor_for(cls, item: T, order_by: Optional[List[str]] = None) -> str:
+        """Cursor for the page after ``item`` in ``get_all``/``filter_by`` with the same ``order_by``."""
+        from ..query.cursor import encode_cursor, column_key
+
+        fields = cls._keyset(order_by)
+        return encode_cursor([column_key(str(cls.col(field))) for field in fields],
+                             [getattr(item, field) for field in fields])
+
+    @classmethod
+    def load_deferred(cls, session: DBSession, items: Union[T, List[T]], *fields: str) -> None:
+        """Fetch deferred ``fields`` (all of them by default) into records loaded without them,
+        with one query for all of ``items``."""
+        deferred = cls._deferred_query(items, fields)
+        if deferred is not None:
+            query, apply = deferred
+            apply(QueryHelper.fetch_tuples(query, session)[1])
+
+    @classmethod
+    def _deferred_query(cls, items: Union[T, List[T]], fields: Sequence[str]
+                        ) -> Optional[Tuple[Query, Callable[[List[tuple]], None]]]:
+        """Query for ``load_deferred`` and a function that sets its rows on the records, None if
+        there is nothing to load."""
+        from ..query.query_builder import Select, Condition
+
+        items = items if isinstance(items, list) else [items]
+        fields = fields or cls.__deferred__
+        if not items or not fields:
+            return None
+
+        pk_name, _ = cls._get_pk()
+        by_pk = {getattr(item, pk_name): item for item in items}
+        query = Select(cls, cls.col(pk_name), *[cls.col(field) for field in fields]).where(
+            Condition().in_(cls.col(pk_name), list(by_pk))
+        ).get_query()
+
+        def apply(rows: List[tuple]) -> None:
+            for pk, *values in rows:
+                item = by_pk[pk]
+                for field, value in zip(fields, values):
+                    setattr(item, field, value)
+        return query, apply
+
     @classmethod
     def exists_by_field(cls, session: DBSession, field: str, value: Any) -> bool:
         """Check if a record exists with the given field value."""
         from ..query.query_builder import Select, Condition
         
         condition = Condition().eq(cls.col(field), value)
-        query = Select(cls).where(condition).limit(1)
-        return bool(QueryHelper.fetch_one_raw(query.get_query(), session))
+        return QueryHelper.fetch_value(Select(cls).where(condition).exists(), session)
     
     @classmethod
     def _validate_schema(cls):
@@ -194,11 +297,13 @@ class BaseSchema(Schema, ABC, Generic[T], metaclass=ModelSchemaMeta):
         return AsIs(f'{cls._table()}.{cls._get_col(field_name)}{f" AS {alias}" if alias else ""}')
     
     @classmethod
-    def all_cols(cls, prefix: str = "") -> List[AsIs]:
-        """Get all fully qualified column names."""
+    def all_cols(cls, prefix: str = "", undefer: Sequence[str] = ()) -> List[AsIs]:
+        """Get all fully qualified column names, without deferred fields unless listed in ``undefer``."""
         cols: List[AsIs] = []
 
         for name in cls._fields():
+            if name in cls.__deferred__ and name not in undefer:
+                continue
             col_name = cls._get_col(name)
             as_name = f"AS {prefix}{col_name}" if prefix else ""
             cols.append(AsIs(f'{cls._table()}.{col_name} {as_name}'))
@@ -392,18 +497,20 @@ class BaseSchema(Schema, ABC, Generic[T], metaclass=ModelSchemaMeta):
             where = f"{pk_name} = %({pk_name})s"
             params[pk_name] = getattr(self, pk_name)
         
-        sql = f"""
-        UPDATE {cls._table()}
-        SET {set_clause}
-        WHERE {where}
-        """
+        sql = f"UPDATE {cls._table()} SET {set_clause} WHERE {where}"
         
-        return Query(sql, params)
+        return Query(sql, params, normalize=False)
     
     @classmethod
     def _get_insert_query(cls, 
-                        fields: Optional[List[str]] = None) -> Tuple[Query, QueryParamList]:
-        """Generate INSERT query for this record."""
+                        fields: Optional[List[str]] = None,
+                        on_conflict: Optional[str] = None,
+                        returning: Optional[List[str]] = None) -> Tuple[Query, QueryParamList]:
+        """Generate INSERT query for this record.
+
+        ``on_conflict`` is an ``ON CONFLICT`` clause, ``returning`` the column expressions to
+        return instead of the auto fields' columns.
+        """
         if fields is None:
             fields = [
                 name for name, field in cls._fields().items()
@@ -417,21 +524,19 @@ class BaseSchema(Schema, ABC, Generic[T], metaclass=ModelSchemaMeta):
         
         columns = [cls._get_col(field) for field in fields]
         values = [f"%({field})s" for field in fields]
-        return_columns = [cls._get_col(field) for field in returning_fields]
+        return_columns = returning if returning is not None else [cls._get_col(field) for field in returning_fields]
         
-        sql = f"""
-        INSERT INTO {cls._table()}
-            ({', '.join(columns)})
-        VALUES
-            {Query.SUBQUERY_PATTERN % 'values'}
-        """
+        sql = f"INSERT INTO {cls._table()} ({', '.join(columns)}) VALUES {Query.SUBQUERY_PATTERN % 'values'}"
         
+        if on_conflict:
+            sql += f" {on_conflict}"
+
         if return_columns:
             sql += f" RETURNING {', '.join(return_columns)}"
         
-        qp = QueryParamList("(" + ", ".join(values) + ")")
+        qp = QueryParamList("(" + ", ".join(values) + ")", normalize=False)
 
-        q = Query(sql, {})
+        q = Query(sql, {}, normalize=False)
         return q, qp
     
     @classmethod
@@ -439,37 +544,123 @@ class BaseSchema(Schema, ABC, Generic[T], metaclass=ModelSchemaMeta):
                         where: str,
                         params: Optional[Dict[str, Any]] = None) -> Query:
         """Generate DELETE query."""
-        sql = f"""
-        DELETE FROM {cls._table()}
-        WHERE {where}
-        """
+        sql = f"DELETE FROM {cls._table()} WHERE {where}"
         
-        return Query(sql, params or {})
+        return Query(sql, params or {}, normalize=False)
+
+@dataclass
+class BulkInsertResult:
+    """Outcome of ``QueryHelper.bulk_insert``."""
+    rows: int
+    seconds: float
+    # Generated primary keys in input order, when requested
+    ids: Optional[List[Any]] = None
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+@dataclass
+class UpsertResult(Generic[T]):
+    """Outcome of ``QueryHelper.upsert``, the records in input order."""
+    inserted: List[T]
+    # Rows that already existed: updated with ``update=[...]``, left alone with ``"nothing"``
+    conflicted: List[T]
+
+@dataclass
+class BulkUpdateResult(Generic[T]):
+    """Outcome of ``QueryHelper.bulk_update``."""
+    rows: int
+    seconds: float
+    # Records no row matched, when RETURNING was asked for
+    missing: Optional[List[T]] = None
+
+# Bind messages count parameters in 16 bits, so one multi-row INSERT carries at most this many
+_MAX_BULK_PARAMS = 65535
+
+# Column types that only exist in DDL
+_CAST_TYPES = {DBType.SERIAL: "INTEGER", DBType.BIGSERIAL: "BIGINT"}
+
+def _cast(field: DatabaseFieldBase) -> str:
+    """Cast to the field's column type for values whose type the database cannot infer,
+    e.g. text or NULL in a VALUES list. Arrays are sent typed."""
+    if isinstance(field, Array):
+        return ""
+    return "::" + _CAST_TYPES.get(field.db_type, field.db_type.value)
 
 class QueryHelper:
     @staticmethod
     def run(query: Query, session: DBSession, force_log: bool = True) -> None:
         """Execute a query without returning results."""
-        query_str = query.construct_query(session=session)
+        # Values travel as parameters, so hot templates can run as prepared statements
+        query_str, params = query.template()
 
-        session.execute(query_str, force_log=force_log)
+        session.execute(query_str, force_log=force_log, read_only=query.read_only, timeout=query.statement_timeout,
+                        params=params, prepare=True)
+
+    @staticmethod
+    def explain(query: Query, session: DBSession, analyze: bool = False, buffers: bool = False) -> Dict[str, Any]:
+        """The plan of ``query`` from ``EXPLAIN (FORMAT JSON)``, parsed.
+
+        ``analyze`` runs the query to add actual row counts and timings (a write really
+        happens), ``buffers`` adds block I/O to them.
+        """
+        query_str, params = query.template()
+        session.execute(explain_sql(query_str, analyze, buffers), force_log=True, read_only=query.read_only,
+                        timeout=query.statement_timeout, params=params)
+        return parse_plan(session.cursor.fetchone()[0])
+
+    @staticmethod
+    def fetch_one_tuple(query: Query, session: DBSession) -> Tuple[Optional[RowDescriptor], Optional[tuple]]:
+        """Fetch a single row as a plain tuple along with its column descriptor."""
+        QueryHelper.run(query, session)
+        return RowDescriptor.from_cursor(session.cursor), session.cursor.fetchone()
+
+    @staticmethod
+    def fetch_tuples(query: Query, session: DBSession) -> Tuple[Optional[RowDescriptor], List[tuple]]:
+        """Fetch rows as plain tuples along with their shared column descriptor."""
+        QueryHelper.run(query, session)
+        return RowDescriptor.from_cursor(session.cursor), session.cursor.fetchall()
 
     @staticmethod
     def fetch_one_raw(query: Query, session: DBSession) -> Optional[Dict[str, Any]]:
         """Fetch a single row as a dictionary."""
-        QueryHelper.run(query, session)
-        result = session.cursor.fetchone()
-        if result:
-            return {key: result[key] for key in result.keys()}
+        descriptor, row = QueryHelper.fetch_one_tuple(query, session)
+        if row:
+            return descriptor.to_dict(row)
         return None
     
     @staticmethod
     def fetch_multiple_raw(query: Query, session: DBSession) -> List[Dict[str, Any]]:
         """Fetch multiple rows as dictionaries."""
-        QueryHelper.run(query, session)
-        results = session.cursor.fetchall()
-        return [{key: row[key] for key in row.keys()} for row in results]
+        descriptor, rows = QueryHelper.fetch_tuples(query, session)
+        return descriptor.to_dicts(rows) if rows else []
     
+    @staticmethod
+    def iter_tuples(query: Query, session: DBSession, itersize: int = 2000,
+                    force_log: bool = True) -> Iterator[Tuple[RowDescriptor, tuple]]:
+        """Stream rows as plain tuples through a server-side cursor, ``itersize`` rows per round trip."""
+        query_str, params = query.template()
+        for descriptor, rows in session.stream(query_str, itersize=itersize, force_log=force_log, read_only=query.read_only,
+                                               timeout=query.statement_timeout, params=params):
+            for row in rows:
+                yield descriptor, row
+
+    @staticmethod
+    def iter_raw(query: Query, session: DBSession, itersize: int = 2000, force_log: bool = True) -> Iterator[Dict[str, Any]]:
+        """Stream rows as dictionaries through a server-side cursor, ``itersize`` rows per round trip."""
+        query_str, params = query.template()
+        for descriptor, rows in session.stream(query_str, itersize=itersize, force_log=force_log, read_only=query.read_only,
+                                               timeout=query.statement_timeout, params=params):
+            yield from descriptor.to_dicts(rows)
+
+    @staticmethod
+    def iter_rows(query: Query, session: DBSession, schema: Type[BaseSchema[T]], itersize: int = 2000) -> Iterator[T]:
+        """Stream and deserialize rows one at a time so memory use doesn't grow with the result size."""
+        loader = schema()
+        for row in QueryHelper.iter_raw(query, session, itersize=itersize):
+            yield loader.load(row)
+
     @staticmethod
     def fetch_one(query: Query, session: DBSession, schema: Type[BaseSchema[T]]) -> Optional[T]:
         """Fetch and deserialize a single row."""
@@ -483,10 +674,67 @@ class QueryHelper:
         """Fetch and deserialize multiple rows."""
         raw = QueryHelper.fetch_multiple_raw(query, session)
         return schema(many=True).load(raw)
+
+    @staticmethod
+    def fetch_value(query: Query, session: DBSession) -> Any:
+        """Fetch the first column of the first row, e.g. of ``Select.count()`` or ``Select.exists()``."""
+        _, row = QueryHelper.fetch_one_tuple(query, session)
+        return row[0] if row else None
+
+    @staticmethod
+    def fetch_multiple_with_total(query: Query, session: DBSession,
+                                  schema: Type[BaseSchema[T]]) -> Tuple[List[T], Optional[int]]:
+        """Fetch a page built with ``Select.with_total()`` and the total it carries.
+
+        The total rides on the page's rows, so an empty page, e.g. one past the end, comes back
+        as ``([], None)``: the number of matching rows is unknown, not zero. Run a ``count()``
+        when it is needed then.
+        """
+        descriptor, rows = QueryHelper.fetch_tuples(query, session)
+        return QueryHelper._split_total(descriptor, rows, schema)
+
+    @staticmethod
+    def _split_total(descriptor: Optional[RowDescriptor], rows: List[tuple],
+                     schema: Type[BaseSchema[T]]) -> Tuple[List[T], Optional[int]]:
+        # The total is the last column; an empty page has no row to carry it
+        if not rows:
+            return [], None
+        names = descriptor.names[:-1]
+        return schema(many=True).load([dict(zip(names, row)) for row in rows]), rows[0][-1]
     
     @staticmethod
-    def insert(data: Union[T, List[T]], schema: Type[BaseSchema[T]], session: DBSession) -> Union[T, List[T]]:
-        """Insert one or more records."""
+    def _load_batch(results: List[Tuple[Optional[RowDescriptor], List[tuple]]],
+                    schemas: Optional[Sequence[Optional[Type[BaseSchema]]]]) -> List[List[Any]]:
+        loaded = []
+        for i, (descriptor, rows) in enumerate(results):
+            raw = descriptor.to_dicts(rows) if rows else []
+            schema = schemas[i] if schemas else None
+            loaded.append(schema(many=True).load(raw) if schema else raw)
+        return loaded
+
+    @staticmethod
+    def fetch_batch(queries: Sequence[Query], session: DBSession,
+                    schemas: Optional[Sequence[Optional[Type[BaseSchema]]]] = None) -> List[List[Any]]:
+        """Run independent queries in one round trip.
+
+        Returns one list per query, deserialized with the matching entry of ``schemas``
+        or as dictionaries where it is None. Dictionaries need a session with
+        ``typed_batches``: psycopg2 sessions get values back as JSON, e.g. timestamps as
+        strings, which only a schema turns back into their field types.
+        """
+        if not session.typed_batches and (schemas is None or any(schema is None for schema in schemas)):
+            raise ValueError("This session batches through JSON, pass a schema for every query")
+        query_strs, params = zip(*(query.template() for query in queries)) if queries else ((), ())
+        results = session.batch(
+            query_strs, force_log=True, params=params,
+            read_only=all(query.read_only for query in queries),
+            timeout=max((q.statement_timeout for q in queries if q.statement_timeout is not None), default=None)
+        )
+        return QueryHelper._load_batch(results, schemas)
+
+    @staticmethod
+    def _prepare_insert(data: Union[T, List[T]], schema: Type[BaseSchema[T]]) -> Tuple[bool, List[T], Query]:
+        """Build the INSERT query for one or more records."""
         single_item = not isinstance(data, list)
         items = [data] if single_item else data
             
@@ -494,21 +742,479 @@ class QueryHelper:
         dumped = schema(many=True).dump(items)
         query_param.add_params(dumped)
         insert_query.add_sub_queries({'values': query_param})
-        QueryHelper.run(insert_query, session)
+        return single_item, items, insert_query
 
-        # Update data with auto-generated fields
-        returning_fields = [
+    @staticmethod
+    def _returning_fields(schema: Type[BaseSchema[T]]) -> List[Tuple[str, DatabaseFieldBase]]:
+        return [
             (name, field) for name, field in schema._fields().items()
             if field.is_auto()
         ]
 
-        if returning_fields:
-            returning_data = session.cursor.fetchall()
-            for i, item in enumerate(items):
-                for name, field in returning_fields:
-                    col_name = schema._get_col_from_field(field)
-                    row_dict = {key: returning_data[i][key] for key in returning_data[i].keys()}
-                    setattr(item, name, row_dict[col_name])
+    @staticmethod
+    def _apply_returning(items: List[T], descriptor: RowDescriptor, returning_data: List[tuple],
+                         schema: Type[BaseSchema[T]]) -> None:
+        """Update data with auto-generated fields."""
+        positions = [
+            (name, descriptor.index[schema._get_col_from_field(field)])
+            for name, field in QueryHelper._returning_fields(schema)
+        ]
+        for item, row in zip(items, returning_data):
+            for name, position in positions:
+                setattr(item, name, row[position])
+
+    @staticmethod
+    def insert(data: Union[T, List[T]], schema: Type[BaseSchema[T]], session: DBSession) -> Union[T, List[T]]:
+        """Insert one or more records."""
+        single_item, items, insert_query = QueryHelper._prepare_insert(data, schema)
+        QueryHelper.run(insert_query, session)
+
+        if QueryHelper._returning_fields(schema):
+            QueryHelper._apply_returning(items, RowDescriptor.from_cursor(session.cursor), session.cursor.fetchall(), schema)
 
         return items[0] if single_item else items
-    
\ No newline at end of file
+
+    @staticmethod
+    def upsert(data: Union[T, List[T]], schema: Type[BaseSchema[T]], session: DBSession,
+               conflict: Optional[Sequence[str]] = None, update: Union[Sequence[str], str] = "nothing",
+               returning: Optional[Sequence[str]] = None, batch_size: int = 1000) -> UpsertResult[T]:
+        """Insert records, ``INSERT ... ON CONFLICT``, ``batch_size`` per statement.
+
+        A record whose ``conflict`` fields match an existing row updates the ``update`` fields of
+        that row, or is skipped with ``"nothing"``. Without ``conflict`` any unique violation
+        skips the record. The ``returning`` fields, by default those the database fills in, are
+        set on every record that was written. Records are told apart by their ``conflict``
+        fields, or the schema's first unique field, so several records need one of them.
+        """
+        result: UpsertResult[T] = UpsertResult([], [])
+        keys, returned, batches = QueryHelper._prepare_upsert(data, schema, conflict, update, returning, batch_size)
+        for batch, query in batches:
+            QueryHelper.run(query, session)
+            QueryHelper._split_upsert(batch, RowDescriptor.from_cursor(session.cursor), session.cursor.fetchall(),
+                                      schema, keys, returned, result)
+        return result
+
+    @staticmethod
+    def _prepare_upsert(data: Union[T, List[T]], schema: Type[BaseSchema[T]], conflict: Optional[Sequence[str]],
+                        update: Union[Sequence[str], str], returning: Optional[Sequence[str]],
+                        batch_size: int) -> Tuple[List[str], List[str], List[Tuple[List[T], Query]]]:
+        """Build the upsert statements, one per batch, with the key fields that match the
+        returned rows to the records and the fields read back from them."""
+        items = data if isinstance(data, list) else [data]
+        conflict = list(conflict or ())
+        if isinstance(update, str):
+            if update != "nothing":
+                raise ValueError(f"Unknown conflict action: {update}")
+            action = "DO NOTHING"
+        elif not conflict:
+            raise ValueError("Updating on conflict needs the conflict fields")
+        elif not update:
+            raise ValueError('No fields to update, use update="nothing" to skip conflicting records')
+        else:
+            columns = [schema._get_col(name) for name in update]
+            action = "DO UPDATE SET " + ", ".join(f"{column} = EXCLUDED.{column}" for column in columns)
+        target = f" ({', '.join(schema._get_col(name) for name in conflict)})" if conflict else ""
+
+        keys = conflict or [name for name, field in schema._fields().items() if field.db_unique][:1]
+        if not keys and len(items) > 1:
+            raise ValueError(f"{schema.__name__} has no unique field to match upserted records, pass conflict")
+        returned = list(returning) if returning is not None else [name for name, _ in QueryHelper._returning_fields(schema)]
+        return_columns = [schema._get_col(name) for name in dict.fromkeys(keys + returned)]
+        if action != "DO NOTHING":
+            # xmax is only set on rows an earlier transaction wrote, so it tells inserts from updates
+            return_columns.append("(xmax = 0) AS upsert_inserted")
+
+        inserted_fields = [name for name, field in schema._fields().items() if not field.is_auto()]
+        batch_size = max(1, min(batch_size, _MAX_BULK_PARAMS // len(inserted_fields)))
+        batches = []
+        for start in range(0, len(items), batch_size):
+            batch = items[start:start + batch_size]
+            query, query_param = schema._get_insert_query(on_conflict=f"ON CONFLICT{target} {action}",
+                                                          returning=return_columns)
+            query_param.add_params(schema(many=True).dump(batch))
+            query.add_sub_queries({'values': query_param})
+            batches.append((batch, query))
+        return keys, returned, batches
+
+    @staticmethod
+    def _split_upsert(batch: List[T], descriptor: RowDescriptor, rows: List[tuple], schema: Type[BaseSchema[T]],
+                      keys: List[str], returned: List[str], result: UpsertResult[T]) -> None:
+        """Sort the records of a batch into inserted and conflicted by the rows it returned."""
+        key_positions = [descriptor.index[schema._get_col(name)] for name in keys]
+        positions = [(name, descriptor.index[schema._get_col(name)]) for name in returned]
+        flag = descriptor.index.get("upsert_inserted")
+        by_key: Dict[tuple, List[tuple]] = {}
+        for row in rows:
+            by_key.setdefault(tuple(row[i] for i in key_positions), []).append(row)
+
+        for item in batch:
+            # A key repeated within a batch is written once, the later records conflict
+            matches = by_key.get(tuple(getattr(item, name) for name in keys))
+            row = matches.pop(0) if matches else None
+            if row is None:
+                result.conflicted.append(item)
+                continue
+            for name, position in positions:
+                setattr(item, name, row[position])
+            if flag is None or row[flag]:
+                result.inserted.append(item)
+            else:
+                result.conflicted.append(item)
+
+    @staticmethod
+    def _row_getter(schema: Type[BaseSchema[T]], names: List[str], sample: Any,
+                    fill_defaults: bool = True) -> Callable[[Any], Sequence[Any]]:
+        """Reads the column values of a record, a data class instance or a dict, straight off it
+        instead of going through a schema dump.
+
+        A key missing from a dict takes the field's default, as the data class attribute would,
+        and raises ValueError if the column is NOT NULL without one. Without ``fill_defaults``,
+        e.g. for the fields an update sets, every missing key raises.
+        """
+        fields = schema._fields()
+        if isinstance(sample, dict):
+            def missing(name: str) -> Any:
+                field = fields[name]
+                if fill_defaults and (field.db_default is not None or not field.db_required):
+                    return field.db_default
+                raise ValueError(f"{schema.__name__} record is missing {name!r}")
+
+            def getter(item: Dict[str, Any]) -> Sequence[Any]:
+                try:
+                    return [item[name] for name in names]
+                except KeyError:
+                    return [item[name] if name in item else missing(name) for name in names]
+        else:
+            get = attrgetter(*names)
+            getter = (lambda item: (get(item),)) if len(names) == 1 else get
+
+        json_positions = [i for i, name in enumerate(names) if isinstance(fields[name], JSON)]
+        if not json_positions:
+            return getter
+
+        def with_json(item: Any) -> Sequence[Any]:
+            values = list(getter(item))
+            for i in json_positions:
+                if values[i] is not None:
+                    values[i] = json.dumps(values[i])
+            return values
+        return with_json
+
+    @staticmethod
+    def _reserve_ids(schema: Type[BaseSchema[T]], session: DBSession, count: int) -> List[Any]:
+        """Take ``count`` values from the sequence behind the schema's serial primary key."""
+        pk_name, _ = schema._get_pk()
+        session.execute("SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)",
+                        params=[schema._table(), schema._get_col(pk_name), count], prepare=True)
+        return sorted(row[0] for row in session.cursor.fetchall())
+
+    @staticmethod
+    def _batches(schema: Type[BaseSchema[T]], names: List[str], items: Iterable[Any], batch_size: int,
+                 fill_defaults: bool = True) -> Iterator[Tuple[List[Any], List[Sequence[Any]]]]:
+        """Records of ``items`` ``batch_size`` at a time, each batch with the values of ``names``
+        read off its records by ``_row_getter``. ``items`` is consumed lazily, a batch at a time."""
+        getter = None
+        records = iter(items)
+        while True:
+            batch = list(itertools.islice(records, batch_size))
+            if not batch:
+                return
+            if getter is None:
+                getter = QueryHelper._row_getter(schema, names, batch[0], fill_defaults)
+            yield batch, [getter(item) for item in batch]
+
+    @staticmethod
+    def _values_batch_size(batch_size: int, width: int) -> int:
+        """``batch_size`` capped so a batch of ``width`` values per record fits in one Bind message."""
+        return max(1, min(batch_size, _MAX_BULK_PARAMS // width))
+
+    @staticmethod
+    def _values_statement(head: str, row_sql: str, tail: str, values: List[Sequence[Any]],
+                          params: Sequence[Any] = ()) -> Tuple[str, List[Any]]:
+        """``head``, a VALUES list with one ``row_sql`` per record and ``tail``, with the records'
+        values followed by ``params`` to bind. Full batches share one statement text, so it gets
+        prepared once it is hot."""
+        return (head + ", ".join([row_sql] * len(values)) + tail,
+                [value for row in values for value in row] + list(params))
+
+    @staticmethod
+    def bulk_insert(schema: Type[BaseSchema[T]], rows: Iterable[Any], session: DBSession, method: str = "copy",
+                    batch_size: int = 5000, returning: bool = False) -> BulkInsertResult:
+        """Insert a large number of records, ``batch_size`` per statement.
+
+        ``copy`` streams the rows through ``COPY ... FROM STDIN``; ``values`` sends multi-row
+        INSERTs with the values as parameters. Records are data class instances or dicts and
+        are read directly instead of being dumped by the schema, and ``rows`` may be a generator;
+        see ``_row_getter`` for dicts missing keys. With ``returning`` the generated primary keys
+        are reported in input order: ``copy`` reserves them from the key's sequence and sends them
+        along, ``values`` uses RETURNING.
+        """
+        if method not in ("copy", "values"):
+            raise ValueError(f"Unknown bulk insert method: {method}")
+        names = [name for name, field in schema._fields().items() if not field.is_auto()]
+        columns = [schema._get_col(name) for name in names]
+        pk_name, _ = schema._get_pk()
+        if returning and pk_name is None:
+            raise ValueError(f"{schema.__name__} has no primary key to return")
+        pk_column = schema._get_col(pk_name) if pk_name else None
+        table = schema._table()
+        if method == "values":
+            batch_size = QueryHelper._values_batch_size(batch_size, len(columns))
+            row_sql = "(" + ", ".join(["%s"] * len(columns)) + ")"
+            insert_sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES "
+            returning_sql = f" RETURNING {pk_column}" if returning else ""
+
+        start = time.perf_counter()
+        ids: Optional[List[Any]] = [] if returning else None
+        count = 0
+        # Values are read before the statement starts, so a bad record raises here instead of failing a COPY
+        for batch, values in QueryHelper._batches(schema, names, rows, batch_size):
+            if method == "copy":
+                if returning:
+                    batch_ids = QueryHelper._reserve_ids(schema, session, len(batch))
+                    ids.extend(batch_ids)
+                    session.copy(f"COPY {table} ({pk_column}, {', '.join(columns)}) FROM STDIN",
+                                 ((key, *row) for key, row in zip(batch_ids, values)), force_log=True)
+                else:
+                    session.copy(f"COPY {table} ({', '.join(columns)}) FROM STDIN", values, force_log=True)
+            else:
+                query_str, params = QueryHelper._values_statement(insert_sql, row_sql, returning_sql, values)
+                session.execute(query_str, force_log=True, params=params, prepare=True)
+                if returning:
+                    ids.extend(row[0] for row in session.cursor.fetchall())
+            count += len(batch)
+
+        return BulkInsertResult(count, time.perf_counter() - start, ids)
+
+    @staticmethod
+    def bulk_update(schema: Type[BaseSchema[T]], items: Iterable[Any], session: DBSession, fields: Sequence[str],
+                    batch_size: int = 1000, returning: Optional[Sequence[str]] = None,
+                    filters: Optional[Dict[str, Any]] = None) -> BulkUpdateResult[T]:
+        """Update ``fields`` of many records by primary key, ``batch_size`` per statement.
+
+        Each batch is one ``UPDATE ... SET col = v.col FROM (VALUES ...) AS v(...)`` joined on
+        the primary key, with the values as parameters. Records are data class instances or
+        dicts, read directly like in ``bulk_insert``; a dict missing one of the fields raises
+        ValueError instead of setting it to NULL. ``filters`` only updates rows whose fields
+        still equal the given values, e.g. ``{"status": "pending"}``, so a concurrent change
+        checked by an earlier read is not overwritten. With ``returning`` those fields are read
+        back onto the updated records and the ones that matched no row are reported.
+        """
+        start = time.perf_counter()
+        returned, batches = QueryHelper._prepare_bulk_update(schema, items, fields, batch_size, returning, filters)
+        result: BulkUpdateResult[T] = BulkUpdateResult(0, 0.0, [] if returned else None)
+        for batch, values, query_str, params in batches:
+            session.execute(query_str, force_log=True, params=params, prepare=True)
+            if returned:
+                QueryHelper._apply_bulk_update(batch, values, session.cursor.fetchall(), returned, result)
+            else:
+                result.rows += session.cursor.rowcount
+        result.seconds = time.perf_counter() - start
+        return result
+
+    @staticmethod
+    def _prepare_bulk_update(schema: Type[BaseSchema[T]], items: Iterable[Any], fields: Sequence[str],
+                             batch_size: int, returning: Optional[Sequence[str]], filters: Optional[Dict[str, Any]]
+                             ) -> Tuple[Optional[List[str]], Iterator[Tuple[List[Any], List[Sequence[Any]], str, List[Any]]]]:
+        """The fields read back and ``(records, values, statement, params)`` per batch of ``bulk_update``."""
+        pk_name, _ = schema._get_pk()
+        if pk_name is None:
+            raise ValueError(f"{schema.__name__} has no primary key to update by")
+        if not fields:
+            raise ValueError("No fields to update")
+        schema_fields = schema._fields()
+        names = [pk_name, *fields]
+        columns = [schema._get_col(name) for name in names]
+        table = schema._table()
+        pk_column = columns[0]
+
+        assignments = ", ".join(
+            f"{column} = v.{column}{_cast(schema_fields[name])}" for name, column in zip(fields, columns[1:])
+        )
+        update_sql = f"UPDATE {table} SET {assignments} FROM (VALUES "
+        where_sql = (f") AS v({', '.join(columns)}) "
+                     f"WHERE {table}.{pk_column} = v.{pk_column}{_cast(schema_fields[pk_name])}")
+        filters = filters or {}
+        for name in filters:
+            where_sql += f" AND {table}.{schema._get_col(name)} = %s"
+        returned = list(dict.fromkeys([pk_name, *returning])) if returning is not None else None
+        if returned:
+            where_sql += " RETURNING " + ", ".join(f"{table}.{schema._get_col(name)}" for name in returned)
+        row_sql = "(" + ", ".join(["%s"] * len(columns)) + ")"
+        batch_size = QueryHelper._values_batch_size(batch_size, len(columns) + len(filters))
+
+        def batches() -> Iterator[Tuple[List[Any], List[Sequence[Any]], str, List[Any]]]:
+            for batch, values in QueryHelper._batches(schema, names, items, batch_size, fill_defaults=False):
+                yield (batch, values,
+                       *QueryHelper._values_statement(update_sql, row_sql, where_sql, values, list(filters.values())))
+        return returned, batches()
+
+    @staticmethod
+    def _apply_bulk_update(batch: List[Any], values: List[Sequence[Any]], rows: List[tuple], returned: List[str],
+                           result: BulkUpdateResult[T]) -> None:
+        """Set the returned fields on the records of ``batch`` that were updated and note the others as missing."""
+        by_pk = {row[0]: row for row in rows}
+        result.rows += len(by_pk)
+        for item, row_values in zip(batch, values):
+            row = by_pk.get(row_values[0])
+            if row is None:
+                result.missing.append(item)
+                continue
+            for name, value in zip(returned, row):
+                if isinstance(item, dict):
+                    item[name] = value
+                else:
+                    setattr(item, name, value)
+
+class AsyncQueryHelper:
+    """Awaitable counterpart of ``QueryHelper`` for ``AsyncDBSession``."""
+
+    @staticmethod
+    async def run(query: Query, session: AsyncDBSession, force_log: bool = True) -> None:
+        """Execute a query without returning results."""
+        # Values travel as parameters, so hot templates can run as prepared statements
+        query_str, params = query.template()
+
+        await session.execute(query_str, force_log=force_log, read_only=query.read_only,
+                              timeout=query.statement_timeout, params=params, prepare=True)
+
+    @staticmethod
+    async def explain(query: Query, session: AsyncDBSession, analyze: bool = False, buffers: bool = False) -> Dict[str, Any]:
+        """The plan of ``query`` from ``EXPLAIN (FORMAT JSON)``, see ``QueryHelper.explain``."""
+        query_str, params = query.template()
+        await session.execute(explain_sql(query_str, analyze, buffers), force_log=True, read_only=query.read_only,
+                              timeout=query.statement_timeout, params=params)
+        return parse_plan((await session.cursor.fetchone())[0])
+
+    @staticmethod
+    async def fetch_one_tuple(query: Query, session: AsyncDBSession) -> Tuple[Optional[RowDescriptor], Optional[tuple]]:
+        """Fetch a single row as a plain tuple along with its column descriptor."""
+        await AsyncQueryHelper.run(query, session)
+        return RowDescriptor.from_cursor(session.cursor), await session.cursor.fetchone()
+
+    @staticmethod
+    async def fetch_tuples(query: Query, session: AsyncDBSession) -> Tuple[Optional[RowDescriptor], List[tuple]]:
+        """Fetch rows as plain tuples along with their shared column descriptor."""
+        await AsyncQueryHelper.run(query, session)
+        return RowDescriptor.from_cursor(session.cursor), await session.cursor.fetchall()
+
+    @staticmethod
+    async def fetch_batch(queries: Sequence[Query], session: AsyncDBSession,
+                          schemas: Optional[Sequence[Optional[Type[BaseSchema]]]] = None) -> List[List[Any]]:
+        """Run independent queries in one round trip using pipeline mode."""
+        query_strs, params = zip(*(query.template() for query in queries)) if queries else ((), ())
+        results = await session.batch(
+            query_strs, force_log=True, params=params,
+            read_only=all(query.read_only for query in queries),
+            timeout=max((q.statement_timeout for q in queries if q.statement_timeout is not None), default=None)
+        )
+        return QueryHelper._load_batch(results, schemas)
+
+    @staticmethod
+    async def fetch_one_raw(query: Query, session: AsyncDBSession) -> Optional[Dict[str, Any]]:
+        """Fetch a single row as a dictionary."""
+        descriptor, row = await AsyncQueryHelper.fetch_one_tuple(query, session)
+        if row:
+            return descriptor.to_dict(row)
+        return None
+    
+    @staticmethod
+    async def fetch_multiple_raw(query: Query, session: AsyncDBSession) -> List[Dict[str, Any]]:
+        """Fetch multiple rows as dictionaries."""
+        descriptor, rows = await AsyncQueryHelper.fetch_tuples(query, session)
+        return descriptor.to_dicts(rows) if rows else []
+    
+    @staticmethod
+    async def iter_raw(query: Query, session: AsyncDBSession, itersize: int = 2000, force_log: bool = True) -> AsyncIterator[Dict[str, Any]]:
+        """Stream rows as dictionaries through a server-side cursor, ``itersize`` rows per round trip."""
+        query_str, params = query.template()
+        async for descriptor, rows in session.stream(query_str, itersize=itersize, force_log=force_log,
+                                                     read_only=query.read_only, timeout=query.statement_timeout,
+                                                     params=params):
+            for row in descriptor.to_dicts(rows):
+                yield row
+
+    @staticmethod
+    async def iter_rows(query: Query, session: AsyncDBSession, schema: Type[BaseSchema[T]], itersize: int = 2000) -> AsyncIterator[T]:
+        """Stream and deserialize rows one at a time so memory use doesn't grow with the result size."""
+        loader = schema()
+        async for row in AsyncQueryHelper.iter_raw(query, session, itersize=itersize):
+            yield loader.load(row)
+
+    @staticmethod
+    async def fetch_one(query: Query, session: AsyncDBSession, schema: Type[BaseSchema[T]]) -> Optional[T]:
+        """Fetch and deserialize a single row."""
+        raw = await AsyncQueryHelper.fetch_one_raw(query, session)
+        if raw:
+            return schema().load(raw)
+        return None
+    
+    @staticmethod
+    async def fetch_multiple(query: Query, session: AsyncDBSession, schema: Type[BaseSchema[T]]) -> List[T]:
+        """Fetch and deserialize multiple rows."""
+        raw = await AsyncQueryHelper.fetch_multiple_raw(query, session)
+        return schema(many=True).load(raw)
+
+    @staticmethod
+    async def fetch_value(query: Query, session: AsyncDBSession) -> Any:
+        """Fetch the first column of the first row, e.g. of ``Select.count()`` or ``Select.exists()``."""
+        _, row = await AsyncQueryHelper.fetch_one_tuple(query, session)
+        return row[0] if row else None
+
+    @staticmethod
+    async def fetch_multiple_with_total(query: Query, session: AsyncDBSession,
+                                        schema: Type[BaseSchema[T]]) -> Tuple[List[T], Optional[int]]:
+        """Fetch a page built with ``Select.with_total()`` and the total it carries, None for an
+        empty page, see ``QueryHelper.fetch_multiple_with_total``."""
+        descriptor, rows = await AsyncQueryHelper.fetch_tuples(query, session)
+        return QueryHelper._split_total(descriptor, rows, schema)
+    
+    @staticmethod
+    async def load_deferred(schema: Type[BaseSchema[T]], session: AsyncDBSession, items: Union[T, List[T]],
+                            *fields: str) -> None:
+        """Fetch deferred ``fields`` into records loaded without them, see ``BaseSchema.load_deferred``."""
+        deferred = schema._deferred_query(items, fields)
+        if deferred is not None:
+            query, apply = deferred
+            apply((await AsyncQueryHelper.fetch_tuples(query, session))[1])
+
+    @staticmethod
+    async def insert(data: Union[T, List[T]], schema: Type[BaseSchema[T]], session: AsyncDBSession) -> Union[T, List[T]]:
+        """Insert one or more records."""
+        single_item, items, insert_query = QueryHelper._prepare_insert(data, schema)
+        await AsyncQueryHelper.run(insert_query, session)
+
+        if QueryHelper._returning_fields(schema):
+            QueryHelper._apply_returning(items, RowDescriptor.from_cursor(session.cursor), await session.cursor.fetchall(), schema)
+
+        return items[0] if single_item else items
+
+    @staticmethod
+    async def bulk_update(schema: Type[BaseSchema[T]], items: Iterable[Any], session: AsyncDBSession, fields: Sequence[str],
+                          batch_size: int = 1000, returning: Optional[Sequence[str]] = None,
+                          filters: Optional[Dict[str, Any]] = None) -> BulkUpdateResult[T]:
+        """Update ``fields`` of many records by primary key, see ``QueryHelper.bulk_update``."""
+        start = time.perf_counter()
+        returned, batches = QueryHelper._prepare_bulk_update(schema, items, fields, batch_size, returning, filters)
+        result: BulkUpdateResult[T] = BulkUpdateResult(0, 0.0, [] if returned else None)
+        for batch, values, query_str, params in batches:
+            await session.execute(query_str, force_log=True, params=params, prepare=True)
+            if returned:
+                QueryHelper._apply_bulk_update(batch, values, await session.cursor.fetchall(), returned, result)
+            else:
+                result.rows += session.cursor.rowcount
+        result.seconds = time.perf_counter() - start
+        return result
+
+    @staticmethod
+    async def upsert(data: Union[T, List[T]], schema: Type[BaseSchema[T]], session: AsyncDBSession,
+                     conflict: Optional[Sequence[str]] = None, update: Union[Sequence[str], str] = "nothing",
+                     returning: Optional[Sequence[str]] = None, batch_size: int = 1000) -> UpsertResult[T]:
+        """Insert records with ``ON CONFLICT``, see ``QueryHelper.upsert``."""
+        result: UpsertResult[T] = UpsertResult([], [])
+        keys, returned, batches = QueryHelper._prepare_upsert(data, schema, conflict, update, returning, batch_size)
+        for batch, query in batches:
+            await AsyncQueryHelper.run(query, session)
+            QueryHelper._split_upsert(batch, RowDescriptor.from_cursor(session.cursor), await session.cursor.fetchall(),
+                                      schema, keys, returned, result)
+        return result
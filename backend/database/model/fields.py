@@ -43,14 +43,20 @@ class DatabaseFieldBase(fields.Field, ABC):
                  index: bool = False,
                  default: Any = None,
                  check: Optional[str] = None,
+                 deferred: bool = False,
                  **kwargs):
-        """Initialize a database field."""
+        """Initialize a database field.
+
+        A ``deferred`` field is left out of ``Select(schema)`` and only fetched on request,
+        see ``Select.undefer`` and ``BaseSchema.load_deferred``.
+        """
         super().__init__(**kwargs)
         self._db_column = column
         self._db_required = required
         self._db_unique = unique
         self._db_index = index
         self._db_check = check
+        self._db_deferred = deferred
         self._default = default
         self._db_allow_null = self.allow_none
 
@@ -87,6 +93,16 @@ class DatabaseFieldBase(fields.Field, ABC):
         """Get the CHECK constraint if any."""
         return self._db_check
 
+    @property
+    def db_default(self) -> Any:
+        """Get the column default, None if there is none."""
+        return self._default
+
+    @property
+    def db_deferred(self) -> bool:
+        """Whether the column is only fetched when asked for."""
+        return self._db_deferred
+
     @property
     @abstractmethod
     def db_type(self) -> DBType:
@@ -0,0 +1,141 @@
+"""Request scoped batching of lookups by key, see ``Loaders``."""
+import asyncio
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple, Type, TypeVar, Union, Generic
+
+from ..engine import DBSession, AsyncDBSession
+from ..query import Query
+from .base_schema import BaseSchema, QueryHelper, AsyncQueryHelper
+
+T = TypeVar('T')
+
+_ALL = object()
+
+class Loader(Generic[T]):
+    """Loads ``schema`` records by ``column``, the primary key by default.
+
+    ``load`` queues a key and returns a future for its record. All keys queued in the same
+    tick of the event loop are fetched by one ``WHERE column = ANY(%s)`` query, bound as a
+    single array, and every result is memoized, so each key is read at most once for the
+    life of the loader. With ``many`` a key resolves to the list of records that have it,
+    otherwise to one record or None.
+    """
+
+    def __init__(self, schema: Type[BaseSchema[T]], session: Union[DBSession, AsyncDBSession],
+                 column: Optional[str] = None, many: bool = False, undefer: Sequence[str] = ()):
+        self.schema = schema
+        self.session = session
+        self.column = column or schema._get_pk()[0]
+        self.many = many
+        self.undefer = tuple(undefer)
+        self._memo: Dict[Any, asyncio.Future] = {}
+        self._queue: List[Tuple[Any, asyncio.Future]] = []
+        self._tasks: Set[asyncio.Task] = set()
+
+    def load(self, key: Any) -> 'asyncio.Future[Any]':
+        future = self._memo.get(key)
+        if future is not None:
+            return future
+
+        loop = asyncio.get_running_loop()
+        future = self._memo[key] = loop.create_future()
+        if key is None:  # Nothing can match NULL, no need to ask
+            future.set_result(self._missing())
+            return future
+        self._queue.append((key, future))
+        if len(self._queue) == 1:
+            loop.call_soon(self._dispatch)
+        return future
+
+    async def load_many(self, keys: Sequence[Any]) -> List[Any]:
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def prime(self, key: Any, value: Any) -> None:
+        """Memoize ``value`` for ``key`` unless it is loaded already, e.g. for records a
+        list query returned anyway."""
+        if key not in self._memo:
+            future = self._memo[key] = asyncio.get_running_loop().create_future()
+            future.set_result(value)
+
+    def clear(self, key: Any = _ALL) -> None:
+        """Forget ``key``, or every key, so the next load reads it again after a write."""
+        if key is _ALL:
+            self._memo.clear()
+        else:
+            self._memo.pop(key, None)
+
+    def _missing(self) -> Any:
+        return [] if self.many else None
+
+    def _query(self, keys: List[Any]) -> Query:
+        from ..query.query_builder import Select, Condition
+
+        select = Select(self.schema).where(Condition().in_(self.schema.col(self.column), keys))
+        if self.undefer:
+            select.undefer(*self.undefer)
+        return select.get_query()
+
+    def _dispatch(self) -> None:
+        queued, self._queue = self._queue, []
+        keys = list(dict.fromkeys(key for key, _ in queued))
+        if isinstance(self.session, AsyncDBSession):
+            task = asyncio.get_running_loop().create_task(self._fetch_async(keys, queued))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            return
+        try:
+            items = QueryHelper.fetch_multiple(self._query(keys), self.session, self.schema)
+        except Exception as e:
+            self._fail(queued, e)
+        else:
+            self._resolve(queued, items)
+
+    async def _fetch_async(self, keys: List[Any], queued: List[Tuple[Any, asyncio.Future]]) -> None:
+        try:
+            items = await AsyncQueryHelper.fetch_multiple(self._query(keys), self.session, self.schema)
+        except Exception as e:
+            self._fail(queued, e)
+        else:
+            self._resolve(queued, items)
+
+    def _resolve(self, queued: List[Tuple[Any, asyncio.Future]], items: List[T]) -> None:
+        found: Dict[Any, Any] = {}
+        for item in items:
+            key = getattr(item, self.column)
+            if self.many:
+                found.setdefault(key, []).append(item)
+            else:
+                found[key] = item
+        for key, future in queued:
+            if not future.done():
+                future.set_result(found.get(key, self._missing()))
+
+    def _fail(self, queued: List[Tuple[Any, asyncio.Future]], error: Exception) -> None:
+        for key, future in queued:
+            # A failed read is not memoized, the next load tries again
+            if self._memo.get(key) is future:
+                del self._memo[key]
+            if not future.done():
+                future.set_exception(error)
+
+class Loaders:
+    """The loaders of one request, one per schema and key column, sharing its session.
+
+    ``loaders(Users).load(user_id)`` from anywhere in the request batches with every other
+    ``Users`` lookup of the same tick and reuses what the request loaded before.
+    """
+
+    def __init__(self, session: Union[DBSession, AsyncDBSession]):
+        self.session = session
+        self._loaders: Dict[Tuple[Any, ...], Loader] = {}
+
+    def __call__(self, schema: Type[BaseSchema[T]], column: Optional[str] = None, many: bool = False,
+                 undefer: Sequence[str] = ()) -> Loader[T]:
+        key = (schema, column or schema._get_pk()[0], many, tuple(undefer))
+        loader = self._loaders.get(key)
+        if loader is None:
+            loader = self._loaders[key] = Loader(schema, self.session, column, many, undefer)
+        return loader
+
+    def clear(self) -> None:
+        for loader in self._loaders.values():
+            loader.clear()
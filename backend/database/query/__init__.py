@@ -1,4 +1,5 @@
-from .query import Query, QueryParamList, QueryError
+from .query import Query, QueryParamList, QueryError, Param, BoundQuery, BuiltQuery, CompiledQuery, template_cache_info, normalize_cache_info
 from .queries import QUERIES
+from .cursor import encode_cursor, decode_cursor
 
-__all__ = ['Query', 'QueryParamList', 'QueryError', 'QUERIES']
+__all__ = ['Query', 'QueryParamList', 'QueryError', 'Param', 'BoundQuery', 'BuiltQuery', 'CompiledQuery', 'template_cache_info', 'normalize_cache_info', 'QUERIES', 'encode_cursor', 'decode_cursor']
@@ -0,0 +1,54 @@
+"""Opaque continuation cursors for keyset pagination, see ``Select.seek``."""
+import base64
+from datetime import date, datetime, time
+from decimal import Decimal
+import json
+from typing import Any, List, Sequence
+
+_TYPES = {
+    'dt': datetime.fromisoformat,
+    'd': date.fromisoformat,
+    't': time.fromisoformat,
+    'n': Decimal,
+}
+
+def _encode_value(value: Any) -> Any:
+    # JSON has no dates or decimals; tag them so they come back with their type
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    if isinstance(value, time):
+        return {'t': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'n': str(value)}
+    return value
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        (tag, text), = value.items()
+        return _TYPES[tag](text)
+    return value
+
+def column_key(column: str) -> str:
+    """Name a selected column comes back under: its alias, or the bare column name."""
+    if ' AS ' in column:
+        return column.rsplit(' AS ', 1)[1].strip()
+    return column.rsplit('.', 1)[-1]
+
+def encode_cursor(keys: Sequence[str], values: Sequence[Any]) -> str:
+    """Cursor pointing after the row with ``values`` in the ordering over ``keys``."""
+    payload = json.dumps([list(keys), [_encode_value(value) for value in values]], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str, keys: Sequence[str]) -> List[Any]:
+    """Values stored in ``cursor``; raises ValueError if it is malformed or belongs to another ordering."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_keys, values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        values = [_decode_value(value) for value in values]
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError("Invalid pagination cursor") from e
+    if cursor_keys != list(keys) or len(values) != len(keys):
+        raise ValueError("Pagination cursor belongs to a different ordering")
+    return values
@@ -0,0 +1,100 @@
+"""Nodes the query builder assembles a statement from.
+
+A tree renders in one pass: every node appends its text to a shared list of
+fragments and its values to a shared argument list, and the fragments are
+joined once at the end.
+"""
+from abc import ABC, abstractmethod
+from typing import Any, List, Tuple
+
+class Param:
+    """Placeholder for a value that is supplied when the query runs, see ``Query.bind``.
+
+    Usable anywhere a value goes, e.g. ``Condition().eq(Users.col("username"), Param("username"))``.
+    """
+
+    __slots__ = ('name',)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __repr__(self) -> str:
+        return f"Param({self.name!r})"
+
+class Node(ABC):
+    __slots__ = ()
+
+    @abstractmethod
+    def render(self, out: List[str], args: List[Any]) -> None:
+        pass
+
+class Sql(Node):
+    """Literal SQL text, e.g. a keyword, operator or qualified column."""
+
+    __slots__ = ('text',)
+
+    def __init__(self, text: str):
+        # Rendered SQL has %s placeholders, so a literal % is doubled
+        self.text = text.replace('%', '%%')
+
+    def render(self, out: List[str], args: List[Any]) -> None:
+        out.append(self.text)
+
+class Value(Node):
+    """A value bound as a query parameter, or a ``Param`` supplied later."""
+
+    __slots__ = ('value',)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def render(self, out: List[str], args: List[Any]) -> None:
+        out.append('%s')
+        args.append(self.value)
+
+class Group(Node):
+    """Child nodes rendered with ``sep`` between them.
+
+    ``items`` is kept by reference, so builders grow a group by appending to the list.
+    """
+
+    __slots__ = ('items', 'sep')
+
+    def __init__(self, items: List[Node], sep: str = ' '):
+        self.items = items
+        self.sep = sep
+
+    def render(self, out: List[str], args: List[Any]) -> None:
+        first = True
+        for item in self.items:
+            if not first:
+                out.append(self.sep)
+            first = False
+            item.render(out, args)
+
+class Embed(Node):
+    """A ``Query`` that was not built from nodes, e.g. hand written SQL used as a subquery."""
+
+    __slots__ = ('query',)
+
+    def __init__(self, query: Any):
+        self.query = query
+
+    def render(self, out: List[str], args: List[Any]) -> None:
+        compiled, values = self.query.compile()
+        sql = compiled.sql.rstrip(';')
+        out.append(sql if compiled.order else sql.replace('%', '%%'))
+        args.extend(values[name] if name in values else Param(name) for name in compiled.order)
+
+def parens(node: Node) -> Node:
+    return Group([Sql('('), node, Sql(')')], '')
+
+def render(node: Node) -> Tuple[str, List[Any]]:
+    """SQL of the tree with ``%s`` placeholders and the argument behind each of them."""
+    out: List[str] = []
+    args: List[Any] = []
+    node.render(out, args)
+    return ''.join(out), args
+
+def words(*items: Node) -> Group:
+    return Group(list(items), ' ')
@@ -1,12 +1,172 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Iterable, Optional, Union
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple, Union
+from psycopg2.extensions import AsIs
 from ..engine import DBSession
+from .nodes import Node, Param, render
+from functools import lru_cache
+import itertools
 import re
 
 class QueryError(Exception):
     """Custom exception for query-related errors that occur during query construction or parameter binding."""
     pass
 
+def _value_shape(value: Any, values: List[Any]) -> tuple:
+    # SQL fragments are part of the structure, everything else is bound when the query runs
+    if isinstance(value, AsIs):
+        return ('sql', str(value.adapted))
+    if isinstance(value, Param):
+        return ('param', value.name)
+    values.append(value)
+    return ('value',)
+
+_TOKENS = re.compile(r"%%|%\((?P<name>\w+)\)s|\?\?plac\((?P<sub>\w+)\)\?\?")
+_SUBQUERY_TOKENS = re.compile(r"\?\?plac\((?P<sub>\w+)\)\?\?")
+_WHITESPACE = re.compile(r"\s+")
+_COMMENT = re.compile(r"/\*.*?\*/|--.*$")
+
+@lru_cache(maxsize=512)
+def _normalize(query: str) -> str:
+    """Strip comments and blank lines and join the remaining lines with single spaces."""
+    lines = []
+    for line in query.splitlines():
+        line = _COMMENT.sub('', line).strip()
+        if line:
+            lines.append(line)
+    return ' '.join(lines)
+
+class _Renderer:
+    """Turns a query shape into one template with ``%s`` placeholders.
+
+    Literal text is written with ``%`` escaped. ``order`` names the value behind each
+    placeholder: ``_v<n>`` for values, numbered in the order ``Query._shape`` collected
+    them, or the name of a ``Param``.
+    """
+
+    def __init__(self):
+        self._counter = itertools.count()
+        self.params: Dict[str, None] = {}
+
+    def _slots(self, params: tuple) -> Dict[str, Tuple[str, Optional[str]]]:
+        # Text for each placeholder name and the value it stands for, None for SQL fragments
+        slots = {}
+        for name, kind, *rest in params:
+            if kind == 'sql':
+                slots[name] = (rest[0].replace('%', '%%'), None)
+            elif kind == 'param':
+                self.params[rest[0]] = None
+                slots[name] = ('%s', rest[0])
+            else:
+                slots[name] = ('%s', f"_v{next(self._counter)}")
+        return slots
+
+    def _template(self, template: str, bound: bool, slots: Dict[str, Tuple[str, Optional[str]]],
+                  subs: Dict[str, Tuple[str, List[str]]]) -> Tuple[str, List[str]]:
+        # A template without params was never formatted, so only subquery placeholders are special in it
+        pieces = []
+        order = []
+        used = set()
+        pos = 0
+        for match in (_TOKENS if bound else _SUBQUERY_TOKENS).finditer(template):
+            pieces.append(template[pos:match.start()].replace('%', '%%'))
+            pos = match.end()
+            sub_key = match['sub']
+            if sub_key is not None:
+                if sub_key in subs:
+                    text, sub_order = subs[sub_key]
+                    pieces.append(text)
+                    order.extend(sub_order)
+                    used.add(sub_key)
+                else:
+                    pieces.append(match.group(0))
+            elif match.group(0) == '%%':
+                pieces.append('%%')
+            elif match['name'] in slots:
+                text, slot = slots[match['name']]
+                pieces.append(text)
+                if slot is not None:
+                    order.append(slot)
+            else:
+                raise QueryError(f"Parameter binding failed: no value for '{match['name']}'")
+        pieces.append(template[pos:].replace('%', '%%'))
+        for key in subs:
+            if key not in used:
+                raise QueryError(f"Subquery placeholder {Query.SUBQUERY_PATTERN % key} not found in query")
+        return ''.join(pieces), order
+
+    def render(self, shape: tuple) -> Tuple[str, List[str]]:
+        if shape[0] == 'built':
+            # Already rendered by the nodes, only the values need names
+            _, sql, args = shape
+            order = []
+            for kind in args:
+                if kind[0] == 'param':
+                    self.params[kind[1]] = None
+                    order.append(kind[1])
+                else:
+                    order.append(f"_v{next(self._counter)}")
+            return sql, order
+
+        if shape[0] == 'list':
+            _, template, sets = shape
+            texts = []
+            order = []
+            for params in sets:
+                text, set_order = self._template(template, True, self._slots(params), {})
+                texts.append(text.strip().rstrip(','))
+                order.extend(set_order)
+            return ", ".join(texts), order
+
+        _, template, end, params, sub_shapes = shape
+        slots = self._slots(params)
+        subs = {key: self.render(sub) for key, sub in sub_shapes}
+        sql, order = self._template(template, bool(params), slots, subs)
+        if end and not sql.rstrip().endswith(';'):
+            sql += ';'
+        return sql, order
+
+class CompiledQuery:
+    """SQL template of a query shape with ``%s`` placeholders for its values and ``Param``s."""
+
+    __slots__ = ('sql', 'order', 'params')
+
+    def __init__(self, sql: str, order: Tuple[str, ...], params: Tuple[str, ...]):
+        self.sql = sql
+        self.order = order  # Value behind each placeholder, see _Renderer
+        self.params = params  # Names of the Params that have to be bound
+
+    def statement(self, values: Dict[str, Any]) -> Tuple[str, Optional[List[Any]]]:
+        """The SQL and the parameters for its placeholders, None when it has none and is final as is."""
+        if not self.order:
+            return self.sql, None
+        try:
+            return self.sql, [values[name] for name in self.order]
+        except KeyError as e:
+            raise QueryError(f"No value bound for Param('{e.args[0]}')") from None
+
+    def render(self, session: DBSession, values: Dict[str, Any]) -> str:
+        """Bind ``values`` into the template on the client."""
+        sql, params = self.statement(values)
+        return sql if params is None else session.mogrify(sql, params)
+
+@lru_cache(maxsize=1024)
+def _compile(shape: tuple) -> CompiledQuery:
+    renderer = _Renderer()
+    sql, order = renderer.render(shape)
+    sql = _WHITESPACE.sub(' ', sql).strip()
+    if not order:
+        # Nothing to bind, so the text goes to the server as is
+        sql = sql.replace('%%', '%')
+    return CompiledQuery(sql, tuple(order), tuple(renderer.params))
+
+def template_cache_info():
+    """Hit and miss counts of the shared query template cache."""
+    return _compile.cache_info()
+
+def normalize_cache_info():
+    """Hit and miss counts of the cache of normalized query texts."""
+    return _normalize.cache_info()
+
 class QueryBase(ABC):
     """Abstract base class defining the interface for all query types."""
     
@@ -36,41 +196,68 @@ class Query(QueryBase):
     
     SUBQUERY_PATTERN = "??plac(%s)??"  # Format for subquery placeholders
     
-    def __init__(self, query: str = "", params: Optional[Dict[str, Any]] = None, end: bool = False):
-        """Initialize a new Query instance."""
-        self._query = self._normalize_query(query)
+    def __init__(self, query: str = "", params: Optional[Dict[str, Any]] = None, end: bool = False, read_only: bool = False,
+                 normalize: bool = True):
+        """Initialize a new Query instance.
+
+        ``normalize=False`` skips comment and whitespace cleanup for SQL generated in
+        canonical form, as the query builder and schemas do.
+        """
+        self._query = self._normalize_query(query) if normalize else query
         self._params = params or {}
         self._sub_queries: Dict[str, QueryBase] = {}
         self._final_query = ""
+        self._compiled: Optional[Tuple[CompiledQuery, Dict[str, Any]]] = None
         self._is_dirty = True
         self._end = end
+        self.read_only = read_only  # Whether the query can be served by a read replica
+        self.statement_timeout: Optional[int] = None  # Milliseconds, overrides the session's timeout
+
+    def with_timeout(self, milliseconds: Optional[int]) -> 'Query':
+        """Cancel this query on the server if it runs longer than ``milliseconds``."""
+        self.statement_timeout = milliseconds
+        return self
 
     def _normalize_query(self, query: str) -> str:
         """Clean and normalize the query string."""
-        # Remove comments and normalize whitespace
-        lines = []
-        for line in query.splitlines():
-            # Remove inline comments
-            line = re.sub(r'/\*.*?\*/', '', line)
-            line = re.sub(r'--.*$', '', line)
-            # Clean whitespace
-            line = line.strip()
-            if line:
-                lines.append(line)
-        return ' '.join(lines)
-
-    def _format_sql(self, query: str) -> str:
-        """Format SQL query for proper syntax and readability."""
-        
-        # Clean up unnecessary whitespace while preserving SQL structure
-        query = re.sub(r'\s+', ' ', query)
-        query = query.strip()
-        
-        # Add semicolon if needed and requested
-        if self._end and not query.rstrip().endswith(';'):
-            query += ";"
-            
-        return query
+        # Templates repeat, so the cleaned text is cached by the raw one
+        return _normalize(query)
+
+    def compile(self, recompile: bool = False) -> Tuple['CompiledQuery', Dict[str, Any]]:
+        """Get the cached template for this query's structure and the values captured in it.
+
+        Queries of the same shape share one template, so building and splicing the SQL
+        happens once per shape rather than once per execution.
+        """
+        if self._compiled is None or self._is_dirty or recompile:
+            values: List[Any] = []
+            shape = self._shape(values)
+            self._compiled = (_compile(shape), {f"_v{i}": value for i, value in enumerate(values)})
+            self._final_query = ""
+            self._is_dirty = False
+        return self._compiled
+
+    def _shape(self, values: List[Any]) -> tuple:
+        """Hashable description of everything that ends up in the SQL text. Bound values
+        are appended to ``values`` and only their positions are part of the shape."""
+        params = tuple((name, *_value_shape(value, values)) for name, value in self._params.items())
+        subs = tuple((key, sub._shape(values)) for key, sub in self._sub_queries.items())
+        return ('query', self._query, self._end, params, subs)
+
+    def bind(self, **params: Any) -> 'BoundQuery':
+        """Supply values for the ``Param`` placeholders of this query."""
+        return BoundQuery(self, params)
+
+    def template(self) -> Tuple[str, Optional[List[Any]]]:
+        """SQL with ``%s`` placeholders and the parameters for them, to pass to ``cursor.execute``.
+
+        Identifiers and other SQL fragments are part of the text, values never are.
+        """
+        try:
+            compiled, values = self.compile()
+            return compiled.statement(values)
+        except Exception as e:
+            raise QueryError(f"Failed to construct query: {str(e)}") from e
 
     def construct_query(self, session: DBSession, reconstruct: bool = False) -> str:
         """Construct the complete SQL query with parameters and subqueries."""
@@ -78,39 +265,16 @@ class Query(QueryBase):
             return self._final_query
             
         try:
-            bound_query = self._bind_query(session)
-            self._final_query = self._format_sql(bound_query)
-            self._is_dirty = False
+            compiled, values = self.compile(recompile=reconstruct)
+            self._final_query = compiled.render(session, values)
             return self._final_query
         except Exception as e:
             raise QueryError(f"Failed to construct query: {str(e)}") from e
 
     def _bind_query(self, session: DBSession) -> str:
         """Bind all parameters and subqueries to the query."""
-        query = self._query
-        
-        if self._sub_queries:
-            query = self._bind_sub_queries(query, session)
-            
-        if self._params:
-            try:
-                query = session.cursor.mogrify(query, self._params).decode("utf-8")
-            except Exception as e:
-                raise QueryError(f"Parameter binding failed: {str(e)}") from e
-                
-        return query
-
-    def _bind_sub_queries(self, query: str, session: DBSession) -> str:
-        """Replace subquery placeholders with their constructed queries."""
-        for key, sub_query in self._sub_queries.items():
-            placeholder = self.SUBQUERY_PATTERN % key
-            if placeholder not in query:
-                raise QueryError(f"Subquery placeholder {placeholder} not found in query")
-                
-            sub_query_str = (sub_query.query_str if sub_query.is_constructed() 
-                           else sub_query.construct_query(session))
-            query = query.replace(placeholder, sub_query_str)
-        return query
+        compiled, values = self.compile()
+        return compiled.render(session, values)
 
     def is_constructed(self) -> bool:
         """Check if the query is constructed and up to date."""
@@ -121,6 +285,12 @@ class Query(QueryBase):
         """Get the current query string."""
         return self._final_query if self.is_constructed() else self._query
 
+    @property
+    def key(self) -> str:
+        """SQL template of the query, the same for every query of the same shape whatever
+        its values; usable as a cache or metrics key."""
+        return self.compile()[0].sql
+
     def add_sub_queries(self, sub_queries: Dict[str, QueryBase]) -> 'Query':
         """Add multiple subqueries to the query."""
         self._sub_queries.update(sub_queries)
@@ -140,9 +310,9 @@ class Query(QueryBase):
         self._is_dirty = True
         return self
 
-    def set_query(self, query: str) -> 'Query':
+    def set_query(self, query: str, normalize: bool = True) -> 'Query':
         """Set a new query template."""
-        self._query = self._normalize_query(query)
+        self._query = self._normalize_query(query) if normalize else query
         self._is_dirty = True
         return self
 
@@ -184,32 +354,29 @@ class Query(QueryBase):
     def set_end(self) -> 'Query':
         """Set the query to end with a semicolon."""
         self._end = True
+        self._is_dirty = True
         return self
     
     def set_no_end(self) -> 'Query':
         """Set the query to not end with a semicolon."""
         self._end = False
+        self._is_dirty = True
         return self
 
 class QueryParamList(Query):
     """Class for handling queries with lists of parameters, typically for bulk operations."""
     
-    def __init__(self, query: str = "", params: Optional[Iterable[Dict[str, Any]]] = None):
+    def __init__(self, query: str = "", params: Optional[Iterable[Dict[str, Any]]] = None, normalize: bool = True):
         """Initialize a new QueryParamList instance."""
-        super().__init__(query, end=False)
+        super().__init__(query, end=False, normalize=normalize)
         self._param_list = list(params or [])
 
-    def _bind_query(self, session: DBSession) -> str:
-        """Bind parameters and join the results with commas."""
-        try:
-            bound_queries = []
-            for params in self._param_list:
-                bound_query = session.cursor.mogrify(self._query, params).decode("utf-8")
-                bound_query = bound_query.strip().rstrip(',')
-                bound_queries.append(bound_query)
-            return ", ".join(bound_queries)
-        except Exception as e:
-            raise QueryError(f"Failed to bind parameter list: {str(e)}") from e
+    def _shape(self, values: List[Any]) -> tuple:
+        sets = tuple(
+            tuple((name, *_value_shape(value, values)) for name, value in params.items())
+            for params in self._param_list
+        )
+        return ('list', self._query, sets)
 
     def add_params(self, params: Iterable[Dict[str, Any]]) -> 'QueryParamList':
         """Add multiple sets of parameters."""
@@ -235,3 +402,112 @@ class QueryParamList(Query):
     def params(self) -> list[Dict[str, Any]]:
         """Get a copy of all parameter sets."""
         return self._param_list.copy()
+
+class BuiltQuery(Query):
+    """Query the builders assemble from a tree of nodes, see ``Select`` and ``Condition``.
+
+    The tree renders straight to the final SQL in one pass, without templates or
+    subquery placeholders. Builders keep adding to the tree after ``get_query`` and
+    mark the query dirty when they do.
+    """
+
+    def __init__(self, node: Node, read_only: bool = False):
+        super().__init__(read_only=read_only, normalize=False)
+        self._node = node
+
+    def compile(self, recompile: bool = False) -> Tuple['CompiledQuery', Dict[str, Any]]:
+        if self._compiled is None or self._is_dirty or recompile:
+            sql, args = render(self._node)
+            if self._end:
+                sql += ';'
+            order = []
+            params = {}
+            values = {}
+            for arg in args:
+                if isinstance(arg, Param):
+                    params[arg.name] = None
+                    order.append(arg.name)
+                else:
+                    name = f"_v{len(values)}"
+                    values[name] = arg
+                    order.append(name)
+            if not order:
+                sql = sql.replace('%%', '%')
+            self._compiled = (CompiledQuery(sql, tuple(order), tuple(params)), values)
+            self._final_query = ""
+            self._is_dirty = False
+        return self._compiled
+
+    def _shape(self, values: List[Any]) -> tuple:
+        # Used when a builder query is a subquery of a hand written one
+        sql, args = render(self._node)
+        return ('built', sql, tuple(_value_shape(arg, values) for arg in args))
+
+    @property
+    def query_str(self) -> str:
+        return self._final_query if self.is_constructed() else self.compile()[0].sql
+
+    @property
+    def main_query(self) -> str:
+        return self.compile()[0].sql
+
+class BoundQuery(QueryBase):
+    """A query together with values for its ``Param`` placeholders.
+
+    Binding leaves the original query untouched, so one query built at import time can
+    serve concurrent requests; running it only merges the values into the compiled template.
+    """
+
+    def __init__(self, query: Query, params: Dict[str, Any]):
+        self._source = query
+        self._params = params
+        self._final_query = ""
+        self.read_only = query.read_only
+        self.statement_timeout = query.statement_timeout
+
+    def with_timeout(self, milliseconds: Optional[int]) -> 'BoundQuery':
+        """Cancel this query on the server if it runs longer than ``milliseconds``."""
+        self.statement_timeout = milliseconds
+        return self
+
+    def bind(self, **params: Any) -> 'BoundQuery':
+        """Supply or override further ``Param`` values."""
+        bound = BoundQuery(self._source, {**self._params, **params})
+        bound.statement_timeout = self.statement_timeout
+        return bound
+
+    def construct_query(self, session: DBSession, reconstruct: bool = False) -> str:
+        if self._final_query and not reconstruct:
+            return self._final_query
+        try:
+            self._final_query = self._bind_query(session)
+            return self._final_query
+        except Exception as e:
+            raise QueryError(f"Failed to construct query: {str(e)}") from e
+
+    def _bind_query(self, session: DBSession) -> str:
+        compiled, values = self._source.compile()
+        return compiled.render(session, {**values, **self._params})
+
+    def template(self) -> Tuple[str, Optional[List[Any]]]:
+        """Like ``Query.template``, with the bound ``Param`` values among the parameters."""
+        try:
+            compiled, values = self._source.compile()
+            return compiled.statement({**values, **self._params})
+        except Exception as e:
+            raise QueryError(f"Failed to construct query: {str(e)}") from e
+
+    def is_constructed(self) -> bool:
+        return bool(self._final_query)
+
+    @property
+    def query_str(self) -> str:
+        return self._final_query or self._source.compile()[0].sql
+
+    @property
+    def key(self) -> str:
+        return self._source.key
+
+    @property
+    def params(self) -> Dict[str, Any]:
+        return self._params.copy()
@@ -1,8 +1,10 @@
-from typing import Any, Dict, List, Optional, Union, TypeVar, Protocol, TYPE_CHECKING
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union, TypeVar, Protocol, TYPE_CHECKING
 from abc import ABC, abstractmethod
 from psycopg2.extensions import AsIs
 from ..engine import DBSession
-from .query import Query, QueryParamList
+from .query import Query, BuiltQuery
+from .nodes import Node, Sql, Value, Group, Embed, parens, words
+from .cursor import encode_cursor, decode_cursor, column_key
 from .base import QueryBuilderBase
 
 if TYPE_CHECKING:
@@ -27,12 +29,6 @@ class SchemaProtocol(Protocol):
     @classmethod
     def col(cls, field_name: str) -> AsIs: ...
 
-def _name() -> str:
-    """Generate a unique name for query parameters."""
-    _name.counter += 1
-    return f'p{_name.counter}'
-_name.counter = 0
-
 class Alias(ABC):
     def _get(self) -> str:
         pass
@@ -69,6 +65,30 @@ class TableAlias(Alias):
 
     def _get_pk(self) -> tuple[Optional[str], Any]:
         return self.table._get_pk()
+
+class Cte(TableAlias):
+    """A ``WITH`` query added by ``Select.with_``, used like a table by its name.
+
+    ``schema`` maps field names to columns when the CTE keeps a table's shape, e.g. an
+    ``Insert`` with ``RETURNING *``; without it ``col`` takes column names as they are.
+    """
+    def __init__(self, name: str, schema: Optional[SchemaProtocol] = None):
+        super().__init__(schema, name)
+
+    def col(self, name: str, alias: str = None) -> AsIs:
+        return AsIs(f'{self.alias}.{self._get_col(name)}{f" AS {alias}" if alias else ""}')
+
+    def _get_col(self, name: str) -> str:
+        return self.table._get_col(name) if self.table is not None else name
+
+    def _table(self) -> str:
+        return self.alias
+
+    def _get_fk(self, target: Any) -> Optional[str]:
+        return self.table._get_fk(target) if self.table is not None else None
+
+    def _get_pk(self) -> tuple[Optional[str], Any]:
+        return self.table._get_pk() if self.table is not None else (None, None)
     
 class Field(Alias):
     def __init__(self, table: Union[str, SchemaProtocol, TableAlias], name: str):
@@ -90,7 +110,8 @@ class QueryBuilder(ABC):
     
 class Condition(QueryBuilder):
     def __init__(self):
-        self._query = Query()
+        self._parts: List[Node] = []
+        self._query = BuiltQuery(Group(self._parts))
 
     def get_query(self) -> Query:
         return self._query
@@ -123,6 +144,8 @@ class Condition(QueryBuilder):
         return self._internal_connectors('NOT', cond)
     
     def in_(self, a: Any, b: Any) -> 'Condition':
+        if isinstance(b, (list, tuple, set, frozenset)):
+            return self._internal_array_op('=', 'ANY', a, b)
         return self._internal_op('IN', a, b)
     
     def like(self, a: Any, b: Any) -> 'Condition':
@@ -132,6 +155,8 @@ class Condition(QueryBuilder):
         return self._internal_op('ILIKE', a, b)
     
     def not_in(self, a: Any, b: Any) -> 'Condition':
+        if isinstance(b, (list, tuple, set, frozenset)):
+            return self._internal_array_op('<>', 'ALL', a, b)
         return self._internal_op('NOT IN', a, b)
 
     def is_null(self, a: Any) -> 'Condition':
@@ -141,14 +166,7 @@ class Condition(QueryBuilder):
         return self._internal_single_op('IS NOT NULL', a)
     
     def between(self, a: Any, b: Any, c: Any) -> 'Condition':
-        a_name, b_name, c_name = _name(), _name(), _name()
-
-        a_q = self._build_query_part(a, a_name)
-        b_q = self._build_query_part(b, b_name)
-        c_q = self._build_query_part(c, c_name)
-
-        self._query._query += f"{a_q} BETWEEN {b_q} AND {c_q}"
-        return self
+        return self._add(words(_operand(a), Sql('BETWEEN'), _operand(b), Sql('AND'), _operand(c)))
     
     def exists(self, a: Any) -> 'Condition':
         return self._internal_single_op('EXISTS', a)
@@ -166,85 +184,157 @@ class Condition(QueryBuilder):
         return self._internal_single_op('SOME', a)
 
     def _internal_single_op(self, op: str, a: Any) -> 'Condition':
-        q = self._build_query_part(a, _name())
-        self._query._query += f"{op} ({q})"
-        return self
+        return self._add(words(Sql(op), parens(_operand(a))))
 
     def _internal_op(self, op: str, a: Any, b: Any) -> 'Condition':
-        a_name, b_name = _name(), _name()
+        return self._add(words(_operand(a), Sql(op), _operand(b)))
 
-        a_q = self._build_query_part(a, a_name)
-        b_q = self._build_query_part(b, b_name)
-
-        self._query._query += f"{a_q} {op} {b_q}"
-        return self
+    def _internal_array_op(self, op: str, quantifier: str, a: Any, values: Any) -> 'Condition':
+        # One array parameter instead of a placeholder per item keeps the SQL the same for any length
+        return self._add(words(_operand(a), Sql(op), Group([Sql(quantifier), parens(Value(list(values)))], '')))
     
     def _internal_connectors(self, op: str, cond: Any | None = None) -> 'Condition':
-        self._query._query += f" {op} "
+        self._add(Sql(op))
         if not cond:
             return self
-        
-        name = _name()
-        q = self._build_query_part(cond, name)
-        self._query._query += q
+        return self._add(_operand(cond))
+
+    def _add(self, node: Node) -> 'Condition':
+        self._parts.append(node)
+        self._query._is_dirty = True
         return self
-    
-    def _build_query_part(self, value: Any, name: str) -> str:
-        if isinstance(value, QueryBuilder):
-            self._query.add_sub_queries({name: value.get_query()})
-            return Query.SUBQUERY_PATTERN % name
-        else:
-            self._query.add_params({name: _format_value(value)})
-            return "%(" + name + ")s"
+
+def _sub_query(query: Query) -> Node:
+    # Builder queries are spliced in as their tree, anything else is compiled on its own
+    return query._node if isinstance(query, BuiltQuery) else Embed(query)
+
+def _fragment(value: Any) -> Node:
+    """SQL fragments become text, anything else a bound value."""
+    if isinstance(value, AsIs):
+        return Sql(str(value.adapted).strip())
+    return Value(value)
+
+def _operand(value: Any) -> Node:
+    if isinstance(value, QueryBuilder):
+        return _sub_query(value.get_query())
+    if isinstance(value, Query):
+        return _sub_query(value)
+    return _fragment(_format_value(value))
+
+def _table_ref(table: Union[SchemaProtocol, TableAlias]) -> str:
+    return table.alias if isinstance(table, TableAlias) else table._table()
+
+def _deferred_fields(table: Union[SchemaProtocol, TableAlias]) -> Tuple[str, ...]:
+    if isinstance(table, Cte):  # The WITH query picked its columns already
+        return ()
+    schema = table.table if isinstance(table, TableAlias) else table
+    return getattr(schema, '__deferred__', ())
 
 def _table_str(table: Union[SchemaProtocol, TableAlias]) -> str:
+    if isinstance(table, Cte):
+        return table.alias
     if isinstance(table, TableAlias):
         return table.table._table() + " AS " + table.alias
     return table._table()
 
 class Select(QueryBuilder):
     """SQL SELECT query builder."""
-    def __init__(self, table: Union[SchemaProtocol, TableAlias], *fields: Union[Field, str, AsIs]):
+    def __init__(self, table: Union[SchemaProtocol, TableAlias], *fields: Union[Field, str, AsIs, Any]):
         self._table = table
-        self._query = Query()
         self._latest_joined = table
 
+        self._deferred: List[Tuple[Any, str]] = []  # (table, field) left out of the projection
+        self._tables = [table]  # Tables whose columns the projection covers, see join()
         if fields:
-            cols = QueryParamList('%(col)s', [
-                {'col': field if isinstance(field, (AsIs, str)) else field._get()}
+            cols = Group([
+                _fragment(field._get() if isinstance(field, Alias) else field)
                 for field in fields
-            ])
-            self._query._query = "SELECT " + (Query.SUBQUERY_PATTERN % 'cols') + " FROM %(table)s"
-            self._query.add_sub_queries({'cols': cols})
+            ], ', ')
+        elif _deferred_fields(table):
+            cols = Group(self._columns(table), ', ')
         else:
-            self._query._query = "SELECT * FROM %(table)s"
+            cols = Sql('*')
+        self._cols: Node = cols
+        self._whole_table = not fields  # See count()
 
-        self._query.add_params({'table': AsIs(_table_str(table))})
+        self._ctes: List[Node] = []  # See with_()
+        self._parts: List[Node] = [Sql('SELECT'), cols, Sql('FROM'), Sql(_table_str(table))]
+        self._query = BuiltQuery(Group(self._parts), read_only=True)
+        self._where: Optional[int] = None  # Position of the WHERE condition in _parts
+        self._seek_keys: Optional[List[str]] = None
+        self._reshaped = False  # Grouped, sorted or limited, see count()
 
     def get_query(self) -> Query:
         return self._query
 
+    def _add(self, *nodes: Node) -> 'Select':
+        self._parts.extend(nodes)
+        self._query._is_dirty = True
+        return self
+
+    def with_(self, name: str, subquery: Union[QueryBuilder, Query]) -> 'Select':
+        """Add ``name AS (subquery)`` to a WITH clause in front of this query; select from
+        or join it with ``Cte(name)``. A data-modifying subquery such as an ``Insert`` makes
+        the whole statement a write, so it goes to the primary.
+        """
+        query = subquery.get_query() if isinstance(subquery, QueryBuilder) else subquery
+        self._ctes.append(words(Sql(name), Sql('AS'), parens(_sub_query(query))))
+        if len(self._ctes) == 1:
+            self._parts[0] = words(*self._with(), Sql('SELECT'))
+        if not query.read_only:
+            self._query.read_only = False
+        self._query._is_dirty = True
+        return self
+
+    def _with(self) -> List[Node]:
+        return [Sql('WITH'), Group(self._ctes, ', ')] if self._ctes else []
+
     def where(self, condition: Condition) -> 'Select':
         """Add WHERE clause."""
-        self._query._query += " WHERE " + (Query.SUBQUERY_PATTERN % "where")
-        self._query.add_sub_queries({'where': condition.get_query()})
+        self._where = len(self._parts) + 1
+        return self._add(Sql('WHERE'), _sub_query(condition.get_query()))
+
+    def _columns(self, table: Union[SchemaProtocol, TableAlias]) -> List[Node]:
+        # Deferred columns stay on the server unless asked for, see undefer()
+        deferred = _deferred_fields(table)
+        if not deferred:
+            return [Sql(f'{_table_ref(table)}.*')]
+        self._deferred.extend((table, name) for name in deferred)
+        schema = table.table if isinstance(table, TableAlias) else table
+        return [_fragment(table.col(name)) for name in schema._fields() if name not in deferred]
+
+    def _set_cols(self, cols: Node) -> None:
+        if self._parts[1] is self._cols:
+            self._parts[1] = cols
+        else:  # Wrapped by with_total()
+            self._parts[1].items[0] = cols
+        self._cols = cols
+
+    def undefer(self, *names: str) -> 'Select':
+        """Also fetch the deferred fields ``names``, or all of them when none are given."""
+        wanted = [entry for entry in self._deferred if not names or entry[1] in names]
+        missing = set(names).difference(name for _, name in wanted)
+        if missing:
+            raise ValueError(f"Field {missing.pop()} is not deferred in this query")
+        for table, name in wanted:
+            self._deferred.remove((table, name))
+            self._cols.items.append(_fragment(table.col(name)))
+        self._query._is_dirty = True
         return self
 
     def group_by(self, *fields: Union[Field, str]) -> 'Select':
         """Add GROUP BY clause."""
-        cols = QueryParamList('%(col)s', [
-            {'col': field if isinstance(field, (AsIs, Field)) else Field(self._table, field)}
+        cols = Group([
+            _fragment(_format_value(field if isinstance(field, (AsIs, Field)) else Field(self._table, field)))
             for field in fields
-        ])
-        self._query._query += f" GROUP BY {Query.SUBQUERY_PATTERN % 'group_by'}"
-        self._query.add_sub_queries({'group_by': cols})
-        return self
+        ], ', ')
+        self._reshaped = True
+        return self._add(Sql('GROUP BY'), cols)
 
     def having(self, condition: Condition) -> 'Select':
         """Add HAVING clause."""
-        self._query._query += f" HAVING {Query.SUBQUERY_PATTERN % 'having'}"
-        self._query.add_sub_queries({'having': condition.get_query()})
-        return self
+        self._reshaped = True
+        return self._add(Sql('HAVING'), _sub_query(condition.get_query()))
 
     def order_by(self, *specs: Union[str, AsIs, Alias, Dict[Union[str, Alias, AsIs], str]]) -> 'Select':
         """Add ORDER BY clause. For each field, you can specify ASC/DESC using a dict."""
@@ -253,24 +343,107 @@ class Select(QueryBuilder):
         for spec in specs:
             if isinstance(spec, dict):
                 for field, direction in spec.items():
-                    items.append({'col': AsIs(f"{_format_value(field)} {direction.upper()}")})
+                    items.append(Sql(f"{str(_format_value(field)).strip()} {direction.upper()}"))
             else:
-                items.append({'col': _format_value(spec)})
+                items.append(_fragment(_format_value(spec)))
         
-        self._query._query += f" ORDER BY {Query.SUBQUERY_PATTERN % 'order_by'}"
-        self._query.add_sub_queries({'order_by': QueryParamList('%(col)s', items)})
-        return self
+        self._reshaped = True
+        return self._add(Sql('ORDER BY'), Group(items, ', '))
 
     def limit(self, limit: int) -> 'Select':
         """Add LIMIT clause."""
-        self._query._query += " LIMIT %(limit)s"
-        self._query.add_params({'limit': limit})
-        return self
+        self._reshaped = True
+        return self._add(Sql('LIMIT'), Value(limit))
 
     def offset(self, offset: int) -> 'Select':
         """Add OFFSET clause."""
-        self._query._query += " OFFSET %(offset)s"
-        self._query.add_params({'offset': offset})
+        self._reshaped = True
+        return self._add(Sql('OFFSET'), Value(offset))
+
+    def seek(self, order: Union[Sequence[Union[str, AsIs, Alias]], Dict[Union[str, AsIs, Alias], str]],
+             after: Union[str, Dict[Any, Any], None] = None, limit: Optional[int] = None) -> 'Select':
+        """Keyset pagination: order by ``order`` and start after the row ``after`` points to.
+
+        ``order`` lists the columns, field names of the selected table or qualified columns, or
+        maps them to one shared direction; it has to end in a unique column such as the primary
+        key, and an index over the columns makes every page cost the same. ``after`` is a
+        cursor from ``cursor_for`` or the last row's values by column. The row comparison lands
+        in WHERE (ANDed with an existing condition) and ORDER BY and LIMIT follow, so call this
+        after joins and ``where``.
+        """
+        specs = order.items() if isinstance(order, dict) else [(col, 'ASC') for col in order]
+        columns = []
+        directions = set()
+        for col, direction in specs:
+            if isinstance(col, str) and '.' not in col:
+                col = self._table.col(col)
+            columns.append(str(_format_value(col)).strip())
+            directions.add(direction.upper())
+        if len(directions) != 1 or not directions <= {'ASC', 'DESC'}:
+            raise ValueError("Keyset pagination needs all order columns in one direction, ASC or DESC")
+        direction = directions.pop()
+        self._seek_keys = [column_key(column) for column in columns]
+
+        if after is not None:
+            if isinstance(after, str):
+                values = decode_cursor(after, self._seek_keys)
+            else:
+                by_key = {column_key(str(_format_value(col)).strip()): value for col, value in after.items()}
+                values = [by_key[key] for key in self._seek_keys]
+            comparison = words(
+                parens(Group([Sql(column) for column in columns], ', ')),
+                Sql('<' if direction == 'DESC' else '>'),
+                parens(Group([Value(value) for value in values], ', ')),
+            )
+            if self._where is None:
+                self._where = len(self._parts) + 1
+                self._add(Sql('WHERE'), comparison)
+            else:
+                # The row comparison must not bind to one side of an OR in the existing condition
+                self._parts[self._where] = parens(self._parts[self._where])
+                self._parts[self._where + 1:self._where + 1] = [Sql('AND'), comparison]
+
+        self._reshaped = True
+        self._add(Sql('ORDER BY'), Group([Sql(f"{column} {direction}") for column in columns], ', '))
+        if limit is not None:
+            self.limit(limit)
+        return self
+
+    def cursor_for(self, row: Any) -> str:
+        """Cursor for the page after ``row``, the last row of a page fetched with ``seek``, as a
+        dictionary or a data class instance."""
+        if self._seek_keys is None:
+            raise ValueError("cursor_for needs a query paginated with seek")
+        if isinstance(row, dict):
+            values = [row[key] for key in self._seek_keys]
+        else:
+            values = [getattr(row, key) for key in self._seek_keys]
+        return encode_cursor(self._seek_keys, values)
+
+    def exists(self) -> Query:
+        """``SELECT EXISTS(SELECT 1 ...)`` over this query: one boolean, the rows stay on the server."""
+        inner = Group([Sql('SELECT'), Sql('1'), *self._parts[2:]])
+        return BuiltQuery(words(*self._with(), Group([Sql('SELECT EXISTS('), inner, Sql(')')], '')),
+                          read_only=self._query.read_only)
+
+    def count(self) -> Query:
+        """``SELECT COUNT(*)`` of the rows this query returns.
+
+        A plain select with joins and a WHERE is counted in place; once grouped, sorted or
+        limited it is counted as a subquery so the count matches what the query would return.
+        """
+        read_only = self._query.read_only
+        if not self._reshaped and self._whole_table:
+            return BuiltQuery(Group([*self._with(), Sql('SELECT COUNT(*)'), *self._parts[2:]]), read_only=read_only)
+        inner = Group([Sql('SELECT'), *self._parts[1:]])
+        return BuiltQuery(words(*self._with(), Sql('SELECT COUNT(*) FROM'), parens(inner), Sql('AS counted')),
+                          read_only=read_only)
+
+    def with_total(self, alias: str = 'total_count') -> 'Select':
+        """Add ``COUNT(*) OVER()`` as ``alias``: every row of a LIMITed page carries the number of
+        rows matching before the limit, so a list and its total take one round trip."""
+        self._parts[1] = Group([self._parts[1], Sql(f'COUNT(*) OVER() AS {alias}')], ', ')
+        self._query._is_dirty = True
         return self
 
     def join(self,
@@ -308,34 +481,66 @@ class Select(QueryBuilder):
         if join_type not in ('INNER', 'LEFT', 'RIGHT', 'FULL'):
             raise ValueError(f"Invalid join type: {join_type}")
 
-        join_name = _name()
-        self._query._query += f" {join_type} JOIN {AsIs(_table_str(table))} ON {Query.SUBQUERY_PATTERN % join_name}"
-        self._query.add_sub_queries({join_name: condition.get_query()})
+        self._add(Sql(f"{join_type} JOIN"), Sql(_table_str(table)), Sql('ON'), _sub_query(condition.get_query()))
+        if self._whole_table:
+            self._project_join(table)
         
         self._latest_joined = table
         return self
 
+    def _project_join(self, table: Union[SchemaProtocol, TableAlias]) -> None:
+        # SELECT * covers joined tables too, until one of them defers columns
+        self._tables.append(table)
+        if isinstance(self._cols, Sql) and not _deferred_fields(table):
+            return
+        if isinstance(self._cols, Sql):
+            self._set_cols(Group([column for joined in self._tables for column in self._columns(joined)], ', '))
+        else:
+            self._cols.items.extend(self._columns(table))
+
     def union(self, other: 'Select', all: bool = False) -> 'Select':
         """Combine with another SELECT using UNION."""
-        union_name = _name()
-        self._query._query += f" {'UNION ALL' if all else 'UNION'} {Query.SUBQUERY_PATTERN % union_name}"
-        self._query.add_sub_queries({union_name: other.get_query()})
-        return self
+        return self._add(Sql('UNION ALL' if all else 'UNION'), _sub_query(other.get_query()))
 
     def intersect(self, other: 'Select', all: bool = False) -> 'Select':
         """Combine with another SELECT using INTERSECT."""
-        intersect_name = _name()
-        self._query._query += f" {'INTERSECT ALL' if all else 'INTERSECT'} {Query.SUBQUERY_PATTERN % intersect_name}"
-        self._query.add_sub_queries({'intersect': other.get_query()})
-        return self
+        return self._add(Sql('INTERSECT ALL' if all else 'INTERSECT'), _sub_query(other.get_query()))
 
     def except_(self, other: 'Select', all: bool = False) -> 'Select':
         """Combine with another SELECT using EXCEPT."""
-        except_name = _name()
-        self._query._query += f" {'EXCEPT ALL' if all else 'EXCEPT'} {Query.SUBQUERY_PATTERN % except_name}"
-        self._query.add_sub_queries({except_name: other.get_query()})
+        return self._add(Sql('EXCEPT ALL' if all else 'EXCEPT'), _sub_query(other.get_query()))
+
+class Insert(QueryBuilder):
+    """SQL ``INSERT INTO ... SELECT`` query builder.
+
+    Inserts ``fields``, by default every field the database does not fill in itself, in
+    the order the source select lists its columns. Add it to a ``Select`` with ``with_``
+    to validate and write in one statement.
+    """
+    def __init__(self, schema: SchemaProtocol, *fields: str):
+        self._schema = schema
+        self._fields = list(fields) or [name for name, field in schema._fields().items() if not field.is_auto()]
+        columns = ', '.join(schema._get_col(name) for name in self._fields)
+        self._parts: List[Node] = [Sql(f'INSERT INTO {schema._table()} ({columns})')]
+        self._query = BuiltQuery(Group(self._parts), read_only=False)
+
+    def get_query(self) -> Query:
+        return self._query
+
+    def _add(self, *nodes: Node) -> 'Insert':
+        self._parts.extend(nodes)
+        self._query._is_dirty = True
         return self
 
+    def from_select(self, select: Union[QueryBuilder, Query]) -> 'Insert':
+        """Insert the rows ``select`` returns, none when it returns none."""
+        return self._add(_operand(select))
+
+    def returning(self, *fields: str) -> 'Insert':
+        """Add RETURNING for ``fields``, every column when none are given."""
+        columns = ', '.join(self._schema._get_col(name) for name in fields) if fields else '*'
+        return self._add(Sql(f'RETURNING {columns}'))
+
 class Statement(Alias):
     def __init__(self, op: str, col: Union[AsIs, str, Field], alias: Optional[str] = None):
         self.op = op
@@ -0,0 +1,33 @@
+from base import *
+from database import *
+
+from contextlib import contextmanager
+import time
+
+from typing import Callable, Dict, Iterator
+
+def timed(fn: Callable[[], None]) -> float:
+    """Seconds one call of ``fn`` takes."""
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+def best_of(repeat: int, fn: Callable[[], None]) -> float:
+    return min(timed(fn) for _ in range(repeat))
+
+@contextmanager
+def rolled_back_session(driver: str, conf: Dict) -> Iterator[DBSession]:
+    """Session on a fresh engine for ``driver`` whose transaction is rolled back when the block
+    exits, also on errors, so a benchmark can write to the real tables without keeping anything."""
+    postgres = conf["postgres"]
+    if "url" in postgres:
+        engine = DBEngine(url=postgres["url"], driver=driver)
+    else:
+        engine = DBEngine(config=postgres, driver=driver)
+
+    with engine:
+        with engine.session() as session:
+            try:
+                yield session
+            finally:
+                session.rollback()
@@ -0,0 +1,46 @@
+from base import *
+from bench import rolled_back_session, timed
+from database import *
+from database.engine.engine import DRIVERS
+from app.models import Skills, SkillData
+from app.dependencies import load_config
+
+import argparse
+import uuid
+
+from typing import Dict
+
+def benchmark(driver: str, conf: Dict, rows: int, batch_size: int, returning: bool) -> Dict[str, float]:
+    def data(method: str):
+        prefix = f"bulk-{method}-{uuid.uuid4().hex[:8]}"
+        return [SkillData(name=f"{prefix}-{i}", description=prefix) for i in range(rows)]
+
+    results = {}
+    # Each method adds its own rows to skills; the rollback drops all three sets, so repeated
+    # runs measure inserts into a table of the same size
+    with rolled_back_session(driver, conf) as session:
+        items = data("insert")
+        results["insert"] = rows / timed(lambda: QueryHelper.insert(items, Skills, session))
+
+        for method in ("values", "copy"):
+            result = QueryHelper.bulk_insert(Skills, data(method), session, method=method,
+                                             batch_size=batch_size, returning=returning)
+            results[method] = result.rows_per_sec
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare insert throughput of QueryHelper.insert and bulk_insert")
+    parser.add_argument("--rows", type=int, default=100000, help="rows inserted per method")
+    parser.add_argument("--batch-size", type=int, default=5000, help="rows per bulk_insert statement")
+    parser.add_argument("--returning", action="store_true", help="have bulk_insert return the generated ids")
+    args = parser.parse_args()
+
+    conf = load_config()
+    rates = {driver: benchmark(driver, conf, args.rows, args.batch_size, args.returning) for driver in DRIVERS}
+
+    print(f"{'method':<10}" + "".join(f"{driver:>16}" for driver in rates))
+    for method in ("insert", "values", "copy"):
+        print(f"{method:<10}" + "".join(f"{rates[driver][method]:>10.0f} rows/s" for driver in rates))
+
+if __name__ == "__main__":
+    main()
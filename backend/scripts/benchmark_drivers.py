@@ -0,0 +1,54 @@
+from base import *
+from bench import best_of, rolled_back_session
+from database import *
+from database.engine.engine import DRIVERS
+from app.models import Skills, SkillData
+from app.dependencies import load_config
+
+import argparse
+import uuid
+
+from typing import Dict, List
+
+def benchmark(driver: str, conf: Dict, rows: int, repeat: int) -> Dict[str, float]:
+    prefix = f"bench-{uuid.uuid4().hex[:8]}"
+    results = {}
+    # The fetches read back the skills tagged with this run's prefix, visible only inside the
+    # transaction; rolling it back leaves nothing behind for the other driver's run
+    with rolled_back_session(driver, conf) as session:
+        counter = iter(range(rows * repeat))
+
+        def insert():
+            data = [SkillData(name=f"{prefix}-{next(counter)}", description=prefix) for _ in range(rows)]
+            QueryHelper.insert(data, Skills, session)
+
+        def fetch():
+            query = Select(Skills).where(Condition().eq(Skills.col("description"), prefix)).get_query()
+            loaded: List[SkillData] = QueryHelper.fetch_multiple(query, session, Skills)
+            assert len(loaded) == rows * repeat
+
+        def fetch_tuples():
+            # Same query without deserialization, to separate driver time from schema loading
+            query = Select(Skills).where(Condition().eq(Skills.col("description"), prefix)).get_query()
+            QueryHelper.fetch_tuples(query, session)
+
+        results["insert"] = best_of(repeat, insert)
+        results["fetch_multiple"] = best_of(repeat, fetch)
+        results["fetch_tuples"] = best_of(repeat, fetch_tuples)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the psycopg2 and psycopg 3 connection backends")
+    parser.add_argument("--rows", type=int, default=5000, help="rows inserted per run")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement, the best one is reported")
+    args = parser.parse_args()
+
+    conf = load_config()
+    timings = {driver: benchmark(driver, conf, args.rows, args.repeat) for driver in DRIVERS}
+
+    print(f"{'path':<16}" + "".join(f"{driver:>12}" for driver in timings))
+    for path in ("insert", "fetch_multiple", "fetch_tuples"):
+        print(f"{path:<16}" + "".join(f"{timings[driver][path] * 1000:>10.1f}ms" for driver in timings))
+
+if __name__ == "__main__":
+    main()
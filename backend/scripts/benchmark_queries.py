@@ -0,0 +1,67 @@
+from base import *
+from database import *
+from app.models import Users, Professionals, Skills, SkillData
+
+import argparse
+import timeit
+
+from typing import Callable, Dict
+
+# A hand written query as routers and scripts pass them to Query
+RAW_SQL = """
+    -- Available professionals with their skill
+    SELECT p.id, p.title, s.name /* shown in the listing */
+    FROM professionals AS p
+    INNER JOIN skills AS s ON s.id = p.skill_id
+    WHERE p.is_available = %(available)s
+"""
+
+def per_call(number: int, repeat: int, fn: Callable[[], None]) -> float:
+    """Best time of one call in microseconds."""
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number * 1e6
+
+def cases(rows: int) -> Dict[str, Callable[[], None]]:
+    data = [SkillData(name=f"skill-{i}", description="benchmark") for i in range(rows)]
+
+    def raw_query():
+        Query(RAW_SQL, {'available': True}).template()
+
+    def select():
+        Select(Users).where(Condition().eq(Users.col("username"), "john")).get_query().template()
+
+    def professional_query():
+        # get_professional_query() of the professionals router
+        Select(
+            Users,
+            *Professionals.all_cols("p_"),
+            *Skills.all_cols("s_"),
+            *Users.all_cols("u_"),
+        ).join(Professionals).join(Skills).get_query().template()
+
+    def insert():
+        _, _, query = QueryHelper._prepare_insert(data, Skills)
+        query.template()
+
+    return {
+        "raw query": raw_query,
+        "select": select,
+        "professional": professional_query,
+        f"insert x{rows}": insert,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how long building a query and its SQL template takes")
+    parser.add_argument("--rows", type=int, default=100, help="rows in the insert query")
+    parser.add_argument("--number", type=int, default=2000, help="calls per run")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement, the best one is reported")
+    args = parser.parse_args()
+
+    for name, fn in cases(args.rows).items():
+        number = max(1, args.number // args.rows) if name.startswith("insert") else args.number
+        print(f"{name:<16}{per_call(number, args.repeat, fn):>10.1f}us")
+
+    normalize = Query(normalize=False)._normalize_query
+    print(f"{'normalize':<16}{per_call(args.number, args.repeat, lambda: normalize(RAW_SQL)):>10.1f}us")
+
+if __name__ == "__main__":
+    main()
@@ -104,8 +104,8 @@ def seed(session: DBSession):
     # Insert users
     users = QueryHelper.insert(users, Users, session)
     session.commit()
-    # Insert skills
-    skils = QueryHelper.insert(skills, Skills, session)
+    # Insert skills, reruns refresh the descriptions and pick up the existing ids
+    QueryHelper.upsert(skills, Skills, session, conflict=("name",), update=["description"])
     session.commit()
     # Insert professionals
     # First, we need to get the user ids
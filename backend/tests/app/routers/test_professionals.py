@@ -0,0 +1,15 @@
+from app.routers.professionals import get_professional_query
+
+
+def test_list_query_skips_deferred_user_columns():
+    sql, _ = get_professional_query().get_query().template()
+
+    assert "password_hash" not in sql
+    assert "profile_pic_url" not in sql
+
+
+def test_single_query_undefers_profile_picture_only():
+    sql, _ = get_professional_query("profile_pic_url").get_query().template()
+
+    assert "users.profile_pic_url AS u_profile_pic_url" in sql
+    assert "password_hash" not in sql
@@ -0,0 +1,57 @@
+from database.connection import PreparedStats, StatementCache
+from database.connection.prepared import to_positional
+
+
+def test_to_positional():
+    assert to_positional("SELECT * FROM t WHERE a = %s AND b LIKE '5%%' OR c = %s") == \
+        ("SELECT * FROM t WHERE a = $1 AND b LIKE '5%' OR c = $2", 2)
+    assert to_positional("SELECT '5%'", templated=False) == ("SELECT '5%'", 0)
+
+
+def test_template_is_prepared_at_the_threshold():
+    cache = StatementCache(threshold=3)
+
+    assert [cache.seen("SELECT 1") for _ in range(3)] == [False, False, True]
+    statement, evicted = cache.add("SELECT 1", templated=False)
+    assert cache.get("SELECT 1") is statement
+    assert statement.execute_sql == f"EXECUTE {statement.name}"
+    assert evicted is None
+
+
+def test_execute_sql_takes_the_template_parameters():
+    statement, _ = StatementCache().add("SELECT %s, %s")
+
+    assert statement.sql == "SELECT $1, $2"
+    assert statement.execute_sql == f"EXECUTE {statement.name} (%s, %s)"
+
+
+def test_least_recently_used_statement_is_evicted():
+    cache = StatementCache(threshold=1, max_size=2)
+    first, _ = cache.add("SELECT 1")
+    second, _ = cache.add("SELECT 2")
+    cache.get("SELECT 1")
+
+    _, evicted = cache.add("SELECT 3")
+    assert evicted == second.name
+    assert cache.get("SELECT 2") is None
+    assert cache.get("SELECT 1") is first
+    assert len(cache) == 2
+
+
+def test_discarded_template_is_never_prepared_again():
+    cache = StatementCache(threshold=1)
+    cache.discard("SELECT bad")
+
+    assert not cache.seen("SELECT bad")
+    assert not cache.seen("SELECT bad")
+
+
+def test_caches_share_their_stats():
+    stats = PreparedStats()
+    first, second = StatementCache(threshold=1, stats=stats), StatementCache(threshold=1, stats=stats)
+    first.seen("SELECT 1")
+    second.add("SELECT 1")
+    second.get("SELECT 1")
+
+    assert (stats.misses, stats.prepared, stats.hits) == (1, 1, 1)
+    assert stats.hit_rate == 0.5
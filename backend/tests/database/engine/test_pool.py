@@ -0,0 +1,130 @@
+from database.engine import ConnectionPool, PoolConfig, PoolTimeout
+
+import threading
+import time
+import pytest
+
+from tests.database.fakes import FakeConnection
+
+
+def make_pool(**config) -> ConnectionPool:
+    config.setdefault("min_size", 0)
+    return ConnectionPool(FakeConnection, PoolConfig(**config))
+
+
+def test_release_hands_the_same_connection_out_again():
+    pool = make_pool(max_size=2)
+    connection = pool.acquire()
+    pool.release(connection)
+
+    assert pool.acquire() is connection
+    assert pool.stats().connections_created == 1
+
+
+def test_min_size_connections_are_opened_up_front():
+    pool = make_pool(min_size=2, max_size=3)
+    stats = pool.stats()
+
+    assert stats.size == 2
+    assert stats.idle == 2
+
+
+def test_acquire_times_out_when_the_pool_is_exhausted():
+    pool = make_pool(max_size=1)
+    pool.acquire()
+
+    with pytest.raises(PoolTimeout):
+        pool.acquire(timeout=0.01)
+    assert pool.stats().timeouts == 1
+
+
+def test_waiting_acquire_gets_a_released_connection():
+    pool = make_pool(max_size=1)
+    connection = pool.acquire()
+    releaser = threading.Timer(0.05, pool.release, [connection])
+    releaser.start()
+
+    assert pool.acquire(timeout=5) is connection
+    releaser.join()
+    assert pool.stats().waited == 1
+
+
+def test_release_rolls_back_an_open_transaction():
+    pool = make_pool()
+    connection = pool.acquire()
+    connection.transaction = True
+    pool.release(connection)
+
+    assert connection.rollbacks == 1
+    assert not connection.in_transaction()
+
+
+def test_release_rejects_foreign_connections():
+    pool = make_pool()
+
+    with pytest.raises(ValueError):
+        pool.release(FakeConnection())
+
+
+def test_broken_idle_connection_is_replaced_on_acquire():
+    pool = make_pool(max_size=1)
+    broken = pool.acquire()
+    pool.release(broken)
+    broken.usable = False
+
+    connection = pool.acquire()
+
+    assert connection is not broken
+    assert broken.closed
+    assert pool.stats().size == 1
+
+
+def test_pre_ping_drops_dead_connections():
+    pool = make_pool(max_size=1, pre_ping=True)
+    dead = pool.acquire()
+    pool.release(dead)
+    dead.alive = False
+
+    assert pool.acquire() is not dead
+
+
+def test_expired_connection_is_closed_on_release():
+    pool = make_pool(max_lifetime=0.01)
+    connection = pool.acquire()
+    time.sleep(0.02)
+    pool.release(connection)
+
+    assert connection.closed
+    assert pool.stats().size == 0
+
+
+def test_failed_connect_gives_the_slot_back():
+    attempts = []
+
+    def factory():
+        attempts.append(None)
+        if len(attempts) == 1:
+            raise RuntimeError("no server")
+        return FakeConnection()
+
+    pool = ConnectionPool(factory, PoolConfig(min_size=0, max_size=1))
+    with pytest.raises(RuntimeError):
+        pool.acquire()
+
+    assert pool.acquire(timeout=0.01) is not None
+
+
+def test_close_closes_idle_and_later_released_connections():
+    pool = make_pool(max_size=2)
+    idle = pool.acquire()
+    leased = pool.acquire()
+    pool.release(idle)
+
+    pool.close()
+    assert idle.closed
+    assert not leased.closed
+
+    pool.release(leased)
+    assert leased.closed
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
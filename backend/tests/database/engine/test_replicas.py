@@ -0,0 +1,82 @@
+from database.engine import ReplicaSet, format_lsn, parse_lsn
+from database.engine.replicas import REPLAY_LSN_SQL
+
+import pytest
+
+from tests.database.fakes import FakeConnection, refused
+
+
+def replica(replay_lsn) -> FakeConnection:
+    connection = FakeConnection()
+    connection.results[REPLAY_LSN_SQL] = (replay_lsn,)
+    return connection
+
+
+def test_parse_lsn():
+    assert parse_lsn("0/0") == 0
+    assert parse_lsn("16/B374D848") == (0x16 << 32) + 0xB374D848
+    assert parse_lsn(None) is None
+
+
+def test_format_lsn_inverts_parse_lsn():
+    for lsn in ("0/0", "16/B374D848", "FFFFFFFF/FFFFFFFF", "1/0"):
+        assert format_lsn(parse_lsn(lsn)) == lsn
+
+
+def test_lsn_order_follows_the_wal():
+    # The low half is not zero-padded, so the text doesn't sort the way the WAL does
+    assert parse_lsn("0/FFFFFFFF") < parse_lsn("1/0")
+    assert parse_lsn("0/9") < parse_lsn("0/10")
+
+
+def test_lease_without_a_position_uses_any_replica():
+    connection = replica("0/0")
+    replicas = ReplicaSet([connection])
+
+    assert replicas.lease() == (0, connection)
+    assert connection.executed == []
+
+
+def test_lease_skips_lagging_replicas():
+    behind = replica("0/100")
+    caught_up = replica("0/200")
+    replicas = ReplicaSet([behind, caught_up])
+
+    for _ in range(2):
+        assert replicas.lease(parse_lsn("0/180")) == (1, caught_up)
+
+
+def test_lease_returns_none_when_every_replica_lags():
+    replicas = ReplicaSet([replica("0/100")])
+
+    assert replicas.lease(parse_lsn("0/180")) is None
+
+
+def test_replay_position_is_remembered():
+    connection = replica("0/200")
+    replicas = ReplicaSet([connection])
+    replicas.lease(parse_lsn("0/180"))
+    replicas.lease(parse_lsn("0/190"))
+
+    assert connection.executed == [REPLAY_LSN_SQL]
+
+
+def test_primary_is_never_behind():
+    # pg_last_wal_replay_lsn() is NULL on a server that is not in recovery
+    connection = replica(None)
+    replicas = ReplicaSet([connection])
+
+    assert replicas.lease(parse_lsn("FF/0")) == (0, connection)
+
+
+def test_refused_replay_query_skips_the_replica():
+    connection = FakeConnection()
+    connection.failures[REPLAY_LSN_SQL] = refused(REPLAY_LSN_SQL)
+    replicas = ReplicaSet([connection])
+
+    assert replicas.lease(1) is None
+
+
+def test_replica_set_needs_a_replica():
+    with pytest.raises(ValueError):
+        ReplicaSet([])
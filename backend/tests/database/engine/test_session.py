@@ -0,0 +1,89 @@
+from database.connection import StatementCache
+from database.engine import ConnectionPool, DBSession, PoolConfig
+
+import psycopg2
+import pytest
+
+from tests.database.fakes import FakeConnection, refused
+
+
+def test_failed_cursor_hands_the_connection_back_to_the_pool():
+    connection = FakeConnection(cursor_error=psycopg2.InterfaceError("connection already closed"))
+    pool = ConnectionPool(lambda: connection, PoolConfig(min_size=0, max_size=1))
+
+    with pytest.raises(psycopg2.InterfaceError):
+        DBSession(pool.acquire(), pool=pool)
+
+    assert pool.stats().in_use == 0
+
+
+def test_guarded_rolls_back_the_transaction_it_opened():
+    connection = FakeConnection(autocommit=False)
+    connection.failures["PREPARE bad"] = refused()
+    session = DBSession(connection)
+
+    assert session._guarded(connection, "qh_test", lambda c: c.execute("PREPARE bad")) is None
+    assert connection.rollbacks == 1
+    assert not connection.in_transaction()
+
+
+def test_guarded_leaves_autocommit_connections_alone():
+    connection = FakeConnection(autocommit=True)
+    session = DBSession(connection)
+
+    assert session._guarded(connection, "qh_test", lambda c: c.execute("SELECT 1") or 1) == 1
+    assert connection.rollbacks == 0
+
+
+def test_guarded_uses_a_savepoint_inside_a_transaction():
+    connection = FakeConnection(autocommit=False)
+    connection.transaction = True
+    connection.failures["PREPARE bad"] = refused()
+    session = DBSession(connection)
+
+    assert session._guarded(connection, "qh_test", lambda c: c.execute("PREPARE bad")) is None
+    assert connection.executed == ["SAVEPOINT qh_test", "PREPARE bad", "ROLLBACK TO SAVEPOINT qh_test"]
+    assert connection.rollbacks == 0
+    assert connection.in_transaction()
+
+
+def test_guarded_raises_when_the_connection_is_lost():
+    connection = FakeConnection(autocommit=False)
+    connection.failures["SELECT 1"] = psycopg2.OperationalError("server closed the connection")
+    session = DBSession(connection)
+
+    with pytest.raises(psycopg2.OperationalError):
+        session._guarded(connection, "qh_test", lambda c: c.execute("SELECT 1"))
+
+
+def test_hot_template_runs_as_a_prepared_statement():
+    connection = FakeConnection()
+    connection.statements = StatementCache(threshold=2)
+    session = DBSession(connection)
+    sql = "SELECT * FROM users WHERE id = %s"
+
+    assert session._statement(connection, sql, [1]) == (sql, [1], False)
+    assert session._statement(connection, sql, [2]) == ("EXECUTE qh_1 (%s)", [2], False)
+    assert session._statement(connection, sql, [3]) == ("EXECUTE qh_1 (%s)", [3], False)
+    assert connection.executed == ["PREPARE qh_1 AS SELECT * FROM users WHERE id = $1"]
+
+
+def test_refused_prepare_keeps_the_template_unprepared():
+    connection = FakeConnection()
+    connection.statements = StatementCache(threshold=1)
+    connection.failures["PREPARE qh_1 AS SELECT $1"] = refused()
+    session = DBSession(connection)
+
+    assert session._statement(connection, "SELECT %s", [1]) == ("SELECT %s", [1], False)
+    assert session._statement(connection, "SELECT %s", [1]) == ("SELECT %s", [1], False)
+    assert len(connection.executed) == 1
+
+
+def test_statement_over_the_parameter_limit_is_bound_on_the_client():
+    connection = FakeConnection()
+    connection.max_params = 2
+    connection.statements = StatementCache(threshold=1)
+    session = DBSession(connection)
+
+    assert session._statement(connection, "VALUES (%s, %s, %s)", [1, 2, 3]) == ("VALUES (1, 2, 3)", None, False)
+    assert session._statement(connection, "VALUES (%s, %s)", [1, 2]) == ("EXECUTE qh_1 (%s, %s)", [1, 2], False)
@@ -0,0 +1,42 @@
+from database.engine import HashRing
+
+from collections import Counter
+import pytest
+
+KEYS = range(10000)
+
+
+def test_placement_is_stable():
+    # md5 rather than hash(), so placement survives restarts and PYTHONHASHSEED
+    ring = HashRing(["a", "b", "c"])
+    reordered = HashRing(["c", "b", "a"])
+
+    assert [reordered.node_for(key) for key in KEYS] == [ring.node_for(key) for key in KEYS]
+
+
+def test_keys_spread_over_every_shard():
+    ring = HashRing(["a", "b", "c", "d"])
+    counts = Counter(ring.node_for(key) for key in KEYS)
+
+    assert set(counts) == {"a", "b", "c", "d"}
+    assert min(counts.values()) > len(KEYS) / 4 * 0.7
+
+
+def test_adding_a_shard_only_moves_keys_to_it():
+    before = HashRing(["a", "b", "c"])
+    after = HashRing(["a", "b", "c", "d"])
+
+    moved = [key for key in KEYS if before.node_for(key) != after.node_for(key)]
+    assert all(after.node_for(key) == "d" for key in moved)
+    assert len(moved) < len(KEYS) / 2
+
+
+def test_single_shard_owns_every_key():
+    ring = HashRing(["only"], vnodes=4)
+
+    assert {ring.node_for(key) for key in KEYS} == {"only"}
+
+
+def test_ring_needs_a_shard():
+    with pytest.raises(ValueError):
+        HashRing([])
@@ -0,0 +1,103 @@
+from database.connection import DBConnection
+
+import psycopg2
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+
+class FakeCursor:
+    """Cursor that records what it is asked to run instead of talking to a server."""
+
+    def __init__(self, connection: 'FakeConnection'):
+        self.connection = connection
+        self.closed = False
+        self._row: Optional[tuple] = None
+
+    def execute(self, query: str, params: Any = None, prepare: Optional[bool] = None) -> None:
+        self.connection.executed.append(query)
+        error = self.connection.failures.get(query)
+        if error is not None:
+            raise error
+        self._row = self.connection.results.get(query)
+        if not self.connection.autocommit:
+            self.connection.transaction = True
+
+    def fetchone(self) -> Optional[tuple]:
+        return self._row
+
+    def close(self) -> None:
+        self.closed = True
+
+    def __enter__(self) -> 'FakeCursor':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+class FakeConnection(DBConnection):
+    """Connection kept in memory, with ``results`` mapping statements to the row they return
+    and ``failures`` to the error they raise."""
+
+    def __init__(self, autocommit: bool = True, cursor_error: Optional[BaseException] = None):
+        self.executed: List[str] = []
+        self.results: Dict[str, tuple] = {}
+        self.failures: Dict[str, Exception] = {}
+        self.transaction = False
+        self.rollbacks = 0
+        self.usable = True
+        self.alive = True
+        self.closed = False
+        self.cursor_error = cursor_error
+        super().__init__(url="fake://", autocommit=autocommit)
+
+    def initialize_connection(self, config: Dict[str, str], autocommit: bool) -> None:
+        self._fake_autocommit = autocommit
+
+    def initialize_connection_url(self, url: str, autocommit: bool) -> None:
+        self._fake_autocommit = autocommit
+
+    def cursor(self) -> FakeCursor:
+        if self.cursor_error is not None:
+            raise self.cursor_error
+        return FakeCursor(self)
+
+    def named_cursor(self, name: str, withhold: bool = False) -> FakeCursor:
+        return self.cursor()
+
+    def mogrify(self, query: str, params: Any) -> str:
+        return query % tuple(repr(value) for value in params)
+
+    @property
+    def autocommit(self) -> bool:
+        return self._fake_autocommit
+
+    def in_transaction(self) -> bool:
+        return self.transaction
+
+    def commit(self) -> None:
+        self.transaction = False
+
+    def rollback(self) -> None:
+        self.rollbacks += 1
+        self.transaction = False
+
+    def copy_from(self, cursor: FakeCursor, query: str, rows: Iterable[Sequence[Any]]) -> int:
+        return sum(1 for _ in rows)
+
+    def close_connection(self) -> None:
+        self.closed = True
+        self.usable = False
+
+    def is_usable(self) -> bool:
+        return self.usable
+
+    def ping(self) -> bool:
+        return self.alive
+
+    def cancel(self) -> None:
+        pass
+
+
+def refused(query: str = "") -> Exception:
+    """Error the server raises for a statement it won't run."""
+    return psycopg2.ProgrammingError(f"refused: {query}")
@@ -0,0 +1,217 @@
+from database.engine import RowDescriptor
+from database.model.base_schema import BulkUpdateResult, QueryHelper, UpsertResult
+
+from app.models import Hires, Users, Skills, SkillData, UserData
+import pytest
+
+
+def test_all_cols_leaves_out_deferred_fields():
+    cols = [str(col) for col in Users.all_cols("u_")]
+
+    assert not any("password_hash" in col for col in cols)
+    assert not any("profile_pic_url" in col for col in cols)
+    assert any(col.startswith("users.username AS u_username") for col in cols)
+
+
+def test_all_cols_undefer():
+    cols = [str(col) for col in Users.all_cols(undefer=["profile_pic_url"])]
+
+    assert any(col.startswith("users.profile_pic_url") for col in cols)
+    assert not any("password_hash" in col for col in cols)
+
+
+def test_all_cols_without_deferred_fields():
+    assert len(Skills.all_cols()) == len(Skills._fields())
+
+
+USER = {"username": "ann", "email": "ann@example.com", "phone_no": "1", "password_hash": "x"}
+
+
+class RecordingSession:
+    """Session that records the statements bulk helpers send."""
+
+    def __init__(self):
+        self.statements = []
+
+    def copy(self, query_str, rows, force_log=False):
+        self.statements.append((query_str, list(rows)))
+
+    def execute(self, query_str, force_log=False, params=None, prepare=False):
+        self.statements.append((query_str, params))
+
+
+def test_row_getter_fills_defaults_for_missing_keys():
+    getter = QueryHelper._row_getter(Users, ["username", "is_active", "first_name"], USER)
+
+    assert list(getter(USER)) == ["ann", True, None]
+    assert list(getter({**USER, "is_active": False})) == ["ann", False, None]
+
+
+def test_row_getter_rejects_missing_required_keys():
+    getter = QueryHelper._row_getter(Users, ["username", "email"], USER)
+
+    with pytest.raises(ValueError, match="missing 'email'"):
+        getter({"username": "ann"})
+
+
+def test_row_getter_without_defaults_rejects_any_missing_key():
+    getter = QueryHelper._row_getter(Users, ["username", "is_active"], USER, fill_defaults=False)
+
+    with pytest.raises(ValueError, match="missing 'is_active'"):
+        getter(USER)
+
+
+def test_row_getter_reads_data_class_attributes():
+    user = UserData(**USER)
+
+    assert list(QueryHelper._row_getter(Users, ["username"], user)(user)) == ["ann"]
+    assert list(QueryHelper._row_getter(Users, ["username", "is_active"], user)(user)) == ["ann", True]
+
+
+def test_bulk_insert_copies_batches_of_a_generator():
+    session = RecordingSession()
+    rows = ({**USER, "username": f"user{i}"} for i in range(5))
+
+    result = QueryHelper.bulk_insert(Users, rows, session, batch_size=2)
+
+    assert result.rows == 5
+    assert [len(rows) for _, rows in session.statements] == [2, 2, 1]
+    assert session.statements[0][0].startswith("COPY users (username, email, phone_no, password_hash,")
+    assert session.statements[0][1][0][:4] == ["user0", "ann@example.com", "1", "x"]
+
+
+def test_bulk_insert_values_shares_one_statement_per_full_batch():
+    session = RecordingSession()
+
+    QueryHelper.bulk_insert(Users, [USER] * 5, session, method="values", batch_size=2)
+
+    first, second, last = (query_str for query_str, _ in session.statements)
+    assert first == second != last
+    assert first.count("(%s, %s, %s, %s, %s, %s, %s, %s, %s)") == 2
+    assert len(session.statements[0][1]) == 18
+
+
+def test_bulk_insert_rejects_unknown_methods():
+    with pytest.raises(ValueError):
+        QueryHelper.bulk_insert(Users, [USER], RecordingSession(), method="insert")
+
+
+def test_split_total_of_an_empty_page_is_unknown():
+    assert QueryHelper._split_total(None, [], Skills) == ([], None)
+
+
+def test_split_total_reads_the_last_column():
+    descriptor = RowDescriptor.from_names(("id", "name", "description", "total_count"))
+
+    skills, total = QueryHelper._split_total(descriptor, [(1, "Plumbing", None, 12)], Skills)
+    assert total == 12
+    assert skills[0].name == "Plumbing"
+
+
+def test_load_deferred_fetches_fields_by_primary_key():
+    users = [UserData(**USER, id=3), UserData(**USER, id=5)]
+    query, apply = Users._deferred_query(users, ["profile_pic_url"])
+
+    assert query.template() == ("SELECT users.id, users.profile_pic_url FROM users WHERE users.id = ANY(%s)", [[3, 5]])
+    apply([(5, "data:image/png;base64,AAAA")])
+    assert users[1].profile_pic_url == "data:image/png;base64,AAAA"
+    assert users[0].profile_pic_url is None
+
+
+def skills(count: int) -> list:
+    return [SkillData(name=f"skill{i}", description=None) for i in range(count)]
+
+
+def test_upsert_updates_the_given_fields_on_conflict():
+    keys, returned, batches = QueryHelper._prepare_upsert(skills(3), Skills, ["name"], ["description"], None, 2)
+
+    assert (keys, returned) == (["name"], ["id"])
+    assert [len(batch) for batch, _ in batches] == [2, 1]
+    assert batches[0][1].template() == (
+        "INSERT INTO skills (name, description) VALUES (%s, %s), (%s, %s) ON CONFLICT (name) "
+        "DO UPDATE SET description = EXCLUDED.description RETURNING name, id, (xmax = 0) AS upsert_inserted",
+        ["skill0", None, "skill1", None])
+
+
+def test_upsert_do_nothing_matches_records_by_a_unique_field():
+    keys, _, batches = QueryHelper._prepare_upsert(skills(2), Skills, None, "nothing", None, 1000)
+
+    assert keys == ["name"]
+    assert batches[0][1].key == \
+        "INSERT INTO skills (name, description) VALUES (%s, %s), (%s, %s) ON CONFLICT DO NOTHING RETURNING name, id"
+
+
+@pytest.mark.parametrize("conflict, update", [(None, ["description"]), (["name"], []), (["name"], "replace")])
+def test_upsert_rejects_invalid_conflict_actions(conflict, update):
+    with pytest.raises(ValueError):
+        QueryHelper._prepare_upsert(skills(1), Skills, conflict, update, None, 1000)
+
+
+def test_upsert_batches_fit_the_parameter_limit():
+    user = UserData(**USER)
+    _, _, batches = QueryHelper._prepare_upsert([user] * 7282, Users, ["username"], "nothing", None, 10000)
+
+    # Nine inserted columns per record
+    assert [len(batch) for batch, _ in batches] == [65535 // 9, 1]
+
+
+def test_split_upsert_tells_inserts_from_conflicts():
+    batch = skills(3)
+    descriptor = RowDescriptor.from_names(("name", "id", "upsert_inserted"))
+    result = UpsertResult([], [])
+
+    QueryHelper._split_upsert(batch, descriptor, [("skill0", 1, True), ("skill1", 2, False)],
+                              Skills, ["name"], ["id"], result)
+
+    assert result.inserted == [batch[0]]
+    assert result.conflicted == [batch[1], batch[2]]
+    assert (batch[0].id, batch[1].id) == (1, 2)
+
+
+def test_bulk_update_joins_a_values_list_on_the_primary_key():
+    items = [{"id": i, "status": "active"} for i in range(3)]
+    returned, batches = QueryHelper._prepare_bulk_update(Hires, items, ["status"], 2, ["status"], {"status": "pending"})
+    batches = list(batches)
+
+    assert returned == ["id", "status"]
+    assert [len(batch) for batch, *_ in batches] == [2, 1]
+    assert batches[0][2:] == (
+        "UPDATE hires SET status = v.status::TEXT FROM (VALUES (%s, %s), (%s, %s)) AS v(id, status) "
+        "WHERE hires.id = v.id::INTEGER AND hires.status = %s RETURNING hires.id, hires.status",
+        [0, "active", 1, "active", "pending"])
+
+
+def test_bulk_update_batches_fit_the_parameter_limit():
+    items = ({"id": i, "is_active": False} for i in range(40000))
+    _, batches = QueryHelper._prepare_bulk_update(Users, items, ["is_active"], 100000, None, None)
+
+    assert [len(batch) for batch, *_ in batches] == [65535 // 2, 40000 - 65535 // 2]
+
+
+def test_bulk_update_filters_count_towards_the_parameter_limit():
+    items = [{"id": i, "status": "active"} for i in range(65535 // 3 + 1)]
+    _, batches = QueryHelper._prepare_bulk_update(Hires, items, ["status"], 100000, None, {"status": "pending"})
+
+    assert [len(batch) for batch, *_ in batches] == [65535 // 3, 1]
+
+
+def test_bulk_update_rejects_records_missing_a_field():
+    _, batches = QueryHelper._prepare_bulk_update(Users, [{"id": 1}], ["is_active"], 10, None, None)
+
+    with pytest.raises(ValueError, match="missing 'is_active'"):
+        list(batches)
+
+
+def test_bulk_update_needs_fields():
+    with pytest.raises(ValueError):
+        QueryHelper._prepare_bulk_update(Users, [{"id": 1}], [], 10, None, None)
+
+
+def test_apply_bulk_update_reports_missing_rows():
+    batch = [{"id": 1, "status": "active"}, {"id": 2, "status": "active"}]
+    result = BulkUpdateResult(0, 0.0, [])
+
+    QueryHelper._apply_bulk_update(batch, [[1, "active"], [2, "active"]], [(1, "active")], ["id", "status"], result)
+
+    assert result.rows == 1
+    assert result.missing == [batch[1]]
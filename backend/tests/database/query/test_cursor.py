@@ -0,0 +1,40 @@
+from database.query import decode_cursor, encode_cursor
+from database.query.cursor import column_key
+
+from datetime import date, datetime, time, timezone
+from decimal import Decimal
+import pytest
+
+KEYS = ["created_at", "id"]
+
+
+def test_values_keep_their_types():
+    values = [datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc), date(2024, 5, 1), time(8, 15),
+              Decimal("12.50"), 7, "text", None]
+    keys = [f"k{i}" for i in range(len(values))]
+
+    assert decode_cursor(encode_cursor(keys, values), keys) == values
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor(KEYS, [datetime(2024, 5, 1), "???>>>"])
+
+    assert cursor.replace("-", "").replace("_", "").isalnum()
+
+
+def test_cursor_of_another_ordering_is_rejected():
+    cursor = encode_cursor(KEYS, [datetime(2024, 5, 1), 1])
+
+    with pytest.raises(ValueError, match="different ordering"):
+        decode_cursor(cursor, ["id", "created_at"])
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", "", encode_cursor(["k"], [{"x": "1"}])])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, KEYS)
+
+
+def test_column_key():
+    assert column_key("users.created_at") == "created_at"
+    assert column_key("u.id AS user_id") == "user_id"
@@ -0,0 +1,139 @@
+from database.query import Param, Query, QueryError, QueryParamList
+from database.query.query import _compile
+
+from psycopg2.extensions import AsIs
+import pytest
+
+
+def test_values_become_parameters():
+    query = Query("SELECT * FROM users WHERE id = %(id)s AND name = %(name)s", {"id": 5, "name": "bob"})
+
+    assert query.template() == ("SELECT * FROM users WHERE id = %s AND name = %s", [5, "bob"])
+
+
+def test_sql_fragments_are_part_of_the_text():
+    query = Query("SELECT %(col)s FROM users WHERE id = %(id)s", {"col": AsIs("users.name"), "id": 1})
+
+    assert query.template() == ("SELECT users.name FROM users WHERE id = %s", [1])
+
+
+def test_param_is_bound_later():
+    query = Query("SELECT * FROM users WHERE id = %(id)s AND name = %(name)s", {"id": 5, "name": Param("name")})
+
+    assert query.bind(name="bob").template() == ("SELECT * FROM users WHERE id = %s AND name = %s", [5, "bob"])
+    assert query.bind(name="eve").template()[1] == [5, "eve"]
+
+
+def test_binding_leaves_the_query_untouched():
+    query = Query("SELECT * FROM users WHERE name = %(name)s", {"name": Param("name")})
+    bound = query.bind(name="bob")
+
+    assert bound.bind(name="eve").template()[1] == ["eve"]
+    assert bound.template()[1] == ["bob"]
+    assert bound.key == query.key
+
+
+def test_unbound_param_raises():
+    query = Query("SELECT * FROM users WHERE name = %(name)s", {"name": Param("name")})
+
+    with pytest.raises(QueryError, match="Param\\('name'\\)"):
+        query.template()
+
+
+def test_missing_value_raises():
+    with pytest.raises(QueryError, match="no value for 'missing'"):
+        Query("SELECT %(missing)s", {"other": 1}).template()
+
+
+def test_missing_subquery_placeholder_raises():
+    query = Query("SELECT 1").add_sub_query("sub", Query("SELECT 2"))
+
+    with pytest.raises(QueryError, match="not found"):
+        query.template()
+
+
+def test_subquery_parameters_keep_their_order():
+    query = Query("SELECT * FROM (??plac(sub)??) s WHERE s.id = %(id)s", {"id": 3})
+    query.add_sub_query("sub", Query("SELECT id FROM users WHERE name = %(name)s", {"name": "bob"}))
+
+    assert query.template() == ("SELECT * FROM (SELECT id FROM users WHERE name = %s) s WHERE s.id = %s", ["bob", 3])
+
+
+def test_percent_signs():
+    # Without parameters the text is sent as is, with them a literal % has to be escaped
+    assert Query("SELECT '100%'").template() == ("SELECT '100%'", None)
+    assert Query("SELECT '100%%' WHERE id = %(id)s", {"id": 1}).template() == ("SELECT '100%%' WHERE id = %s", [1])
+
+
+def test_param_list():
+    query = QueryParamList("(%(id)s, %(name)s)", [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}])
+
+    assert query.template() == ("(%s, %s), (%s, %s)", [1, "a", 2, "b"])
+
+
+def test_normalization_strips_comments_and_blank_lines():
+    query = Query("""
+        SELECT *  -- every column
+        FROM users /* the table */
+
+        WHERE id = %(id)s
+    """, {"id": 1})
+
+    assert query.template()[0] == "SELECT * FROM users WHERE id = %s"
+
+
+def test_template_is_compiled_once_per_shape():
+    text = "SELECT * FROM compiled_shapes WHERE id = %(id)s"
+    Query(text, {"id": 1}).template()
+    misses = _compile.cache_info().misses
+
+    Query(text, {"id": 2}).template()
+    assert _compile.cache_info().misses == misses
+
+    Query(text, {"id": AsIs("1")}).template()
+    assert _compile.cache_info().misses == misses + 1
+
+
+def test_changing_a_query_recompiles_it():
+    query = Query("SELECT * FROM users WHERE id = %(id)s", {"id": 1})
+    query.template()
+    query.set_param("id", 2)
+
+    assert query.template()[1] == [2]
+
+
+def by_name(name) -> Query:
+    query = Query("SELECT * FROM (??plac(sub)??) s WHERE s.name = %(name)s", {"name": name})
+    return query.add_sub_query("sub", Query("SELECT * FROM users WHERE id = ANY(%(ids)s)", {"ids": [1, 2]}))
+
+
+def test_key_is_the_same_for_any_values():
+    assert by_name("bob").key == by_name("eve").key == by_name(Param("name")).bind(name="x").key
+    assert by_name("bob").key == "SELECT * FROM (SELECT * FROM users WHERE id = ANY(%s)) s WHERE s.name = %s"
+
+
+def test_key_follows_the_structure():
+    assert by_name(AsIs("'bob'")).key != by_name("bob").key
+    assert Query("SELECT 1", end=True).key == "SELECT 1;"
+
+
+def test_equal_shapes_share_one_template():
+    first, _ = by_name("bob").compile()
+    second, _ = by_name("eve").compile()
+
+    assert first is second
+
+
+def test_equal_shapes_render_equally_across_threads():
+    from concurrent.futures import ThreadPoolExecutor
+
+    def render(i):
+        query = Query(f"SELECT * FROM (??plac(sub)??) s WHERE s.name = %(name)s AND s.n = {i % 4}", {"name": str(i)})
+        return query.add_sub_query("sub", Query("SELECT * FROM users WHERE id = %(id)s", {"id": i})).template()
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(render, range(400)))
+
+    for i, (sql, params) in enumerate(results):
+        assert sql == results[i % 4][0]
+        assert params == [i, str(i)]
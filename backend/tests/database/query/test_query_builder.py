@@ -0,0 +1,165 @@
+from database.query.query_builder import Condition, Cte, Insert, Select, Statement
+
+from app.models import Hires, Professionals, Skills, Users
+from datetime import datetime
+import pytest
+
+
+def by_username(username, ids=(1, 2, 3)) -> Select:
+    return Select(Users, Users.col("username")).where(Condition().eq(Users.col("username"), username).and_()
+                                                      .in_(Users.col("id"), list(ids)))
+
+
+def test_select_key_ignores_values():
+    assert by_username("bob").get_query().key == by_username("eve", [4]).get_query().key
+    assert by_username("bob").get_query().key == \
+        "SELECT users.username FROM users WHERE users.username = %s AND users.id = ANY(%s)"
+
+
+def test_seek_without_cursor_only_orders():
+    select = Select(Professionals).seek(["created_at", "id"], limit=5)
+
+    assert select.get_query().template() == (
+        "SELECT * FROM professionals ORDER BY professionals.created_at ASC, professionals.id ASC LIMIT %s", [5])
+
+
+def test_seek_after_cursor_compares_rows():
+    page = Select(Professionals).seek(["created_at", "id"], limit=5)
+    cursor = page.cursor_for({"created_at": datetime(2024, 5, 1), "id": 9})
+
+    sql, params = Select(Professionals).seek({"created_at": "desc", "id": "desc"}, after=cursor).get_query().template()
+    assert sql == ("SELECT * FROM professionals WHERE (professionals.created_at, professionals.id) < (%s, %s) "
+                   "ORDER BY professionals.created_at DESC, professionals.id DESC")
+    assert params == [datetime(2024, 5, 1), 9]
+
+
+def test_seek_parenthesises_an_existing_or_condition():
+    select = Select(Professionals).where(
+        Condition().eq(Professionals.col("location"), "Oslo").or_().eq(Professionals.col("skill_id"), 2))
+    select.seek(["id"], after={"id": 3})
+
+    assert select.get_query().template() == (
+        "SELECT * FROM professionals WHERE (professionals.location = %s OR professionals.skill_id = %s) "
+        "AND (professionals.id) > (%s) ORDER BY professionals.id ASC", ["Oslo", 2, 3])
+
+
+def test_seek_needs_one_direction():
+    with pytest.raises(ValueError):
+        Select(Professionals).seek({"created_at": "desc", "id": "asc"})
+
+
+def test_cursor_for_needs_seek():
+    with pytest.raises(ValueError):
+        Select(Professionals).cursor_for({"id": 1})
+
+
+def active_users() -> Select:
+    return Select(Users).where(Condition().eq(Users.col("is_active"), True))
+
+
+def test_exists_selects_one():
+    assert active_users().exists().template() == (
+        "SELECT EXISTS(SELECT 1 FROM users WHERE users.is_active = %s)", [True])
+
+
+def test_count_in_place():
+    assert active_users().count().template() == ("SELECT COUNT(*) FROM users WHERE users.is_active = %s", [True])
+
+
+def test_count_of_a_limited_select_counts_the_page():
+    sql, params = active_users().order_by(Users.col("id")).limit(5).count().template()
+
+    assert sql.startswith("SELECT COUNT(*) FROM (SELECT users.id, ")
+    assert sql.endswith("FROM users WHERE users.is_active = %s ORDER BY users.id LIMIT %s) AS counted")
+    assert params == [True, 5]
+
+
+def test_count_of_chosen_columns_keeps_them():
+    select = Select(Users, Statement.distinct(Users.col("first_name")))
+
+    assert select.count().template()[0] == "SELECT COUNT(*) FROM (SELECT DISTINCT(users.first_name) FROM users) AS counted"
+
+
+def test_fast_paths_are_read_only():
+    assert active_users().exists().read_only
+    assert active_users().count().read_only
+
+
+def test_with_total_adds_a_window_count():
+    select = Select(Skills).with_total().limit(5)
+
+    assert select.get_query().template() == ("SELECT *, COUNT(*) OVER() AS total_count FROM skills LIMIT %s", [5])
+
+
+def test_select_leaves_deferred_columns_out():
+    sql = Select(Users).get_query().key
+
+    assert sql.startswith("SELECT users.id, users.username, ")
+    assert "password_hash" not in sql and "profile_pic_url" not in sql
+
+
+def test_undefer_adds_the_named_columns():
+    sql = Select(Users).undefer("profile_pic_url").get_query().key
+
+    assert sql.endswith("users.last_login, users.profile_pic_url FROM users")
+    assert "password_hash" not in sql
+
+
+def test_undefer_unknown_field_raises():
+    with pytest.raises(ValueError, match="username"):
+        Select(Users).undefer("username")
+
+
+def test_join_lists_columns_once_a_table_defers_some():
+    assert Select(Professionals).join(Skills).get_query().key == \
+        "SELECT * FROM professionals INNER JOIN skills ON professionals.skill_id = skills.id"
+
+    sql = Select(Professionals).join(Users).get_query().key
+    assert sql.startswith("SELECT professionals.*, users.id, users.username, ")
+    assert "password_hash" not in sql
+
+
+def hire_from_professional(professional_id) -> Insert:
+    source = Select(Professionals, Professionals.col("user_id"), Professionals.col("id"), "pending").where(
+        Condition().eq(Professionals.col("id"), professional_id))
+    return Insert(Hires, "client_id", "professional_id", "status").from_select(source)
+
+
+def test_insert_from_select():
+    assert hire_from_professional(4).returning("id").get_query().template() == (
+        "INSERT INTO hires (client_id, professional_id, status) SELECT professionals.user_id, professionals.id, %s "
+        "FROM professionals WHERE professionals.id = %s RETURNING id", ["pending", 4])
+
+
+def test_insert_defaults_to_the_fields_the_database_does_not_fill():
+    assert Insert(Skills).get_query().key == "INSERT INTO skills (name, description)"
+
+
+def test_cte_insert_makes_the_select_a_write():
+    created = Cte("created", Hires)
+    select = Select(created, created.col("id")).with_("created", hire_from_professional(4).returning())
+    query = select.get_query()
+
+    assert query.template() == (
+        "WITH created AS (INSERT INTO hires (client_id, professional_id, status) SELECT professionals.user_id, "
+        "professionals.id, %s FROM professionals WHERE professionals.id = %s RETURNING *) "
+        "SELECT created.id FROM created", ["pending", 4])
+    assert not query.read_only
+
+
+def test_cte_select_stays_read_only():
+    ids = Select(Users, Users.col("id")).where(Condition().eq(Users.col("username"), "ann"))
+    select = Select(Cte("ids"), Cte("ids").col("id")).with_("ids", ids)
+
+    assert select.get_query().template() == (
+        "WITH ids AS (SELECT users.id FROM users WHERE users.username = %s) SELECT ids.id FROM ids", ["ann"])
+    assert select.get_query().read_only
+
+
+def test_fast_paths_keep_the_with_clause():
+    select = Select(Skills).with_("named", Select(Skills).where(Condition().eq(Skills.col("name"), "Plumbing")))
+
+    assert select.exists().template() == (
+        "WITH named AS (SELECT * FROM skills WHERE skills.name = %s) SELECT EXISTS(SELECT 1 FROM skills)", ["Plumbing"])
+    assert select.count().template() == (
+        "WITH named AS (SELECT * FROM skills WHERE skills.name = %s) SELECT COUNT(*) FROM skills", ["Plumbing"])